@@ -159,7 +159,7 @@ class FloorAdmin(admin.ModelAdmin):
 
 @admin.register(ItemActivity)
 class ItemActivityAdmin(admin.ModelAdmin):
-    list_display = ("id", "types", "change", "quantity", "remarks", "product")
+    list_display = ("id", "types", "change", "delta", "remarks", "product")
 
 @admin.register(Kitchentype)
 class KitchentypeActivityAdmin(admin.ModelAdmin):
@@ -0,0 +1,119 @@
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+ALL_BRANCHES = "all"
+
+
+def version_key(branch_id):
+    return f"dashboard:version:{branch_id or ALL_BRANCHES}"
+
+
+def new_version():
+    """
+    Seed for a missing version key. Never a constant: after an eviction a
+    fixed seed would make payloads cached under that version current again.
+    """
+    return time.time_ns()
+
+
+def dashboard_version(branch_id=None):
+    """Current data version of a branch, or of all branches when branch_id is None."""
+    return cache.get_or_set(version_key(branch_id), new_version, timeout=None)
+
+
+def increment_versions(keys):
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Never read yet or evicted; start from a fresh version
+            cache.add(key, new_version(), timeout=None)
+
+
+def bump_dashboard_version(branch_id):
+    """
+    Make every cached payload for `branch_id` (and the all-branches
+    overview) unreachable. Called after commit, so a recompute that
+    starts right away sees the new data.
+    """
+    increment_versions({version_key(branch_id), version_key(None)})
+
+
+def bump_dashboard_version_on_commit(branch_id):
+    transaction.on_commit(lambda: bump_dashboard_version(branch_id))
+
+
+def catalog_version_key(branch_id):
+    return f"catalog:version:{branch_id or ALL_BRANCHES}"
+
+
+def catalog_version(branch_id=None):
+    """Current catalog version of a branch, or of all branches when branch_id is None."""
+    return cache.get_or_set(catalog_version_key(branch_id), new_version, timeout=None)
+
+
+def bump_catalog_version_on_commit(branch_id):
+    """Invalidate the branch's (and the all-branches) catalog once the write commits."""
+    transaction.on_commit(
+        lambda: increment_versions(
+            {catalog_version_key(branch_id), catalog_version_key(None)}
+        )
+    )
+
+
+def get_or_compute(key, compute, timeout, lock_timeout):
+    """
+    Return `key` from the cache, computing it with `compute()` on a miss.
+
+    Only one caller recomputes a missing entry: it takes a short lock with
+    cache.add, and the others wait for its result instead of running the
+    same queries. If the lock holder does not finish within `lock_timeout`
+    seconds, waiters compute it themselves.
+    """
+    payload = cache.get(key)
+    if payload is not None:
+        return payload
+
+    lock_key = f"{key}:lock"
+    owns_lock = cache.add(lock_key, 1, timeout=lock_timeout)
+    if not owns_lock:
+        deadline = time.monotonic() + lock_timeout
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            payload = cache.get(key)
+            if payload is not None:
+                return payload
+        logger.warning(f"Timed out waiting for {key}; computing it here")
+
+    try:
+        payload = compute()
+        cache.set(key, payload, timeout=timeout)
+        return payload
+    finally:
+        if owns_lock:
+            cache.delete(lock_key)
+
+
+def cached_dashboard(kind, branch, start_date, end_date, timeframe, compute):
+    """
+    Return the `kind` payload for (branch, timeframe, start, end) from the
+    cache, computing it with `compute()` on a miss (see get_or_compute).
+    """
+    branch_id = getattr(branch, "id", branch)
+    version = dashboard_version(branch_id)
+    key = (
+        f"dashboard:{kind}:{branch_id or ALL_BRANCHES}:{timeframe}:"
+        f"{start_date}:{end_date}:v{version}"
+    )
+    return get_or_compute(
+        key,
+        compute,
+        timeout=settings.DASHBOARD_CACHE_TIMEOUT,
+        lock_timeout=settings.DASHBOARD_CACHE_LOCK_TIMEOUT,
+    )
@@ -6,7 +6,13 @@ urlpatterns =[
     path('dashboard-details/<int:branch_id>/',views.DashboardView.as_view(),name="today-sales"),
     path('report-dashboard/',views.ReportDashboardView.as_view(),name="report-dashboard"),
     path('report-dashboard/<int:branch_id>/',views.ReportDashboardView.as_view(),name="report-dashboard"),
+    path('sales-heatmap/',views.SalesHeatmapView.as_view(),name="sales-heatmap"),
+    path('sales-heatmap/<int:branch_id>/',views.SalesHeatmapView.as_view(),name="sales-heatmap-branch"),
+    path('bake-plan/',views.BakePlanView.as_view(),name="bake-plan"),
+    path('bake-plan/<int:branch_id>/',views.BakePlanView.as_view(),name="bake-plan-branch"),
     path('staff-report/',views.StaffReportView.as_view(),name="staff-report"),
     path('staff-report/<int:branch_id>/',views.StaffReportView.as_view(),name="staff-report-branch"),
+    path('stock-as-of/',views.StockAsOfView.as_view(),name="stock-as-of"),
+    path('stock-as-of/<int:branch_id>/',views.StockAsOfView.as_view(),name="stock-as-of-branch"),
 ]
 
@@ -1,75 +1,227 @@
 import json
+from urllib.parse import parse_qs
 
+from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
+from django.conf import settings
 
+from .models import InvoiceItem, OutboxEvent
+from .outbox import latest_seq
 
-class KitchenOrdersConsumer(AsyncWebsocketConsumer):
+
+def orders_group(branch_id=None):
+    """Waiter/counter group for a branch; branch-less screens share "orders"."""
+    return f"orders_branch_{branch_id}" if branch_id else "orders"
+
+
+def kitchen_group(branch_id=None, kitchentype_id=None):
+    """Kitchen group for a branch, or for one station (kitchen type) in it."""
+    if not branch_id:
+        return "kitchen_orders"
+    if kitchentype_id:
+        return f"kitchen_branch_{branch_id}_type_{kitchentype_id}"
+    return f"kitchen_branch_{branch_id}"
+
+
+def stock_alerts_group(branch_id=None):
+    """Low-stock alert group for a branch's managers; admins share "stock_alerts"."""
+    return f"stock_alerts_branch_{branch_id}" if branch_id else "stock_alerts"
+
+
+def is_hq_admin(user):
+    """Branch-less admins; the only users allowed into the global groups."""
+    return (user.is_superuser or user.user_type == "ADMIN") and not user.branch_id
+
+
+def invoice_groups(invoice):
     """
-    Broadcast consumer for kitchen screens.
-    Listens for invoice creation and status updates.
+    Every group that should hear about `invoice`: the branch's order screens,
+    the branch-wide kitchen group, each station that has items on the
+    invoice, and the global groups used by branch-less admin (HQ) screens.
     """
+    kitchentype_ids = (
+        InvoiceItem.objects.filter(invoice=invoice)
+        .values_list("product__category__kitchentype_id", flat=True)
+        .distinct()
+    )
+    groups = [
+        orders_group(),
+        kitchen_group(),
+        orders_group(invoice.branch_id),
+        kitchen_group(invoice.branch_id),
+    ]
+    groups += [
+        kitchen_group(invoice.branch_id, kitchentype_id)
+        for kitchentype_id in kitchentype_ids
+        if kitchentype_id
+    ]
+    return groups
+
+
+def missed_events(group_names, last_seq):
+    """
+    Published events after `last_seq` for the given groups, in publish order.
+    Returns None when the client has to resync: its last event has been
+    pruned from the log, or it missed more than EVENT_REPLAY_LIMIT events.
+
+    Events are matched on the groups they went to, not on a branch, since
+    one socket may listen to several branches (e.g. an admin's global
+    stock_alerts group).
+    """
+    events = OutboxEvent.objects.filter(published_at__isnull=False)
+
+    if last_seq:
+        covered = events.filter(seq=last_seq).exists()
+    else:
+        # The cursor predates the first event: the log must still start at 1
+        covered = events.filter(seq=1).exists() or not events.exists()
+    if not covered:
+        return None
+
+    limit = settings.EVENT_REPLAY_LIMIT
+    missed = []
+    for event in events.filter(seq__gt=last_seq).order_by("seq").iterator():
+        if not set(event.groups) & set(group_names):
+            continue
+        if len(missed) == limit:
+            return None
+        missed.append(dict(event.payload, seq=event.seq))
+    return missed
+
+
+class InvoiceEventsConsumer(AsyncWebsocketConsumer):
+    """
+    Base consumer for events published through the outbox.
+    Subclasses pick the groups to join from the connected user.
+
+    Every event carries the outbox `seq`. On accept the client is sent
+    {"type": "hello", "seq": <cursor>}: the `?last_seq=` it reconnected
+    with, or the current high-water seq, so it always has a cursor. Events
+    after the cursor are then sent in a single {"type": "replay", "events":
+    [...]} frame, or {"type": "resync"} when the gap can no longer be
+    replayed. A reconnect (`?reconnect=1`) without a last_seq always
+    resyncs, since nothing tells what it missed.
+    """
+
+    def get_group_names(self, user):
+        raise NotImplementedError
 
     async def connect(self):
-        self.group_name = "kitchen_orders"
-        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        user = self.scope.get("user")
+        if user is None or not user.is_authenticated:
+            user = None
+
+        self.group_names = self.get_group_names(user)
+        if not self.group_names:
+            await self.close()
+            return
+
+        query = parse_qs(self.scope.get("query_string", b"").decode())
+        try:
+            last_seq = int(query["last_seq"][0])
+        except (KeyError, ValueError):
+            last_seq = None
+        # Read before joining the groups: anything published later is
+        # replayed below or arrives live, and clients drop duplicates by seq.
+        cursor = last_seq
+        if cursor is None:
+            cursor = await database_sync_to_async(latest_seq)()
+
+        for group_name in self.group_names:
+            await self.channel_layer.group_add(group_name, self.channel_name)
         await self.accept()
+        await self.send(text_data=json.dumps({"type": "hello", "seq": cursor}))
+
+        if last_seq is None and "reconnect" in query:
+            await self.send(text_data=json.dumps({"type": "resync"}))
+            return
+
+        missed = await database_sync_to_async(missed_events)(self.group_names, cursor)
+        if missed is None:
+            await self.send(text_data=json.dumps({"type": "resync"}))
+            return
+        if missed:
+            events = [self.format_event(event) for event in missed]
+            await self.send(text_data=json.dumps({"type": "replay", "events": events}))
+
+    def format_event(self, event):
+        message = {
+            "type": event["type"],
+            "seq": event.get("seq"),
+            "invoice_id": event.get("invoice_id"),
+            "invoice": event.get("invoice"),
+        }
+        if event["type"] == "invoice_updated":
+            message["status"] = event.get("status")
+        return message
 
     async def disconnect(self, close_code):
-        await self.channel_layer.group_discard("kitchen_orders", self.channel_name)
+        for group_name in getattr(self, "group_names", []):
+            await self.channel_layer.group_discard(group_name, self.channel_name)
 
     async def invoice_created(self, event):
-        await self.send(
-            text_data=json.dumps(
-                {
-                    "type": "invoice_created",
-                    "invoice_id": event.get("invoice_id"),
-                }
-            )
-        )
+        await self.send(text_data=json.dumps(self.format_event(event)))
 
     async def invoice_updated(self, event):
-        await self.send(
-            text_data=json.dumps(
-                {
-                    "type": "invoice_updated",
-                    "invoice_id": event.get("invoice_id"),
-                    "status": event.get("status"),
-                }
-            )
-        )
-
-
-class OrdersConsumer(AsyncWebsocketConsumer):
+        await self.send(text_data=json.dumps(self.format_event(event)))
+
+
+class KitchenOrdersConsumer(InvoiceEventsConsumer):
+    """
+    Broadcast consumer for kitchen screens.
+    Kitchen users with a kitchen type only hear about invoices for their
+    station; other users get every invoice for their branch. Branch-less
+    admins get every invoice; anyone else is refused.
+    """
+
+    def get_group_names(self, user):
+        if user is None:
+            return []
+        if user.branch_id:
+            kitchentype_id = None
+            if user.user_type == "KITCHEN":
+                kitchentype_id = user.kitchentype_id
+            return [kitchen_group(user.branch_id, kitchentype_id)]
+        if is_hq_admin(user):
+            return [kitchen_group()]
+        return []
+
+
+class OrdersConsumer(InvoiceEventsConsumer):
     """
     Broadcast consumer for waiter/counter screens.
-    Listens for invoice creation and status updates (e.g. kitchen marks ready).
+    Listens for invoice creation and status updates in the user's branch;
+    branch-less admins hear every branch. Anyone else is refused.
     """
 
-    async def connect(self):
-        self.group_name = "orders"
-        await self.channel_layer.group_add(self.group_name, self.channel_name)
-        await self.accept()
+    def get_group_names(self, user):
+        if user is None:
+            return []
+        if user.branch_id:
+            return [orders_group(user.branch_id)]
+        if is_hq_admin(user):
+            return [orders_group()]
+        return []
 
-    async def disconnect(self, close_code):
-        await self.channel_layer.group_discard("orders", self.channel_name)
 
-    async def invoice_created(self, event):
-        await self.send(
-            text_data=json.dumps(
-                {
-                    "type": "invoice_created",
-                    "invoice_id": event.get("invoice_id"),
-                }
-            )
-        )
+class StockAlertsConsumer(InvoiceEventsConsumer):
+    """
+    Low-stock alerts for branch managers (their branch) and admins (every
+    branch). Other users are refused. Supports `?last_seq=` replay like
+    the invoice feeds.
+    """
 
-    async def invoice_updated(self, event):
-        await self.send(
-            text_data=json.dumps(
-                {
-                    "type": "invoice_updated",
-                    "invoice_id": event.get("invoice_id"),
-                    "status": event.get("status"),
-                }
-            )
-        )
+    def get_group_names(self, user):
+        if user is None:
+            return []
+        if user.is_superuser or user.user_type == "ADMIN":
+            return [stock_alerts_group()]
+        if user.user_type == "BRANCH_MANAGER" and user.branch_id:
+            return [stock_alerts_group(user.branch_id)]
+        return []
+
+    def format_event(self, event):
+        return {"type": event["type"], "seq": event.get("seq"), "alerts": event["alerts"]}
+
+    async def stock_alerts(self, event):
+        await self.send(text_data=json.dumps(self.format_event(event)))
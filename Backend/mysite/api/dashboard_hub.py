@@ -0,0 +1,117 @@
+import asyncio
+import logging
+import weakref
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+from .caching import dashboard_version, version_key
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """Viewers of one (branch, timeframe, start, end) dashboard payload."""
+
+    def __init__(self, branch_id, compute):
+        self.branch_id = branch_id
+        self.compute = compute
+        self.queues = set()
+        self.version = None
+        self.payload = None
+        self.lock = asyncio.Lock()
+
+
+def offer(queue, payload):
+    """Put `payload` on a one-slot queue, replacing anything not yet sent."""
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(payload)
+
+
+class DashboardHub:
+    """
+    Fans dashboard payloads out to every SSE stream in this process.
+
+    Each subscription key is watched once, however many streams use it:
+    the hub polls the per-branch version keys that bump_dashboard_version
+    increments after every committed change. Those live in the shared
+    cache, so a change made by any process is seen here, and a poll costs
+    one cache read for all keys and no database queries. On a change the
+    payload is recomputed once (through cached_dashboard, so once across
+    processes too) and the encoded result is queued for every stream.
+    """
+
+    def __init__(self):
+        self.subscriptions = {}
+        self.task = None
+
+    async def subscribe(self, key, branch_id, compute):
+        """
+        Register a stream for `key`. `compute` is a sync callable returning
+        the encoded payload. Returns a queue that receives the current
+        payload now and a new one after each change.
+        """
+        subscription = self.subscriptions.get(key)
+        if subscription is None:
+            subscription = self.subscriptions[key] = Subscription(branch_id, compute)
+
+        queue = asyncio.Queue(maxsize=1)
+        subscription.queues.add(queue)
+        await self.refresh(subscription)
+        if queue.empty() and subscription.payload is not None:
+            offer(queue, subscription.payload)
+
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.watch())
+        return queue
+
+    def unsubscribe(self, key, queue):
+        subscription = self.subscriptions.get(key)
+        if subscription is None:
+            return
+        subscription.queues.discard(queue)
+        if not subscription.queues:
+            del self.subscriptions[key]
+
+    async def refresh(self, subscription, version=None):
+        """Recompute and fan out `subscription` if its branch version moved."""
+        async with subscription.lock:
+            if version is None:
+                version = await sync_to_async(dashboard_version)(subscription.branch_id)
+            if version == subscription.version:
+                return
+            try:
+                payload = await sync_to_async(subscription.compute)()
+            except Exception as e:
+                logger.error(f"Dashboard hub failed to compute payload: {e}")
+                return
+            subscription.version = version
+            subscription.payload = payload
+            for queue in subscription.queues:
+                offer(queue, payload)
+
+    async def watch(self):
+        while self.subscriptions:
+            await asyncio.sleep(settings.DASHBOARD_HUB_POLL_INTERVAL)
+            subscriptions = list(self.subscriptions.values())
+            versions = await sync_to_async(cache.get_many)(
+                {version_key(s.branch_id) for s in subscriptions}
+            )
+            for subscription in subscriptions:
+                version = versions.get(version_key(subscription.branch_id))
+                if version != subscription.version:
+                    await self.refresh(subscription, version)
+
+
+_hubs = weakref.WeakKeyDictionary()
+
+
+def get_hub():
+    """The hub for the running event loop (one per process under ASGI)."""
+    loop = asyncio.get_running_loop()
+    hub = _hubs.get(loop)
+    if hub is None:
+        hub = _hubs[loop] = DashboardHub()
+    return hub
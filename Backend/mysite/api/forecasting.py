@@ -0,0 +1,85 @@
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+
+from .models import DemandForecast, ProductSalesRollup
+
+
+def daily_sales(start_date, end_date, branch_id=None):
+    """
+    Units sold per (branch, product) per day between the two dates, as
+    (pairs, matrix): row i of the matrix is pairs[i], one column per day.
+    Read from the product rollup, which is InvoiceItem quantities already
+    bucketed by business date.
+    """
+    rows = ProductSalesRollup.objects.filter(
+        business_date__gte=start_date,
+        business_date__lte=end_date,
+        product__is_deleted=False,
+    )
+    if branch_id:
+        rows = rows.filter(branch_id=branch_id)
+    rows = list(
+        rows.values_list("branch_id", "product_id", "business_date")
+        .annotate(quantity=Sum("quantity"))
+        .order_by()
+    )
+
+    pairs = sorted({row[:2] for row in rows})
+    index = {pair: i for i, pair in enumerate(pairs)}
+    matrix = np.zeros((len(pairs), (end_date - start_date).days + 1))
+    for row_branch_id, product_id, business_date, quantity in rows:
+        day = (business_date - start_date).days
+        matrix[index[(row_branch_id, product_id)], day] = quantity or 0
+    return pairs, matrix
+
+
+def weekday_forecast(history, alpha):
+    """
+    Exponentially smoothed forecast per row of `history` (oldest column
+    first), weighting the newest value by alpha, the one before by
+    alpha * (1 - alpha), and so on.
+    """
+    weights = alpha * (1 - alpha) ** np.arange(history.shape[1])[::-1]
+    return history @ weights / weights.sum()
+
+
+def forecast_demand(target_date, branch_id=None, weeks=None):
+    """
+    Forecast each product's sales on `target_date` from the same weekday
+    over the previous `weeks` weeks and store them as DemandForecast rows.
+    Products that did not sell in that window get no forecast.
+    Returns the number of forecasts written.
+    """
+    weeks = weeks or settings.FORECAST_HISTORY_WEEKS
+    start_date = target_date - timedelta(weeks=weeks)
+    end_date = target_date - timedelta(days=1)
+    pairs, matrix = daily_sales(start_date, end_date, branch_id)
+
+    # start_date falls on the target's weekday, so every 7th column does too
+    same_weekday = matrix[:, ::7]
+    expected = weekday_forecast(same_weekday, settings.FORECAST_SMOOTHING)
+    suggested = np.ceil(expected * (1 + settings.FORECAST_SAFETY_MARGIN))
+
+    forecasts = [
+        DemandForecast(
+            branch_id=pair_branch_id,
+            product_id=product_id,
+            forecast_date=target_date,
+            expected_quantity=round(float(expected[i]), 2),
+            suggested_quantity=int(suggested[i]),
+            history_days=same_weekday.shape[1],
+        )
+        for i, (pair_branch_id, product_id) in enumerate(pairs)
+    ]
+
+    with transaction.atomic():
+        stale = DemandForecast.objects.filter(forecast_date=target_date)
+        if branch_id:
+            stale = stale.filter(branch_id=branch_id)
+        stale.delete()
+        DemandForecast.objects.bulk_create(forecasts, batch_size=1000)
+    return len(forecasts)
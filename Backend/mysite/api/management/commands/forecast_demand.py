@@ -0,0 +1,28 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.forecasting import forecast_demand
+
+
+class Command(BaseCommand):
+    help = "Forecast per-product demand for the bake plan (run nightly)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--date",
+            type=date.fromisoformat,
+            help="Day to forecast (YYYY-MM-DD), defaults to tomorrow",
+        )
+        parser.add_argument("--branch", type=int, help="Only forecast this branch id")
+        parser.add_argument(
+            "--weeks", type=int, help="Weeks of history to use (FORECAST_HISTORY_WEEKS)"
+        )
+
+    def handle(self, *args, **options):
+        target_date = options["date"] or timezone.localdate() + timedelta(days=1)
+        written = forecast_demand(
+            target_date, branch_id=options["branch"], weeks=options["weeks"]
+        )
+        self.stdout.write(f"{written} forecast(s) for {target_date}")
@@ -0,0 +1,34 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from api.rollups import rebuild_branch_stats, rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute the sales, product and payment rollup tables and branch stats"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--branch", type=int, help="Only rebuild this branch id")
+        parser.add_argument(
+            "--start-date",
+            type=date.fromisoformat,
+            help="First business date (YYYY-MM-DD)",
+        )
+        parser.add_argument(
+            "--end-date",
+            type=date.fromisoformat,
+            help="Last business date (YYYY-MM-DD)",
+        )
+
+    def handle(self, *args, **options):
+        written = rebuild_rollups(
+            start_date=options["start_date"],
+            end_date=options["end_date"],
+            branch_id=options["branch"],
+        )
+        # Branch stats are lifetime totals, so they ignore the date range
+        branch = options["branch"]
+        written["branch stats"] = rebuild_branch_stats([branch] if branch else None)
+        for table, rows in written.items():
+            self.stdout.write(f"{table}: {rows} row(s)")
@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.outbox import prune_published, publish_pending, uses_in_memory_layer
+
+
+class Command(BaseCommand):
+    help = (
+        "Publish committed outbox events to the channel layer from a separate "
+        "process. The ASGI server already runs a relay; this is only useful "
+        "with a shared (Redis) channel layer."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=0.5,
+            help="Seconds to sleep when the outbox is empty",
+        )
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument(
+            "--once", action="store_true", help="Drain the outbox and exit"
+        )
+
+    def handle(self, *args, **options):
+        if uses_in_memory_layer():
+            raise CommandError(
+                "The channel layer is in-memory, so events published from this "
+                "process never reach the WebSocket consumers. Configure Redis "
+                "(REDIS_URL) or rely on the relay inside the ASGI server."
+            )
+
+        batch_size = options["batch_size"]
+        last_prune = 0.0
+
+        while True:
+            sent = publish_pending(batch_size=batch_size)
+            if sent:
+                self.stdout.write(f"Published {sent} event(s)")
+
+            if time.monotonic() - last_prune > 60:
+                prune_published()
+                last_prune = time.monotonic()
+
+            if sent == batch_size:
+                continue
+            if options["once"]:
+                break
+            time.sleep(options["interval"])
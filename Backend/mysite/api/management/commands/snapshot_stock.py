@@ -0,0 +1,31 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.stock import take_stock_snapshots
+
+
+class Command(BaseCommand):
+    help = "Record each product's closing stock for a business date (run nightly)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--date",
+            type=date.fromisoformat,
+            help="Business date to close (YYYY-MM-DD), defaults to yesterday",
+        )
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=1,
+            help="Also close the days before --date, oldest first (for backfills)",
+        )
+        parser.add_argument("--branch", type=int, help="Only snapshot this branch id")
+
+    def handle(self, *args, **options):
+        last_date = options["date"] or timezone.localdate() - timedelta(days=1)
+        for offset in range(options["days"] - 1, -1, -1):
+            business_date = last_date - timedelta(days=offset)
+            written = take_stock_snapshots(business_date, branch_id=options["branch"])
+            self.stdout.write(f"{written} snapshot(s) for {business_date}")
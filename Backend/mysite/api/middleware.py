@@ -18,3 +18,61 @@ class RateLimitHeadersMiddleware:
                         response['X-RateLimit-Remaining'] = str(remaining)
         
         return response
+
+
+class JWTQueryAuthMiddleware:
+    """
+    Channels middleware that authenticates WebSocket connections from a
+    `?token=<access token>` query parameter, like dashboard_sse does.
+    Connections without a token keep the session user from AuthMiddleware.
+    """
+
+    def __init__(self, inner):
+        self.inner = inner
+
+    async def __call__(self, scope, receive, send):
+        from urllib.parse import parse_qs
+
+        from channels.db import database_sync_to_async
+        from rest_framework_simplejwt.authentication import JWTAuthentication
+
+        token = parse_qs(scope.get("query_string", b"").decode()).get("token")
+        if token:
+            auth = JWTAuthentication()
+            try:
+                validated_token = auth.get_validated_token(token[0])
+                user = await database_sync_to_async(auth.get_user)(validated_token)
+                scope = dict(scope, user=user)
+            except Exception:
+                pass
+
+        return await self.inner(scope, receive, send)
+
+
+class OutboxRelayMiddleware:
+    """
+    ASGI wrapper that keeps this process's outbox relay running. It starts
+    at lifespan startup where the server sends one, and otherwise with the
+    first connection (daphne has no lifespan support).
+    """
+
+    def __init__(self, inner):
+        self.inner = inner
+
+    async def __call__(self, scope, receive, send):
+        from .outbox import get_relay
+
+        relay = get_relay()
+        relay.start()
+
+        if scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+                if message["type"] == "lifespan.startup":
+                    await send({"type": "lifespan.startup.complete"})
+                elif message["type"] == "lifespan.shutdown":
+                    await relay.stop()
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+
+        return await self.inner(scope, receive, send)
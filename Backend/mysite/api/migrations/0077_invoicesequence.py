@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:21
+
+import datetime
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def seed_invoice_sequences(apps, schema_editor):
+    """Start each (branch, date) counter after the highest number already issued."""
+    Invoice = apps.get_model("api", "Invoice")
+    InvoiceSequence = apps.get_model("api", "InvoiceSequence")
+
+    latest = {}
+    rows = Invoice.objects.exclude(invoice_number="").values_list(
+        "branch_id", "invoice_number"
+    )
+    for branch_id, number in rows.iterator(chunk_size=2000):
+        try:
+            prefix, seq = number.rsplit("-", 1)
+            business_date = datetime.date.fromisoformat(prefix[-10:])
+            seq = int(seq)
+        except (AttributeError, ValueError):
+            continue
+        key = (branch_id, business_date)
+        latest[key] = max(latest.get(key, 0), seq)
+
+    InvoiceSequence.objects.bulk_create(
+        [
+            InvoiceSequence(branch_id=branch_id, business_date=day, last_value=seq)
+            for (branch_id, day), seq in latest.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0076_notification_received_by'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InvoiceSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('business_date', models.DateField()),
+                ('last_value', models.PositiveIntegerField(default=0)),
+                ('branch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='invoice_sequences', to='api.branch')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('branch', 'business_date'), name='unique_invoice_sequence_per_branch_date')],
+            },
+        ),
+        migrations.RunPython(seed_invoice_sequences, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0078_outboxevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('business_date', models.DateField()),
+                ('hour', models.PositiveSmallIntegerField()),
+                ('payment_method', models.CharField(max_length=20)),
+                ('payment_count', models.IntegerField(default=0)),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('branch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payment_rollups', to='api.branch')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['business_date'], name='api_payment_busines_72b45e_idx')],
+                'constraints': [models.UniqueConstraint(fields=('branch', 'business_date', 'hour', 'payment_method'), name='unique_payment_rollup_bucket')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductSalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('business_date', models.DateField()),
+                ('hour', models.PositiveSmallIntegerField()),
+                ('quantity', models.IntegerField(default=0)),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('branch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='product_sales_rollups', to='api.branch')),
+                ('category', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='api.productcategory')),
+                ('kitchentype', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='api.kitchentype')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_rollups', to='api.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['business_date'], name='api_product_busines_7af3b9_idx')],
+                'constraints': [models.UniqueConstraint(fields=('branch', 'business_date', 'hour', 'product'), name='unique_product_sales_rollup_bucket')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('business_date', models.DateField()),
+                ('hour', models.PositiveSmallIntegerField()),
+                ('payment_status', models.CharField(max_length=15)),
+                ('invoice_count', models.IntegerField(default=0)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('branch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_rollups', to='api.branch')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['business_date'], name='api_salesro_busines_a21711_idx')],
+                'constraints': [models.UniqueConstraint(fields=('branch', 'business_date', 'hour', 'payment_status'), name='unique_sales_rollup_bucket')],
+            },
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:54
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min, Q, Sum
+
+
+def seed_branch_stats(apps, schema_editor):
+    """Lifetime revenue, staff count and manager for every existing branch."""
+    Branch = apps.get_model("api", "Branch")
+    BranchStats = apps.get_model("api", "BranchStats")
+
+    branches = Branch.objects.annotate(
+        staff_count=Count("branch_user", distinct=True),
+        manager_id=Min(
+            "branch_user__id", filter=Q(branch_user__user_type="BRANCH_MANAGER")
+        ),
+    )
+    revenue = dict(
+        Branch.objects.annotate(total=Sum("invoices__total_amount")).values_list(
+            "id", "total"
+        )
+    )
+    BranchStats.objects.bulk_create(
+        [
+            BranchStats(
+                branch_id=branch.id,
+                revenue=revenue.get(branch.id) or 0,
+                staff_count=branch.staff_count,
+                manager_id=branch.manager_id,
+            )
+            for branch in branches
+        ]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0079_sales_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BranchStats',
+            fields=[
+                ('branch', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='api.branch')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('staff_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('manager', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(seed_branch_stats, migrations.RunPython.noop),
+    ]
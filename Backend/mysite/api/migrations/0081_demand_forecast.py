@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0080_branch_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DemandForecast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('forecast_date', models.DateField()),
+                ('expected_quantity', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('suggested_quantity', models.PositiveIntegerField()),
+                ('history_days', models.PositiveSmallIntegerField(default=0)),
+                ('generated_at', models.DateTimeField(auto_now=True)),
+                ('branch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='demand_forecasts', to='api.branch')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='demand_forecasts', to='api.product')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('branch', 'forecast_date', 'product'), name='unique_demand_forecast')],
+            },
+        ),
+    ]
@@ -0,0 +1,49 @@
+from django.db import migrations, models
+
+
+def backfill_deltas(apps, schema_editor):
+    """
+    Turn the stored running balances into signed deltas: each movement's
+    delta is its balance minus the one before it for the same product.
+    """
+    ItemActivity = apps.get_model("api", "ItemActivity")
+
+    updated = []
+    product_id, previous = None, 0
+    rows = ItemActivity.objects.order_by("product_id", "created_at", "id").only(
+        "id", "product_id", "quantity"
+    )
+    for activity in rows.iterator(chunk_size=2000):
+        if activity.product_id != product_id:
+            product_id, previous = activity.product_id, 0
+        activity.delta = activity.quantity - previous
+        previous = activity.quantity
+        updated.append(activity)
+        if len(updated) == 2000:
+            ItemActivity.objects.bulk_update(updated, ["delta"])
+            updated = []
+    ItemActivity.objects.bulk_update(updated, ["delta"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0081_demand_forecast'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='itemactivity',
+            name='delta',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_deltas, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='itemactivity',
+            name='quantity',
+        ),
+        migrations.AddIndex(
+            model_name='itemactivity',
+            index=models.Index(fields=['product', 'created_at'], name='api_itemact_product_ae0479_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0082_item_activity_delta'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('business_date', models.DateField()),
+                ('quantity', models.IntegerField()),
+                ('created_at', models.DateTimeField(auto_now=True)),
+                ('branch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_snapshots', to='api.branch')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_snapshots', to='api.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['branch', 'business_date'], name='api_stocksn_branch__0564c7_idx')],
+                'constraints': [models.UniqueConstraint(fields=('product', 'business_date'), name='unique_stock_snapshot')],
+            },
+        ),
+    ]
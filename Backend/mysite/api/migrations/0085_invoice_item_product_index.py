@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0084_stock_alert'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='invoiceitem',
+            index=models.Index(fields=['product', 'created_at'], name='api_invoice_product_29a533_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_seq(apps, schema_editor):
+    """
+    Already-published events were replayed by id; keep those numbers as
+    their seq so clients reconnecting with an old `last_seq` still resume.
+    """
+    OutboxEvent = apps.get_model("api", "OutboxEvent")
+    OutboxEvent.objects.filter(published_at__isnull=False).update(seq=F("id"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0085_invoice_item_product_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboxevent',
+            name='seq',
+            field=models.PositiveBigIntegerField(blank=True, null=True, unique=True),
+        ),
+        migrations.RunPython(backfill_seq, migrations.RunPython.noop),
+    ]
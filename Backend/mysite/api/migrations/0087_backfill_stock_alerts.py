@@ -0,0 +1,46 @@
+from django.db import migrations
+from django.db.models import F
+
+
+def open_existing_alerts(apps, schema_editor):
+    """
+    Alerts are raised when stock changes; open them for products that were
+    already at or below their low_stock_bar when alerts were introduced.
+    """
+    Product = apps.get_model("api", "Product")
+    StockAlert = apps.get_model("api", "StockAlert")
+
+    already_open = set(
+        StockAlert.objects.filter(resolved_at__isnull=True).values_list(
+            "product_id", flat=True
+        )
+    )
+    low = Product.objects.filter(
+        is_deleted=False, product_quantity__lte=F("low_stock_bar")
+    ).values_list(
+        "id", "branch_id", "category__branch_id", "product_quantity", "low_stock_bar"
+    )
+    StockAlert.objects.bulk_create(
+        [
+            StockAlert(
+                product_id=product_id,
+                branch_id=branch_id or category_branch_id,
+                quantity=quantity,
+                low_stock_bar=low_stock_bar,
+            )
+            for product_id, branch_id, category_branch_id, quantity, low_stock_bar in low
+            if product_id not in already_open and (branch_id or category_branch_id)
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0086_outbox_event_seq'),
+    ]
+
+    operations = [
+        migrations.RunPython(open_existing_alerts, migrations.RunPython.noop),
+    ]
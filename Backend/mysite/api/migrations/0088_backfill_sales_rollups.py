@@ -0,0 +1,116 @@
+from django.db import migrations
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Max, Sum
+from django.db.models.functions import ExtractHour, TruncDate
+
+
+def backfill_sales_rollups(apps, schema_editor):
+    """
+    Build the rollup tables from every existing invoice, item and payment;
+    they were only fed by new writes. Same grouping as rebuild_rollups.
+    """
+    Invoice = apps.get_model("api", "Invoice")
+    InvoiceItem = apps.get_model("api", "InvoiceItem")
+    Payment = apps.get_model("api", "Payment")
+    SalesRollup = apps.get_model("api", "SalesRollup")
+    ProductSalesRollup = apps.get_model("api", "ProductSalesRollup")
+    PaymentRollup = apps.get_model("api", "PaymentRollup")
+
+    invoices = Invoice.objects.all()
+    line_total = ExpressionWrapper(
+        F("quantity") * F("unit_price") - F("discount_amount"),
+        output_field=DecimalField(max_digits=12, decimal_places=2),
+    )
+
+    sales = (
+        invoices.annotate(
+            business_date=TruncDate("created_at"), hour=ExtractHour("created_at")
+        )
+        .values("branch_id", "business_date", "hour", "payment_status")
+        .annotate(invoice_count=Count("id"), total=Sum("total_amount"))
+        .order_by()
+    )
+    items = (
+        InvoiceItem.objects.filter(invoice__in=invoices, product__isnull=False)
+        .annotate(
+            business_date=TruncDate("invoice__created_at"),
+            hour=ExtractHour("invoice__created_at"),
+        )
+        .values("invoice__branch_id", "business_date", "hour", "product_id")
+        .annotate(
+            total_quantity=Sum("quantity"),
+            total=Sum(line_total),
+            category_id=Max("product__category_id"),
+            kitchentype_id=Max("product__category__kitchentype_id"),
+        )
+        .order_by()
+    )
+    payments = (
+        Payment.objects.filter(invoice__in=invoices)
+        .annotate(
+            business_date=TruncDate("invoice__created_at"),
+            hour=ExtractHour("invoice__created_at"),
+        )
+        .values("invoice__branch_id", "business_date", "hour", "payment_method")
+        .annotate(count=Count("id"), total=Sum("amount"))
+        .order_by()
+    )
+
+    # Replaces whatever new writes added since 0079, which the groups include
+    for model in (SalesRollup, ProductSalesRollup, PaymentRollup):
+        model.objects.all().delete()
+
+    SalesRollup.objects.bulk_create(
+        [
+            SalesRollup(
+                branch_id=row["branch_id"],
+                business_date=row["business_date"],
+                hour=row["hour"],
+                payment_status=row["payment_status"],
+                invoice_count=row["invoice_count"],
+                total_amount=row["total"] or 0,
+            )
+            for row in sales
+        ],
+        batch_size=1000,
+    )
+    ProductSalesRollup.objects.bulk_create(
+        [
+            ProductSalesRollup(
+                branch_id=row["invoice__branch_id"],
+                business_date=row["business_date"],
+                hour=row["hour"],
+                product_id=row["product_id"],
+                category_id=row["category_id"],
+                kitchentype_id=row["kitchentype_id"],
+                quantity=row["total_quantity"] or 0,
+                amount=row["total"] or 0,
+            )
+            for row in items
+        ],
+        batch_size=1000,
+    )
+    PaymentRollup.objects.bulk_create(
+        [
+            PaymentRollup(
+                branch_id=row["invoice__branch_id"],
+                business_date=row["business_date"],
+                hour=row["hour"],
+                payment_method=row["payment_method"],
+                payment_count=row["count"],
+                amount=row["total"] or 0,
+            )
+            for row in payments
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0087_backfill_stock_alerts'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_sales_rollups, migrations.RunPython.noop),
+    ]
@@ -2,7 +2,9 @@ import uuid
 from decimal import Decimal
 
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, models
+from django.db.models import F, Q, Sum, Window
 from django.db.models.base import CASCADE
 from django.utils import timezone
 
@@ -227,6 +229,47 @@ class Invoice(models.Model):
         return Decimal(str(self.total_amount)) - Decimal(str(self.paid_amount))
 
 
+class InvoiceSequence(models.Model):
+    """
+    Per-branch, per-business-date invoice counter.
+    Numbers are allocated with a single upsert instead of scanning Invoice.
+    """
+
+    branch = models.ForeignKey(
+        Branch, on_delete=models.CASCADE, related_name="invoice_sequences"
+    )
+    business_date = models.DateField()
+    last_value = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["branch", "business_date"],
+                name="unique_invoice_sequence_per_branch_date",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.branch_id} {self.business_date}: {self.last_value}"
+
+    @classmethod
+    def next_value(cls, branch_id, business_date):
+        """Atomically increment and return the counter for (branch, date)."""
+        table = cls._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {table} (branch_id, business_date, last_value)
+                VALUES (%s, %s, 1)
+                ON CONFLICT (branch_id, business_date)
+                DO UPDATE SET last_value = {table}.last_value + 1
+                RETURNING last_value
+                """,
+                [branch_id, business_date],
+            )
+            return cursor.fetchone()[0]
+
+
 class InvoiceItem(models.Model):
     invoice = models.ForeignKey(Invoice, on_delete=models.CASCADE, related_name="bills")
     product = models.ForeignKey(
@@ -245,6 +288,7 @@ class InvoiceItem(models.Model):
         ordering = ["created_at"]
         indexes = [
             models.Index(fields=["invoice"]),
+            models.Index(fields=["product", "created_at"]),
         ]
 
     def __str__(self):
@@ -299,10 +343,28 @@ class Payment(models.Model):
         return f"Payment {self.amount} - {self.invoice.invoice_number}"  # models.py
 
 
+class ItemActivityQuerySet(models.QuerySet):
+    def with_balance(self):
+        """Annotate `balance`: the product's stock right after each movement."""
+        return self.annotate(
+            balance=Window(
+                Sum("delta"),
+                partition_by=[F("product_id")],
+                order_by=[F("created_at").asc(), F("id").asc()],
+            )
+        )
+
+
 class ItemActivity(models.Model):
+    """
+    Stock ledger. Each row stores its signed effect on stock (`delta`);
+    running balances are summed from the deltas when read, so correcting
+    one movement only rewrites that row and the product's quantity.
+    """
+
     created_at = models.DateTimeField(auto_now_add=True)
     change = models.CharField(max_length=200)
-    quantity = models.IntegerField(default=0)
+    delta = models.IntegerField(default=0)
     product = models.ForeignKey(
         Product,
         on_delete=models.PROTECT,
@@ -324,6 +386,92 @@ class ItemActivity(models.Model):
     types = models.CharField(max_length=50, choices=TYPE_CHOICES)
     remarks = models.TextField(blank=True)
 
+    objects = ItemActivityQuerySet.as_manager()
+
+    class Meta:
+        indexes = [models.Index(fields=["product", "created_at"])]
+
+    def running_balance(self):
+        """Stock of the product right after this movement."""
+        upto = Q(created_at__lt=self.created_at) | Q(
+            created_at=self.created_at, id__lte=self.id
+        )
+        return (
+            ItemActivity.objects.filter(upto, product_id=self.product_id).aggregate(
+                total=Sum("delta")
+            )["total"]
+            or 0
+        )
+
+
+class StockSnapshot(models.Model):
+    """
+    Closing stock of a product at the end of a business date: the sum of
+    its ledger deltas up to local midnight. Written by the snapshot_stock
+    command, so stock at any past moment is the nearest earlier snapshot
+    plus the movements since, instead of a replay of the whole ledger.
+    """
+
+    branch = models.ForeignKey(
+        Branch, on_delete=models.CASCADE, related_name="stock_snapshots"
+    )
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="stock_snapshots"
+    )
+    business_date = models.DateField()
+    quantity = models.IntegerField()
+    created_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["product", "business_date"], name="unique_stock_snapshot"
+            )
+        ]
+        indexes = [models.Index(fields=["branch", "business_date"])]
+
+    def __str__(self):
+        return f"{self.product} on {self.business_date}: {self.quantity}"
+
+
+class StockAlert(models.Model):
+    """
+    A product at or below its low_stock_bar. Opened when a stock change
+    takes it there and resolved once stock is back above the bar; at most
+    one alert per product is open at a time.
+    """
+
+    branch = models.ForeignKey(
+        Branch, on_delete=models.CASCADE, related_name="stock_alerts"
+    )
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="stock_alerts"
+    )
+    # Stock and threshold when the alert was raised
+    quantity = models.IntegerField()
+    low_stock_bar = models.IntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    resolved_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["product"],
+                condition=models.Q(resolved_at__isnull=True),
+                name="unique_open_stock_alert",
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=["branch", "created_at"],
+                condition=models.Q(resolved_at__isnull=True),
+                name="stock_alert_open_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.product} low at {self.quantity} (bar {self.low_stock_bar})"
+
 
 class Notification(models.Model):
     invoice = models.ForeignKey(Invoice, on_delete=models.CASCADE, related_name='notifications')
@@ -336,3 +484,240 @@ class Notification(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+
+
+class OutboxEvent(models.Model):
+    """
+    Channel-layer message written in the same transaction as the change it
+    announces. The outbox relay publishes it after commit and stamps
+    `seq`, the publish order clients replay from. The id can't serve: it is
+    assigned at insert, so a lower id may commit (and publish) later.
+    """
+
+    branch = models.ForeignKey(
+        Branch,
+        on_delete=models.CASCADE,
+        related_name="outbox_events",
+        null=True,
+        blank=True,
+    )
+    groups = models.JSONField(default=list)
+    payload = models.JSONField(encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    published_at = models.DateTimeField(null=True, blank=True)
+    seq = models.PositiveBigIntegerField(null=True, blank=True, unique=True)
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [
+            models.Index(
+                fields=["id"],
+                condition=models.Q(published_at__isnull=True),
+                name="outbox_unpublished_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.payload.get('type')} -> {', '.join(self.groups)}"
+
+
+class Rollup(models.Model):
+    """
+    Base for pre-aggregated reporting tables.
+
+    Subclasses name their bucket columns in KEY_FIELDS (covered by a unique
+    constraint), additive columns in SUM_FIELDS and descriptive columns in
+    ATTR_FIELDS, which keep the latest value written.
+    """
+
+    KEY_FIELDS = ()
+    SUM_FIELDS = ()
+    ATTR_FIELDS = ()
+
+    business_date = models.DateField()
+    hour = models.PositiveSmallIntegerField()
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def add(cls, rows):
+        """
+        Add signed deltas to many buckets with one upsert.
+        `rows` maps a KEY_FIELDS tuple -> {field: value} for SUM/ATTR fields.
+        Rows are written in key order, so concurrent upserts lock shared
+        buckets in the same order and can't deadlock on each other.
+        """
+        rows = {
+            key: values
+            for key, values in sorted(
+                rows.items(), key=lambda row: [(k is None, k) for k in row[0]]
+            )
+            if any(values.get(field) for field in cls.SUM_FIELDS)
+        }
+        if not rows:
+            return
+
+        table = cls._meta.db_table
+        column = {f: cls._meta.get_field(f).column for f in cls.KEY_FIELDS}
+        column.update(
+            {f: cls._meta.get_field(f).column for f in cls.SUM_FIELDS + cls.ATTR_FIELDS}
+        )
+        fields = cls.KEY_FIELDS + cls.SUM_FIELDS + cls.ATTR_FIELDS
+        updates = [
+            f"{column[f]} = {table}.{column[f]} + EXCLUDED.{column[f]}"
+            for f in cls.SUM_FIELDS
+        ]
+        updates += [f"{column[f]} = EXCLUDED.{column[f]}" for f in cls.ATTR_FIELDS]
+
+        params = []
+        for key, values in rows.items():
+            params += list(key)
+            params += [values.get(f, 0) for f in cls.SUM_FIELDS]
+            params += [values.get(f) for f in cls.ATTR_FIELDS]
+        row = "(" + ", ".join(["%s"] * len(fields)) + ")"
+        placeholders = ", ".join([row] * len(rows))
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {table} ({", ".join(column[f] for f in fields)})
+                VALUES {placeholders}
+                ON CONFLICT ({", ".join(column[f] for f in cls.KEY_FIELDS)})
+                DO UPDATE SET {", ".join(updates)}
+                """,
+                params,
+            )
+
+
+class SalesRollup(Rollup):
+    """Invoice count and total per branch, business date, hour and payment status."""
+
+    KEY_FIELDS = ("branch", "business_date", "hour", "payment_status")
+    SUM_FIELDS = ("invoice_count", "total_amount")
+
+    branch = models.ForeignKey(
+        Branch, on_delete=models.CASCADE, related_name="sales_rollups"
+    )
+    payment_status = models.CharField(max_length=15)
+    invoice_count = models.IntegerField(default=0)
+    total_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["branch", "business_date", "hour", "payment_status"],
+                name="unique_sales_rollup_bucket",
+            )
+        ]
+        indexes = [models.Index(fields=["business_date"])]
+
+
+class ProductSalesRollup(Rollup):
+    """Quantity and line total sold per branch, business date, hour and product."""
+
+    KEY_FIELDS = ("branch", "business_date", "hour", "product")
+    SUM_FIELDS = ("quantity", "amount")
+    ATTR_FIELDS = ("category", "kitchentype")
+
+    branch = models.ForeignKey(
+        Branch, on_delete=models.CASCADE, related_name="product_sales_rollups"
+    )
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="sales_rollups"
+    )
+    category = models.ForeignKey(
+        ProductCategory, on_delete=models.SET_NULL, null=True, related_name="+"
+    )
+    kitchentype = models.ForeignKey(
+        Kitchentype, on_delete=models.SET_NULL, null=True, related_name="+"
+    )
+    quantity = models.IntegerField(default=0)
+    amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["branch", "business_date", "hour", "product"],
+                name="unique_product_sales_rollup_bucket",
+            )
+        ]
+        indexes = [models.Index(fields=["business_date"])]
+
+
+class PaymentRollup(Rollup):
+    """
+    Payments per branch and payment method, bucketed by the business date
+    and hour of their invoice (reports filter payments by invoice date).
+    """
+
+    KEY_FIELDS = ("branch", "business_date", "hour", "payment_method")
+    SUM_FIELDS = ("payment_count", "amount")
+
+    branch = models.ForeignKey(
+        Branch, on_delete=models.CASCADE, related_name="payment_rollups"
+    )
+    payment_method = models.CharField(max_length=20)
+    payment_count = models.IntegerField(default=0)
+    amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["branch", "business_date", "hour", "payment_method"],
+                name="unique_payment_rollup_bucket",
+            )
+        ]
+        indexes = [models.Index(fields=["business_date"])]
+
+
+class BranchStats(models.Model):
+    """
+    Running totals for the branch list, kept current by the invoice and user
+    signals instead of aggregating every branch's history on each request.
+    rebuild_sales_rollups recomputes them from scratch.
+    """
+
+    branch = models.OneToOneField(
+        Branch, on_delete=models.CASCADE, primary_key=True, related_name="stats"
+    )
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    staff_count = models.PositiveIntegerField(default=0)
+    manager = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.branch} stats"
+
+
+class DemandForecast(models.Model):
+    """
+    Expected sales of a product on a date, written nightly by the
+    forecast_demand command and read by the bake plan endpoint.
+    """
+
+    branch = models.ForeignKey(
+        Branch, on_delete=models.CASCADE, related_name="demand_forecasts"
+    )
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="demand_forecasts"
+    )
+    forecast_date = models.DateField()
+    expected_quantity = models.DecimalField(max_digits=10, decimal_places=2)
+    suggested_quantity = models.PositiveIntegerField()
+    # Same-weekday days of history the forecast was based on
+    history_days = models.PositiveSmallIntegerField(default=0)
+    generated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["branch", "forecast_date", "product"],
+                name="unique_demand_forecast",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.product} on {self.forecast_date}: {self.suggested_quantity}"
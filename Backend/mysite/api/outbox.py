@@ -0,0 +1,185 @@
+import asyncio
+import logging
+import time
+import weakref
+
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.layers import InMemoryChannelLayer, get_channel_layer
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_broadcast(message, groups, branch_id=None):
+    """
+    Queue a channel-layer message for `groups`.
+    Must be called inside the transaction that makes the change, so the
+    message is only published if that transaction commits.
+    """
+    event = OutboxEvent.objects.create(
+        branch_id=branch_id, groups=list(groups), payload=message
+    )
+    transaction.on_commit(wake_relays)
+    return event
+
+
+def latest_seq():
+    """The highest seq published so far (0 before the first event)."""
+    return OutboxEvent.objects.aggregate(last=Max("seq"))["last"] or 0
+
+
+def publish_pending(batch_size=100):
+    """
+    Publish one batch of unpublished events. Returns how many were sent.
+
+    Each event is stamped with the next `seq` as it goes out, so seq order is
+    publish order even when events commit out of id order. The lock is a
+    plain FOR UPDATE (no SKIP LOCKED) so concurrent relays take turns and
+    never hand out overlapping numbers.
+    """
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return 0
+
+    with transaction.atomic():
+        events = list(
+            OutboxEvent.objects.select_for_update()
+            .filter(published_at__isnull=True)
+            .order_by("id")[:batch_size]
+        )
+        if not events:
+            return 0
+
+        last_seq = latest_seq()
+        published_at = timezone.now()
+        for seq, event in enumerate(events, start=last_seq + 1):
+            event.seq = seq
+            event.published_at = published_at
+        OutboxEvent.objects.bulk_update(events, ["seq", "published_at"])
+
+        for event in events:
+            for group in event.groups:
+                try:
+                    async_to_sync(channel_layer.group_send)(
+                        group, dict(event.payload, seq=event.seq)
+                    )
+                except Exception as e:
+                    logger.error(f"Outbox event {event.id} failed for {group}: {e}")
+
+    return len(events)
+
+
+def prune_published():
+    """
+    Trim the published event log: drop events older than OUTBOX_RETENTION
+    and keep at most EVENT_LOG_MAX_PER_BRANCH events per branch.
+    Reconnecting clients can only replay what is left.
+    """
+    cutoff = timezone.now() - settings.OUTBOX_RETENTION
+    published = OutboxEvent.objects.filter(published_at__isnull=False)
+    deleted, _ = published.filter(published_at__lt=cutoff).delete()
+
+    keep = settings.EVENT_LOG_MAX_PER_BRANCH
+    branch_ids = published.values_list("branch_id", flat=True).distinct()
+    for branch_id in list(branch_ids):
+        oldest_kept = (
+            published.filter(branch_id=branch_id)
+            .order_by("-seq")
+            .values_list("seq", flat=True)[keep - 1 : keep]
+            .first()
+        )
+        if oldest_kept:
+            count, _ = published.filter(
+                branch_id=branch_id, seq__lt=oldest_kept
+            ).delete()
+            deleted += count
+
+    return deleted
+
+
+def uses_in_memory_layer():
+    """True when the channel layer only reaches consumers in this process."""
+    return isinstance(get_channel_layer(), InMemoryChannelLayer)
+
+
+class OutboxRelay:
+    """
+    Publishes the outbox from inside the ASGI process, so events reach this
+    process's consumers even on the in-memory channel layer.
+
+    A commit in this process wakes the relay right away (wake_relays);
+    events committed elsewhere (another worker, a management command) are
+    picked up by polling every OUTBOX_RELAY_INTERVAL seconds. Relays in
+    several processes take turns on publish_pending's row lock.
+    """
+
+    def __init__(self):
+        self.task = None
+        self.loop = None
+        self.wakeup = None
+
+    def start(self):
+        if self.task is None or self.task.done():
+            self.loop = asyncio.get_running_loop()
+            self.wakeup = asyncio.Event()
+            self.task = self.loop.create_task(self.run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    def wake(self):
+        """Thread-safe: publish now instead of at the next poll."""
+        if self.task is not None and not self.task.done():
+            self.loop.call_soon_threadsafe(self.wakeup.set)
+
+    async def run(self):
+        batch_size = settings.OUTBOX_RELAY_BATCH_SIZE
+        last_prune = 0.0
+        while True:
+            self.wakeup.clear()
+            try:
+                sent = await database_sync_to_async(publish_pending)(batch_size)
+                if time.monotonic() - last_prune > 60:
+                    await database_sync_to_async(prune_published)()
+                    last_prune = time.monotonic()
+            except Exception as e:
+                logger.error(f"Outbox relay failed: {e}")
+                sent = 0
+
+            if sent == batch_size:
+                continue
+            try:
+                await asyncio.wait_for(
+                    self.wakeup.wait(), timeout=settings.OUTBOX_RELAY_INTERVAL
+                )
+            except asyncio.TimeoutError:
+                pass
+
+
+_relays = weakref.WeakKeyDictionary()
+
+
+def get_relay():
+    """The relay for the running event loop (one per process under ASGI)."""
+    loop = asyncio.get_running_loop()
+    relay = _relays.get(loop)
+    if relay is None:
+        relay = _relays[loop] = OutboxRelay()
+    return relay
+
+
+def wake_relays():
+    for relay in list(_relays.values()):
+        relay.wake()
@@ -0,0 +1,361 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import (
+    Count,
+    DecimalField,
+    ExpressionWrapper,
+    F,
+    Max,
+    Min,
+    Q,
+    Sum,
+)
+from django.db.models.functions import ExtractHour, TruncDate
+from django.utils import timezone
+
+from .models import (
+    Branch,
+    BranchStats,
+    Invoice,
+    InvoiceItem,
+    Payment,
+    PaymentRollup,
+    Product,
+    ProductSalesRollup,
+    SalesRollup,
+    User,
+)
+
+LINE_TOTAL = ExpressionWrapper(
+    F("quantity") * F("unit_price") - F("discount_amount"),
+    output_field=DecimalField(max_digits=12, decimal_places=2),
+)
+
+
+def business_bucket(created_at):
+    """(business date, hour) of a timestamp in the local timezone."""
+    local = timezone.localtime(created_at)
+    return local.date(), local.hour
+
+
+# ------------------ Snapshots ------------------
+# Taken at post_init/post_save so a later save or delete knows which
+# bucket the row used to count in, and by how much.
+
+
+def loaded_values(instance, *fields):
+    """Field values already loaded on `instance`, or None if any is deferred."""
+    values = instance.__dict__
+    if not all(field in values for field in fields):
+        return None
+    return [values[field] for field in fields]
+
+
+def invoice_state(invoice):
+    values = loaded_values(
+        invoice, "branch_id", "created_at", "payment_status", "total_amount"
+    )
+    if values is None:
+        return None
+    branch_id, created_at, payment_status, total_amount = values
+    return branch_id, created_at, payment_status, Decimal(str(total_amount or 0))
+
+
+def item_state(item):
+    values = loaded_values(
+        item, "invoice_id", "product_id", "quantity", "unit_price", "discount_amount"
+    )
+    if values is None:
+        return None
+    invoice_id, product_id, quantity, unit_price, discount_amount = values
+    amount = Decimal(str(quantity or 0)) * Decimal(str(unit_price or 0))
+    amount -= Decimal(str(discount_amount or 0))
+    return invoice_id, product_id, quantity or 0, amount
+
+
+def payment_state(payment):
+    values = loaded_values(payment, "invoice_id", "payment_method", "amount")
+    if values is None:
+        return None
+    invoice_id, payment_method, amount = values
+    return invoice_id, payment_method, Decimal(str(amount or 0))
+
+
+# ------------------ Incremental updates ------------------
+# Deltas are upserted inside the writing transaction, so the rollups commit
+# or roll back with the sale and never drift from the invoices. Rollup.add
+# writes buckets in key order; checkouts in the same bucket queue on its
+# row until they commit.
+
+
+def invoice_buckets(invoice_ids):
+    """invoice id -> (branch id, created_at) for the given invoices."""
+    return {
+        row[0]: row[1:]
+        for row in Invoice.objects.filter(id__in=invoice_ids).values_list(
+            "id", "branch_id", "created_at"
+        )
+    }
+
+
+def record_invoice_change(old, new):
+    """Move an invoice from its `old` state to its `new` one (either may be None)."""
+    rows = defaultdict(lambda: {"invoice_count": 0, "total_amount": Decimal("0")})
+    for state, sign in ((old, -1), (new, 1)):
+        if state is None:
+            continue
+        branch_id, created_at, payment_status, total_amount = state
+        key = (branch_id, *business_bucket(created_at), payment_status)
+        rows[key]["invoice_count"] += sign
+        rows[key]["total_amount"] += sign * total_amount
+    SalesRollup.add(rows)
+
+
+def record_item_lines(lines):
+    """
+    Add invoice lines to the product rollup.
+    `lines` is a list of (invoice_id, product_id, quantity, amount) tuples;
+    pass negative quantity and amount to remove a line.
+    """
+    lines = [line for line in lines if line[1]]
+    if not lines:
+        return
+
+    invoices = invoice_buckets({line[0] for line in lines})
+    products = Product.objects.filter(id__in={line[1] for line in lines})
+    products = {
+        row[0]: row[1:]
+        for row in products.values_list("id", "category_id", "category__kitchentype_id")
+    }
+
+    rows = defaultdict(lambda: {"quantity": 0, "amount": Decimal("0")})
+    for invoice_id, product_id, quantity, amount in lines:
+        if invoice_id not in invoices or product_id not in products:
+            continue
+        branch_id, created_at = invoices[invoice_id]
+        category_id, kitchentype_id = products[product_id]
+        row = rows[(branch_id, *business_bucket(created_at), product_id)]
+        row["quantity"] += quantity
+        row["amount"] += amount
+        row["category"] = category_id
+        row["kitchentype"] = kitchentype_id
+    ProductSalesRollup.add(rows)
+
+
+def record_items(items, sign=1):
+    """Add (or with sign=-1 remove) saved InvoiceItem rows, e.g. after bulk_create."""
+    record_item_lines(
+        [
+            (invoice_id, product_id, sign * quantity, sign * amount)
+            for invoice_id, product_id, quantity, amount in filter(
+                None, (item_state(item) for item in items)
+            )
+        ]
+    )
+
+
+def record_payment_change(old, new):
+    """Move a payment from its `old` state to its `new` one (either may be None)."""
+    states = [(state, sign) for state, sign in ((old, -1), (new, 1)) if state]
+    if not states:
+        return
+
+    invoices = invoice_buckets({state[0] for state, _ in states})
+
+    rows = defaultdict(lambda: {"payment_count": 0, "amount": Decimal("0")})
+    for (invoice_id, payment_method, amount), sign in states:
+        if invoice_id not in invoices:
+            continue
+        branch_id, created_at = invoices[invoice_id]
+        key = (branch_id, *business_bucket(created_at), payment_method)
+        rows[key]["payment_count"] += sign
+        rows[key]["amount"] += sign * amount
+    PaymentRollup.add(rows)
+
+
+# ------------------ Branch stats ------------------
+
+
+def record_branch_revenue(old, new):
+    """
+    Move an invoice's total between branch revenue counters (old and new
+    states), in the writing transaction like the rollups. A checkout gets
+    here from its final invoice save, after the stock locks.
+    """
+    deltas = defaultdict(Decimal)
+    for state, sign in ((old, -1), (new, 1)):
+        if state is not None:
+            deltas[state[0]] += sign * state[3]
+    for branch_id, delta in sorted(deltas.items()):
+        if not delta:
+            continue
+        updated = BranchStats.objects.filter(branch_id=branch_id).update(
+            revenue=F("revenue") + delta
+        )
+        if not updated:
+            rebuild_branch_stats([branch_id])
+
+
+def refresh_branch_staff(branch_ids):
+    """Recount staff and pick the manager for each of `branch_ids`."""
+    for branch_id in set(branch_ids) - {None}:
+        users = User.objects.filter(branch_id=branch_id)
+        manager_id = (
+            users.filter(user_type="BRANCH_MANAGER")
+            .order_by("id")
+            .values_list("id", flat=True)
+            .first()
+        )
+        updated = BranchStats.objects.filter(branch_id=branch_id).update(
+            staff_count=users.count(), manager_id=manager_id
+        )
+        if not updated:
+            rebuild_branch_stats([branch_id])
+
+
+def rebuild_branch_stats(branch_ids=None):
+    """Recompute BranchStats from invoices and users. Returns the rows written."""
+    branches = Branch.objects.all()
+    if branch_ids is not None:
+        branches = branches.filter(id__in=branch_ids)
+    revenue = dict(
+        branches.annotate(total=Sum("invoices__total_amount")).values_list(
+            "id", "total"
+        )
+    )
+    staff = branches.annotate(
+        staff_count=Count("branch_user", distinct=True),
+        manager_id=Min(
+            "branch_user__id", filter=Q(branch_user__user_type="BRANCH_MANAGER")
+        ),
+    ).values_list("id", "staff_count", "manager_id")
+
+    rows = 0
+    for branch_id, staff_count, manager_id in staff:
+        BranchStats.objects.update_or_create(
+            branch_id=branch_id,
+            defaults={
+                "revenue": revenue.get(branch_id) or 0,
+                "staff_count": staff_count,
+                "manager_id": manager_id,
+            },
+        )
+        rows += 1
+    return rows
+
+
+# ------------------ Rebuild ------------------
+
+
+def rebuild_rollups(start_date=None, end_date=None, branch_id=None):
+    """
+    Recompute the rollup tables from Invoice, InvoiceItem and Payment,
+    optionally limited to a branch and/or a range of business dates.
+    Returns the number of rows written per table.
+    """
+    from .views_dir.dashboard_view import local_datetime_range
+
+    invoices = Invoice.objects.all()
+    rollup_filter = {}
+    if branch_id:
+        invoices = invoices.filter(branch_id=branch_id)
+        rollup_filter["branch_id"] = branch_id
+    if start_date or end_date:
+        start, end = local_datetime_range(
+            start_date or end_date, end_date or start_date
+        )
+        if start_date:
+            invoices = invoices.filter(created_at__gte=start)
+            rollup_filter["business_date__gte"] = start_date
+        if end_date:
+            invoices = invoices.filter(created_at__lt=end)
+            rollup_filter["business_date__lte"] = end_date
+
+    sales = (
+        invoices.annotate(
+            business_date=TruncDate("created_at"), hour=ExtractHour("created_at")
+        )
+        .values("branch_id", "business_date", "hour", "payment_status")
+        .annotate(invoice_count=Count("id"), total=Sum("total_amount"))
+        .order_by()
+    )
+    items = (
+        InvoiceItem.objects.filter(invoice__in=invoices, product__isnull=False)
+        .annotate(
+            business_date=TruncDate("invoice__created_at"),
+            hour=ExtractHour("invoice__created_at"),
+        )
+        .values("invoice__branch_id", "business_date", "hour", "product_id")
+        .annotate(
+            total_quantity=Sum("quantity"),
+            total=Sum(LINE_TOTAL),
+            category_id=Max("product__category_id"),
+            kitchentype_id=Max("product__category__kitchentype_id"),
+        )
+        .order_by()
+    )
+    payments = (
+        Payment.objects.filter(invoice__in=invoices)
+        .annotate(
+            business_date=TruncDate("invoice__created_at"),
+            hour=ExtractHour("invoice__created_at"),
+        )
+        .values("invoice__branch_id", "business_date", "hour", "payment_method")
+        .annotate(count=Count("id"), total=Sum("amount"))
+        .order_by()
+    )
+
+    with transaction.atomic():
+        for model in (SalesRollup, ProductSalesRollup, PaymentRollup):
+            model.objects.filter(**rollup_filter).delete()
+
+        written = {
+            "sales": SalesRollup.objects.bulk_create(
+                [
+                    SalesRollup(
+                        branch_id=row["branch_id"],
+                        business_date=row["business_date"],
+                        hour=row["hour"],
+                        payment_status=row["payment_status"],
+                        invoice_count=row["invoice_count"],
+                        total_amount=row["total"] or 0,
+                    )
+                    for row in sales
+                ],
+                batch_size=1000,
+            ),
+            "products": ProductSalesRollup.objects.bulk_create(
+                [
+                    ProductSalesRollup(
+                        branch_id=row["invoice__branch_id"],
+                        business_date=row["business_date"],
+                        hour=row["hour"],
+                        product_id=row["product_id"],
+                        category_id=row["category_id"],
+                        kitchentype_id=row["kitchentype_id"],
+                        quantity=row["total_quantity"] or 0,
+                        amount=row["total"] or 0,
+                    )
+                    for row in items
+                ],
+                batch_size=1000,
+            ),
+            "payments": PaymentRollup.objects.bulk_create(
+                [
+                    PaymentRollup(
+                        branch_id=row["invoice__branch_id"],
+                        business_date=row["business_date"],
+                        hour=row["hour"],
+                        payment_method=row["payment_method"],
+                        payment_count=row["count"],
+                        amount=row["total"] or 0,
+                    )
+                    for row in payments
+                ],
+                batch_size=1000,
+            ),
+        }
+
+    return {table: len(rows) for table, rows in written.items()}
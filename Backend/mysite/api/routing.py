@@ -7,5 +7,7 @@ websocket_urlpatterns = [
     re_path(r"ws/kitchen/$", consumers.KitchenOrdersConsumer.as_asgi()),
     # Waiter/Counter orders feed
     re_path(r"ws/orders/$", consumers.OrdersConsumer.as_asgi()),
+    # Low-stock alerts for managers and admins
+    re_path(r"ws/stock-alerts/$", consumers.StockAlertsConsumer.as_asgi()),
 ]
 
@@ -1,20 +1,59 @@
+import uuid
 from decimal import Decimal
 
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
 from django.db import transaction
 from django.utils import timezone
 from rest_framework import serializers
 
-from ..models import Invoice, InvoiceItem  # adjust import path if needed
-from .item_activity_serializer import ItemActivitySerializer
+from ..models import Invoice, InvoiceItem, InvoiceSequence, ItemActivity, Product  # adjust import path if needed
+from ..rollups import record_items
+from ..stock import apply_stock_changes
+
+
+class BulkProductField(serializers.PrimaryKeyRelatedField):
+    """
+    Product lookup that reads from products preloaded by
+    InvoiceItemListSerializer instead of one query per line.
+    """
+
+    preloaded = None
+
+    def to_internal_value(self, data):
+        if self.preloaded is not None:
+            try:
+                return self.preloaded[int(data)]
+            except (KeyError, TypeError, ValueError):
+                pass
+        return super().to_internal_value(data)
+
+
+class InvoiceItemListSerializer(serializers.ListSerializer):
+    def to_internal_value(self, data):
+        product_ids = set()
+        if isinstance(data, list):
+            for row in data:
+                try:
+                    product_ids.add(int(row.get("product")))
+                except (AttributeError, TypeError, ValueError):
+                    continue
+
+        product_field = self.child.fields["product"]
+        product_field.preloaded = product_field.get_queryset().in_bulk(product_ids)
+        try:
+            return super().to_internal_value(data)
+        finally:
+            product_field.preloaded = None
 
 
 class InvoiceItemSerializer(serializers.ModelSerializer):
+    product = BulkProductField(
+        queryset=Product.objects.all(), allow_null=True, required=False
+    )
     product_name = serializers.CharField(source="product.name", read_only=True)
 
     class Meta:
         model = InvoiceItem
+        list_serializer_class = InvoiceItemListSerializer
         fields = [
             "product",
             "product_name",
@@ -78,15 +117,38 @@ class InvoiceSerializer(serializers.ModelSerializer):
 
         user = request.user if request else None
 
-        # Create invoice skeleton
-        invoice = Invoice.objects.create(
+        branch_id = self.context.get("branch")
+        try:
+            branch_id_int = int(branch_id)
+        except (TypeError, ValueError):
+            branch_id_int = None
+
+        if not branch_id_int:
+            raise serializers.ValidationError(
+                {"branch": "Invalid branch for invoice creation."}
+            )
+
+        # Create invoice skeleton. The uid stands in as a unique placeholder
+        # number; the real one is allocated right before the final save so
+        # the sequence row stays locked only for the tail of the transaction.
+        uid = uuid.uuid4()
+        invoice = Invoice(
             **validated_data,
+            uid=uid,
+            invoice_number=str(uid),
             created_by=user,
             subtotal=Decimal("0.00"),
             total_amount=Decimal("0.00"),
             paid_amount=paid_amount,
             payment_status="PENDING",
         )
+        # Counted in the rollups once, in its final state, by the last save;
+        # the shared rollup rows are then locked after the stock rows
+        invoice.defer_rollups = True
+        invoice.save(force_insert=True)
+
+        # Create items, decrement stock & log SALES activity in bulk
+        subtotal = self.create_items(invoice, items_data, remarks=notes)
 
         # Log who received the initial payment
         role = getattr(user, "user_type", None)
@@ -106,65 +168,6 @@ class InvoiceSerializer(serializers.ModelSerializer):
             elif role in ["COUNTER", "BRANCH_MANAGER", "ADMIN", "SUPER_ADMIN"]:
                 invoice.received_by_counter = user
 
-        # Generate invoice number
-        branch_id = self.context.get("branch")
-        try:
-            branch_id_int = int(branch_id)
-        except (TypeError, ValueError):
-            branch_id_int = None
-
-        if not branch_id_int:
-            raise serializers.ValidationError(
-                {"branch": "Invalid branch for invoice creation."}
-            )
-
-        today_date = timezone.localdate().strftime("%Y-%m-%d")
-        prefix = f"{branch_id_int:02d}-{today_date}"
-
-        # Find the latest invoice number for this branch for today
-        latest_today = (
-            Invoice.objects.filter(
-                branch=branch_id_int, invoice_number__startswith=prefix
-            )
-            .exclude(id=invoice.id)
-            .order_by("-invoice_number")
-            .first()
-        )
-
-        if latest_today and latest_today.invoice_number:
-            try:
-                seq = int(latest_today.invoice_number.split("-")[-1]) + 1
-            except Exception:
-                seq = 1
-        else:
-            seq = 1
-
-        final_invoice_no = f"{prefix}-{seq:02d}"
-
-        invoice.invoice_number = final_invoice_no
-
-        # Create items & calculate subtotal
-        subtotal = Decimal("0.00")
-        for item_data in items_data:
-            item = InvoiceItem.objects.create(invoice=invoice, **item_data)
-
-            item.product.product_quantity -= item.quantity
-            item.product.save()
-            line_total = item.quantity * item.unit_price - item.discount_amount
-            subtotal += line_total
-
-            itemactivity = {
-                "change": str(item.quantity),
-                "quantity": item.product.product_quantity,
-                "product": item.product_id,
-                "types": "SALES",
-                "remarks": notes,
-            }
-
-            itemserializer = ItemActivitySerializer(data=itemactivity)
-            itemserializer.is_valid(raise_exception=True)
-            itemserializer.save()
-
         # Final totals
         invoice.subtotal = subtotal
         invoice.total_amount = (
@@ -189,25 +192,53 @@ class InvoiceSerializer(serializers.ModelSerializer):
         else:
             invoice.payment_status = "PENDING"
 
-        invoice.save()
+        # Allocate invoice number from the per-branch daily sequence
+        business_date = timezone.localdate()
+        seq = InvoiceSequence.next_value(branch_id_int, business_date)
+        prefix = f"{branch_id_int:02d}-{business_date.strftime('%Y-%m-%d')}"
+        invoice.invoice_number = f"{prefix}-{seq:02d}"
 
-        # Notify all screens via WebSocket (kitchen, waiter, counter)
-        try:
-            channel_layer = get_channel_layer()
-            if channel_layer is not None:
-                message = {
-                    "type": "invoice_created",
-                    "invoice_id": str(invoice.id),
-                }
-                # Notify kitchen screens
-                async_to_sync(channel_layer.group_send)("kitchen_orders", message)
-                # Notify waiter/counter screens
-                async_to_sync(channel_layer.group_send)("orders", message)
-        except Exception:
-            pass
+        invoice.save()
 
         return invoice
 
+    def create_items(self, invoice, items_data, remarks=""):
+        """
+        Insert all invoice lines, decrement stock and log SALES activity
+        with a fixed number of queries regardless of basket size.
+        Returns the invoice subtotal.
+        """
+        items = InvoiceItem.objects.bulk_create(
+            [InvoiceItem(invoice=invoice, **item_data) for item_data in items_data]
+        )
+
+        sold = {}
+        subtotal = Decimal("0.00")
+        for item in items:
+            subtotal += item.quantity * item.unit_price - item.discount_amount
+            if item.product_id:
+                sold[item.product_id] = sold.get(item.product_id, 0) + item.quantity
+
+        apply_stock_changes({pid: -qty for pid, qty in sold.items()})
+        # bulk_create skips post_save, so feed the rollups directly; after
+        # the stock locks, so the product rollup rows are locked last
+        record_items(items)
+
+        activities = [
+            ItemActivity(
+                change=str(item.quantity),
+                delta=-item.quantity,
+                product_id=item.product_id,
+                types="SALES",
+                remarks=remarks or "",
+            )
+            for item in items
+            if item.product_id
+        ]
+        ItemActivity.objects.bulk_create(activities)
+
+        return subtotal
+
     def update(self, instance, validated_data):
         # For simplicity — you can expand this if partial updates of items are needed
         items_data = validated_data.pop("items", None)
@@ -226,9 +257,12 @@ class InvoiceSerializer(serializers.ModelSerializer):
         if items_data is not None:
             # Simple approach: delete old items, create new ones
             instance.bills.all().delete()  # assuming related_name="bills"
+            items = InvoiceItem.objects.bulk_create(
+                [InvoiceItem(invoice=instance, **item_data) for item_data in items_data]
+            )
+            record_items(items)
             subtotal = Decimal("0.00")
-            for item_data in items_data:
-                item = InvoiceItem.objects.create(invoice=instance, **item_data)
+            for item in items:
                 subtotal += item.quantity * item.unit_price - item.discount_amount
             instance.subtotal = subtotal
             instance.total_amount = (
@@ -275,6 +309,8 @@ class InvoiceResponseSerializer(serializers.ModelSerializer):
     due_amount = serializers.SerializerMethodField()
     payment_methods = serializers.SerializerMethodField()
     created_at = serializers.DateTimeField(format="%Y-%m-%d %H:%M:%S", read_only=True)
+    # Full precision so WebSocket clients can drop out-of-order updates
+    updated_at = serializers.DateTimeField(format="iso-8601", read_only=True)
 
     class Meta:
         model = Invoice
@@ -290,6 +326,7 @@ class InvoiceResponseSerializer(serializers.ModelSerializer):
             "branch_name",
             "created_by",
             "created_at",
+            "updated_at",
             "created_by_name",
             "received_by_waiter",
             "received_by_waiter_name",
@@ -315,5 +352,5 @@ class InvoiceResponseSerializer(serializers.ModelSerializer):
         return obj.total_amount - obj.paid_amount
 
     def get_payment_methods(self, obj):
-        print(list(obj.payments.values_list("payment_method", flat=True).distinct()))
-        return list(obj.payments.values_list("payment_method", flat=True).distinct())
+        # Read from payments.all() so a prefetch_related("payments") is used
+        return list(dict.fromkeys(p.payment_method for p in obj.payments.all()))
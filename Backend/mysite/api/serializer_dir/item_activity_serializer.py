@@ -7,6 +7,9 @@ class ItemActivitySerializer(serializers.ModelSerializer):
     product_detail = serializers.CharField(
         source="product.name", read_only=True, required=False
     )
+    # Running stock after this movement; read from .with_balance() or set
+    # on the instance by the stock helpers
+    quantity = serializers.IntegerField(source="balance", read_only=True)
 
     class Meta:
         model = ItemActivity
@@ -16,6 +19,7 @@ class ItemActivitySerializer(serializers.ModelSerializer):
             "product_detail",  # For display
             "types",
             "change",
+            "delta",
             "quantity",
             "created_at",
             "remarks",
@@ -24,6 +28,6 @@ class ItemActivitySerializer(serializers.ModelSerializer):
             "product": {"required": True},  # Make product required
             "types": {"required": False},
             "change": {"required": False},
-            "quantity": {"required": False},
+            "delta": {"required": False},
             "remarks": {"required": False},
         }
@@ -9,6 +9,7 @@ class PaymentSerializer(serializers.ModelSerializer):
         source="invoice.invoice_number", read_only=True
     )
     received_by_name = serializers.SerializerMethodField(read_only=True)
+    payment_date = serializers.DateTimeField(source="created_at", read_only=True)
 
     class Meta:
         model = Payment
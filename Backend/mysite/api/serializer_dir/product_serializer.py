@@ -2,15 +2,32 @@ from rest_framework import serializers
 
 from ..models import Product,InvoiceItem
 
-class ProductInvoiceSerializer(serializers.ModelSerializer):
-    invoice_id = serializers.IntegerField(source = "invoice.id")
-    total_amount = serializers.DecimalField(source = "invoice.total_amount",max_digits=10,decimal_places=2,read_only = True)
-    payment_status = serializers.CharField(source = "invoice.payment_status",read_only = True)
-    created_by = serializers.CharField(source = 'invoice.created_by',read_only = True)
+class ProductSaleSerializer(serializers.ModelSerializer):
+    """One invoice line of a product, for its paged sales history."""
+
+    invoice_id = serializers.IntegerField(source="invoice.id", read_only=True)
+    invoice_number = serializers.CharField(source="invoice.invoice_number", read_only=True)
+    sold_at = serializers.DateTimeField(source="invoice.created_at", read_only=True)
+    payment_status = serializers.CharField(source="invoice.payment_status", read_only=True)
+    created_by = serializers.CharField(
+        source="invoice.created_by.username", read_only=True, default=None
+    )
+    line_total = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
 
     class Meta:
         model = InvoiceItem
-        fields = ['invoice_id','total_amount','payment_status','created_by']
+        fields = [
+            "id",
+            "invoice_id",
+            "invoice_number",
+            "sold_at",
+            "quantity",
+            "unit_price",
+            "discount_amount",
+            "line_total",
+            "payment_status",
+            "created_by",
+        ]
 
 class ProductSerializer(serializers.ModelSerializer):
     category_name = serializers.CharField(source="category.name", read_only=True)
@@ -18,8 +35,6 @@ class ProductSerializer(serializers.ModelSerializer):
     kitchentype_id = serializers.IntegerField(source="category.kitchentype.id", read_only=True)
     branch_name = serializers.CharField(source="category.branch.name", read_only=True)
     branch_id = serializers.IntegerField(source="category.branch.id", read_only=True)
-    invoices = ProductInvoiceSerializer(source = "products",many = True, read_only = True )
-
 
     class Meta:
         model = Product
@@ -38,7 +53,6 @@ class ProductSerializer(serializers.ModelSerializer):
             "branch_name",  # ← Use this (read-only through category)
             "created_at",
             "is_available",
-            "invoices"
         ]
         read_only_fields = [
             "id",
@@ -0,0 +1,329 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, F, IntegerField, Max, Q, Sum, Value, When
+from django.utils import timezone
+
+from .consumers import stock_alerts_group
+from .models import ItemActivity, Product, StockAlert, StockSnapshot
+from .outbox import enqueue_broadcast
+
+
+class InsufficientStock(Exception):
+    """A sale would take products below zero while oversell protection is on."""
+
+    def __init__(self, shortages):
+        # product id -> (name, quantity in stock)
+        self.shortages = shortages
+        super().__init__(
+            "Not enough stock for: "
+            + ", ".join(f"{name} ({left} left)" for name, left in shortages.values())
+        )
+
+
+def apply_stock_changes(changes, prevent_oversell=None):
+    """
+    Apply signed stock changes to many products in one UPDATE.
+
+    `changes` maps product_id -> signed quantity (negative for sales).
+    Returns a dict of product_id -> quantity after the update.
+
+    With oversell protection (STOCK_OVERSELL_PROTECTION unless overridden)
+    the rows are locked first, in product id order so that baskets sharing
+    products always queue up instead of deadlocking, and InsufficientStock
+    is raised if any decrement would go below zero. Call it inside a
+    transaction so the locks are held until commit.
+
+    The ordering only helps if the transaction holds no conflicting lock
+    on shared rows yet. Checkout inserts its InvoiceItems first, which takes
+    FOR KEY SHARE on the products in basket order; FOR NO KEY UPDATE (and the
+    UPDATE itself) doesn't conflict with that, where FOR UPDATE would. The
+    rollup and branch stat upserts come later in the same transaction, once
+    these locks are held (see rollups.py).
+
+    Low-stock alerts for the changed products are updated in the same
+    transaction (see sync_stock_alerts).
+    """
+    changes = {pid: qty for pid, qty in changes.items() if pid}
+    if not changes:
+        return {}
+
+    if prevent_oversell is None:
+        prevent_oversell = settings.STOCK_OVERSELL_PROTECTION
+    if prevent_oversell:
+        locked = (
+            Product.objects.select_for_update(
+                no_key=connection.features.has_select_for_no_key_update
+            )
+            .filter(id__in=changes)
+            .order_by("id")
+            .values_list("id", "name", "product_quantity")
+        )
+        shortages = {
+            pid: (name, quantity)
+            for pid, name, quantity in locked
+            if changes[pid] < 0 and quantity + changes[pid] < 0
+        }
+        if shortages:
+            raise InsufficientStock(shortages)
+
+    delta = Case(
+        *[When(id=pid, then=Value(qty)) for pid, qty in changes.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+    Product.objects.filter(id__in=changes).update(
+        product_quantity=F("product_quantity") + delta
+    )
+
+    products = list(
+        Product.objects.filter(id__in=changes).values_list(*STOCK_ALERT_FIELDS)
+    )
+    sync_stock_alerts(products)
+    return {row[0]: row[4] for row in products}
+
+
+# Product columns sync_stock_alerts needs, in the order it unpacks them
+STOCK_ALERT_FIELDS = (
+    "id",
+    "branch_id",
+    "category__branch_id",
+    "name",
+    "product_quantity",
+    "low_stock_bar",
+    "is_deleted",
+)
+
+
+def sync_product_stock_alert(product):
+    """sync_stock_alerts for one saved Product instance."""
+    sync_stock_alerts(
+        Product.objects.filter(pk=product.pk).values_list(*STOCK_ALERT_FIELDS)
+    )
+
+
+def sync_stock_alerts(products):
+    """
+    Open an alert for each product now at or below its low_stock_bar and
+    resolve the open alert of each one back above it, then queue the
+    changes on the outbox for the branch's managers. Archived (soft
+    deleted) products never count as low. A product without a branch is
+    filed under its category's branch, like migration 0087 does, and
+    skipped when neither has one.
+
+    `products` holds rows of STOCK_ALERT_FIELDS. Call it in the transaction
+    that changed the stock, so alerts are only published if that commits.
+    """
+    products = list(products)
+    open_alerts = set(
+        StockAlert.objects.filter(
+            product_id__in=[row[0] for row in products], resolved_at__isnull=True
+        ).values_list("product_id", flat=True)
+    )
+
+    opened, resolved, messages = [], [], defaultdict(list)
+    for (
+        product_id,
+        branch_id,
+        category_branch_id,
+        name,
+        quantity,
+        low_stock_bar,
+        is_deleted,
+    ) in products:
+        branch_id = branch_id or category_branch_id
+        if not branch_id:
+            continue
+        is_low = quantity <= low_stock_bar and not is_deleted
+        if is_low == (product_id in open_alerts):
+            continue
+        if is_low:
+            opened.append(
+                StockAlert(
+                    branch_id=branch_id,
+                    product_id=product_id,
+                    quantity=quantity,
+                    low_stock_bar=low_stock_bar,
+                )
+            )
+        else:
+            resolved.append(product_id)
+        messages[branch_id].append(
+            {
+                "status": "open" if is_low else "resolved",
+                "product_id": product_id,
+                "product_name": name,
+                "quantity": quantity,
+                "low_stock_bar": low_stock_bar,
+            }
+        )
+
+    if opened:
+        # A concurrent sale may have opened the same alert first
+        StockAlert.objects.bulk_create(opened, ignore_conflicts=True)
+    if resolved:
+        StockAlert.objects.filter(
+            product_id__in=resolved, resolved_at__isnull=True
+        ).update(resolved_at=timezone.now())
+    for branch_id, alerts in messages.items():
+        enqueue_broadcast(
+            {"type": "stock_alerts", "branch_id": branch_id, "alerts": alerts},
+            [stock_alerts_group(), stock_alerts_group(branch_id)],
+            branch_id=branch_id,
+        )
+
+
+def record_stock_movement(product_id, delta, types, change, remarks=""):
+    """
+    Move a product's stock by `delta` and log it in the ledger.
+    Returns the new ItemActivity with `balance` set to the stock after it.
+    """
+    return record_stock_movements([(product_id, delta, types, change, remarks)])[0]
+
+
+def record_stock_movements(movements):
+    """
+    Apply many ledger movements at once: one UPDATE for all the products
+    and one bulk insert of their ItemActivity rows.
+
+    `movements` is a list of (product_id, delta, types, change, remarks).
+    A product may appear more than once; its lines are logged in order.
+    Returns the new activities, each with `balance` set to the stock
+    right after it.
+    """
+    totals = defaultdict(int)
+    for product_id, delta, *_ in movements:
+        totals[product_id] += delta
+    quantities = apply_stock_changes(totals)
+
+    activities = ItemActivity.objects.bulk_create(
+        [
+            ItemActivity(
+                product_id=product_id,
+                delta=delta,
+                types=types,
+                change=str(change),
+                remarks=remarks,
+            )
+            for product_id, delta, types, change, remarks in movements
+        ]
+    )
+
+    # Walk back from the final stock to the balance after each line
+    for activity in reversed(activities):
+        activity.balance = quantities[activity.product_id]
+        quantities[activity.product_id] -= activity.delta
+    return activities
+
+
+def correct_stock_movement(activity, delta, change):
+    """
+    Change the effect of a logged movement to `delta`. Later balances are
+    derived from the deltas, so only this row and the product are updated.
+    """
+    difference = delta - activity.delta
+    ItemActivity.objects.filter(id=activity.id).update(delta=delta, change=str(change))
+    apply_stock_changes({activity.product_id: difference})
+    # Closing stock already snapshotted from that day on moves with it
+    StockSnapshot.objects.filter(
+        product_id=activity.product_id,
+        business_date__gte=timezone.localtime(activity.created_at).date(),
+    ).update(quantity=F("quantity") + difference)
+    activity.delta, activity.change = delta, str(change)
+    return activity
+
+
+def ledger_totals(movements):
+    """product_id -> summed delta of the given ItemActivity rows."""
+    return dict(
+        movements.values_list("product_id").annotate(total=Sum("delta")).order_by()
+    )
+
+
+def take_stock_snapshots(business_date, branch_id=None):
+    """
+    Write each product's closing stock for `business_date`: the previous
+    day's snapshot plus that day's movements, or the whole ledger up to
+    the end of the day for products without one. Returns the rows written.
+    """
+    from .views_dir.dashboard_view import local_datetime_range
+
+    start, end = local_datetime_range(business_date, business_date)
+    products = Product.objects.filter(is_deleted=False)
+    if branch_id:
+        products = products.filter(branch_id=branch_id)
+    products = dict(products.values_list("id", "branch_id"))
+
+    closing = dict(
+        StockSnapshot.objects.filter(
+            product_id__in=products, business_date=business_date - timedelta(days=1)
+        ).values_list("product_id", "quantity")
+    )
+    for product_id, total in ledger_totals(
+        ItemActivity.objects.filter(
+            product_id__in=closing, created_at__gte=start, created_at__lt=end
+        )
+    ).items():
+        closing[product_id] += total
+    missing = [product_id for product_id in products if product_id not in closing]
+    if missing:
+        closing.update(
+            ledger_totals(
+                ItemActivity.objects.filter(product_id__in=missing, created_at__lt=end)
+            )
+        )
+
+    snapshots = [
+        StockSnapshot(
+            branch_id=product_branch_id,
+            product_id=product_id,
+            business_date=business_date,
+            quantity=closing.get(product_id, 0),
+        )
+        for product_id, product_branch_id in products.items()
+    ]
+    with transaction.atomic():
+        StockSnapshot.objects.filter(
+            product_id__in=products, business_date=business_date
+        ).delete()
+        StockSnapshot.objects.bulk_create(snapshots, batch_size=1000)
+    return len(snapshots)
+
+
+def stock_as_of(at, products):
+    """
+    Stock of each of `products` (a Product queryset) at the moment `at`.
+
+    Starts from the latest snapshot before `at`'s business date and adds
+    only the movements after it, so the read is bounded by the time since
+    the last snapshot rather than the length of the ledger. Products
+    missing from that snapshot fall back to their full ledger.
+    Returns (product_id -> quantity, date of the snapshot used or None).
+    """
+    from .views_dir.dashboard_view import local_datetime_range
+
+    snapshots = StockSnapshot.objects.filter(
+        product__in=products,
+        business_date__lt=timezone.localtime(at).date(),
+    )
+    snapshot_date = snapshots.aggregate(latest=Max("business_date"))["latest"]
+
+    quantities = {}
+    movements = ItemActivity.objects.filter(product__in=products, created_at__lt=at)
+    if snapshot_date:
+        quantities = dict(
+            snapshots.filter(business_date=snapshot_date).values_list(
+                "product_id", "quantity"
+            )
+        )
+        _, since = local_datetime_range(snapshot_date, snapshot_date)
+        movements = movements.filter(
+            Q(created_at__gte=since)
+            | ~Q(product__stock_snapshots__business_date=snapshot_date)
+        )
+
+    for product_id, total in ledger_totals(movements).items():
+        quantities[product_id] = quantities.get(product_id, 0) + total
+    return quantities, snapshot_date
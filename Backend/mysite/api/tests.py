@@ -1,3 +1,1917 @@
-from django.test import TestCase
+import asyncio
+import csv
+import gzip
+import io
+import json
+import os
+import random
+import re
+import statistics
+import tempfile
+import threading
+import time
+import unittest
+from datetime import date, datetime, timedelta
+from datetime import time as dt_time
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection, connections, transaction
+from django.db.models import Sum
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLResolver, resolve
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from . import urls as api_urls
+from .caching import bump_dashboard_version, cached_dashboard, version_key
+from .consumers import (
+    KitchenOrdersConsumer,
+    OrdersConsumer,
+    missed_events,
+    orders_group,
+    stock_alerts_group,
+)
+from .dashboard_hub import DashboardHub
+from .models import (
+    Branch,
+    BranchStats,
+    Customer,
+    DemandForecast,
+    Floor,
+    Invoice,
+    InvoiceItem,
+    InvoiceSequence,
+    ItemActivity,
+    Kitchentype,
+    Notification,
+    OutboxEvent,
+    Payment,
+    PaymentRollup,
+    Product,
+    ProductCategory,
+    ProductSalesRollup,
+    SalesRollup,
+    StockAlert,
+    StockSnapshot,
+    User,
+)
+from .forecasting import forecast_demand
+from .outbox import enqueue_broadcast, get_relay, publish_pending, wake_relays
+from .rollups import rebuild_branch_stats, rebuild_rollups
+from .stock import apply_stock_changes, record_stock_movement, stock_as_of
+from .views_dir.catalog_view import cached_catalog
+from .views_dir.sse_views import DashboardSnapshot
+
+
+def create_branch_fixture(name="Main", product_count=3, stock=100):
+    """Branch with one kitchen type, one category, products and a counter user."""
+    branch = Branch.objects.create(name=name, location="Kathmandu")
+    kitchentype = Kitchentype.objects.create(name="Bakery", branch=branch)
+    category = ProductCategory.objects.create(
+        name=f"{name} Breads", branch=branch, kitchentype=kitchentype
+    )
+    products = [
+        Product.objects.create(
+            name=f"{name} Item {i}",
+            category=category,
+            branch=branch,
+            selling_price=100,
+            cost_price=60,
+            product_quantity=stock,
+        )
+        for i in range(product_count)
+    ]
+    counter = User.objects.create_user(
+        username=f"{name.lower()}_counter",
+        password="pass1234",
+        user_type="COUNTER",
+        branch=branch,
+    )
+    return branch, products, counter
+
+
+def invoice_payload(branch, products, quantity=1):
+    return {
+        "branch": branch.id,
+        "items": [
+            {"product": product.id, "quantity": quantity, "unit_price": "100.00"}
+            for product in products
+        ],
+    }
+
+
+class InvoiceSequenceTests(TestCase):
+    def setUp(self):
+        self.branch, self.products, self.counter = create_branch_fixture()
+        self.client = APIClient()
+        self.client.force_authenticate(self.counter)
+
+    def test_next_value_is_per_branch_and_date(self):
+        other = Branch.objects.create(name="Other", location="Lalitpur")
+        today = date(2026, 3, 1)
+
+        self.assertEqual(InvoiceSequence.next_value(self.branch.id, today), 1)
+        self.assertEqual(InvoiceSequence.next_value(self.branch.id, today), 2)
+        self.assertEqual(InvoiceSequence.next_value(other.id, today), 1)
+        self.assertEqual(
+            InvoiceSequence.next_value(self.branch.id, date(2026, 3, 2)), 1
+        )
+
+    def test_invoice_numbers_are_sequential(self):
+        numbers = []
+        for _ in range(3):
+            response = self.client.post(
+                "/api/invoice/",
+                invoice_payload(self.branch, self.products),
+                format="json",
+            )
+            self.assertEqual(response.status_code, 201, response.data)
+            numbers.append(response.data["data"]["invoice_number"])
+
+        self.assertEqual([n.rsplit("-", 1)[1] for n in numbers], ["01", "02", "03"])
+
+
+class InvoiceDeleteTests(TestCase):
+    def test_pending_invoice_with_stock_activity_can_be_deleted(self):
+        branch, products, counter = create_branch_fixture()
+        client = APIClient()
+        client.force_authenticate(counter)
+        response = client.post(
+            "/api/invoice/", invoice_payload(branch, products), format="json"
+        )
+        self.assertEqual(response.status_code, 201, response.data)
+        invoice_id = response.data["data"]["id"]
+
+        admin = User.objects.create_user(
+            username="hq_admin", password="pass1234", user_type="ADMIN"
+        )
+        client.force_authenticate(admin)
+        response = client.delete(f"/api/invoice/{invoice_id}/")
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(Invoice.objects.filter(id=invoice_id).exists())
+        # The ledger keeps the sale, as it did before invoices were bulk-created
+        self.assertEqual(ItemActivity.objects.filter(types="SALES").count(), 3)
+
+
+@unittest.skipUnless(
+    connection.vendor == "postgresql", "Concurrent writes need PostgreSQL"
+)
+class ConcurrentInvoiceNumberTests(TransactionTestCase):
+    def test_parallel_creates_get_unique_numbers(self):
+        branch, products, counter = create_branch_fixture()
+        workers = 20
+        barrier = threading.Barrier(workers)
+        results = []
+
+        def create_invoice():
+            client = APIClient()
+            client.force_authenticate(counter)
+            barrier.wait()
+            try:
+                response = client.post(
+                    "/api/invoice/", invoice_payload(branch, products), format="json"
+                )
+                results.append(response.status_code)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=create_invoice) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, [201] * workers)
+        numbers = list(
+            Invoice.objects.filter(branch=branch).values_list(
+                "invoice_number", flat=True
+            )
+        )
+        self.assertEqual(len(set(numbers)), workers)
+
+
+@override_settings(STOCK_OVERSELL_PROTECTION=True)
+class OversellProtectionTests(TestCase):
+    def setUp(self):
+        self.branch, self.products, counter = create_branch_fixture(stock=2)
+        self.client = APIClient()
+        self.client.force_authenticate(counter)
+
+    def test_oversell_is_rejected_and_nothing_is_written(self):
+        response = self.client.post(
+            "/api/invoice/",
+            invoice_payload(self.branch, self.products, quantity=3),
+            format="json",
+        )
+        self.assertEqual(response.status_code, 409, response.data)
+        self.assertIn("(2 left)", response.data["error"])
+        self.assertFalse(Invoice.objects.exists())
+        self.assertFalse(ItemActivity.objects.exists())
+        for product in self.products:
+            product.refresh_from_db()
+            self.assertEqual(product.product_quantity, 2)
+
+        response = self.client.post(
+            "/api/invoice/",
+            invoice_payload(self.branch, self.products, quantity=2),
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201, response.data)
+
+
+    def test_checkout_touches_no_shared_rows_before_the_stock_lock(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                "/api/invoice/",
+                invoice_payload(self.branch, self.products[::-1], quantity=1),
+                format="json",
+            )
+        self.assertEqual(response.status_code, 201, response.data)
+
+        sql = [query["sql"] for query in queries]
+        stock_update = next(
+            i for i, q in enumerate(sql) if q.startswith('UPDATE "api_product"')
+        )
+        # Shared rows a concurrent checkout could hold (rollup buckets,
+        # branch counters, the invoice number sequence) are only written
+        # after the stock rows are locked.
+        for statement in sql[:stock_update]:
+            self.assertNotIn("rollup", statement.lower())
+            self.assertNotIn("branchstats", statement.lower())
+            self.assertNotIn("invoicesequence", statement.lower())
+        self.assertTrue([q for q in sql[stock_update:] if "salesrollup" in q])
+        if connection.features.has_select_for_no_key_update:
+            self.assertIn("FOR NO KEY UPDATE", sql[stock_update - 1])
+
+
+@unittest.skipUnless(
+    connection.vendor == "postgresql", "Concurrent writes need PostgreSQL"
+)
+class ConcurrentStockTests(TransactionTestCase):
+    workers = 50
+
+    def place_orders(self, branch, products, counter):
+        """Post one order per worker at once, each listing the products in a random order."""
+        barrier = threading.Barrier(self.workers)
+        results = []
+
+        def create_invoice():
+            client = APIClient()
+            client.force_authenticate(counter)
+            basket = random.sample(products, len(products))
+            barrier.wait()
+            try:
+                response = client.post(
+                    "/api/invoice/", invoice_payload(branch, basket), format="json"
+                )
+                results.append(response.status_code)
+            finally:
+                connections.close_all()
+
+        threads = [
+            threading.Thread(target=create_invoice) for _ in range(self.workers)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def stock(self, products):
+        return list(
+            Product.objects.filter(id__in=[p.id for p in products])
+            .order_by("id")
+            .values_list("product_quantity", flat=True)
+        )
+
+    @override_settings(STOCK_OVERSELL_PROTECTION=False)
+    def test_concurrent_orders_decrement_exactly(self):
+        branch, products, counter = create_branch_fixture(stock=100)
+        results = self.place_orders(branch, products, counter)
+
+        self.assertEqual(results, [201] * self.workers)
+        self.assertEqual(self.stock(products), [100 - self.workers] * len(products))
+        for product in products:
+            sales = ItemActivity.objects.filter(product=product, types="SALES")
+            total = sales.aggregate(total=Sum("delta"))["total"]
+            self.assertEqual(total, -self.workers)
+
+    @override_settings(STOCK_OVERSELL_PROTECTION=True)
+    def test_oversell_protection_under_contention(self):
+        branch, products, counter = create_branch_fixture(stock=30)
+        results = self.place_orders(branch, products, counter)
+
+        self.assertEqual(results.count(201), 30)
+        self.assertEqual(results.count(409), self.workers - 30)
+        self.assertEqual(self.stock(products), [0] * len(products))
+        self.assertEqual(Invoice.objects.filter(branch=branch).count(), 30)
+
+
+class InvoiceListPaginationTests(TestCase):
+    def setUp(self):
+        self.branch, self.products, _ = create_branch_fixture()
+        self.manager = User.objects.create_user(
+            username="main_manager",
+            password="pass1234",
+            user_type="BRANCH_MANAGER",
+            branch=self.branch,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.manager)
+        for _ in range(5):
+            self.client.post(
+                "/api/invoice/",
+                invoice_payload(self.branch, self.products),
+                format="json",
+            )
+
+    def test_cursor_walks_every_invoice_once(self):
+        seen = []
+        cursor = None
+        while True:
+            params = {"limit": 2}
+            if cursor:
+                params["cursor"] = cursor
+            response = self.client.get("/api/invoice/", params)
+            self.assertEqual(response.status_code, 200, response.data)
+            seen += [invoice["id"] for invoice in response.data["data"]]
+            cursor = response.data["next_cursor"]
+            if not cursor:
+                break
+
+        expected = list(
+            Invoice.objects.order_by("-created_at", "-id").values_list("id", flat=True)
+        )
+        self.assertEqual(seen, expected)
+
+    def test_page_query_count_does_not_grow_with_page_size(self):
+        with self.assertNumQueries(4):
+            self.client.get("/api/invoice/", {"limit": 1})
+        with self.assertNumQueries(4):
+            self.client.get("/api/invoice/", {"limit": 5})
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get("/api/invoice/", {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, 400)
+
+
+class InvoiceEventsConsumerTests(TestCase):
+    def setUp(self):
+        self.branch, _, self.counter = create_branch_fixture()
+
+    def test_anonymous_socket_is_refused(self):
+        from channels.layers import get_channel_layer
+        from channels.testing import WebsocketCommunicator
+
+        from mysite.asgi import application
+
+        async def scenario():
+            results = []
+            for path in ("/ws/orders/", "/ws/kitchen/"):
+                communicator = WebsocketCommunicator(application, path)
+                connected, _ = await communicator.connect()
+                await get_channel_layer().group_send(
+                    "orders", {"type": "invoice_created", "invoice_id": "1"}
+                )
+                results.append((connected, await communicator.receive_nothing()))
+                await communicator.disconnect()
+            return results
+
+        self.assertEqual(asyncio.run(scenario()), [(False, True), (False, True)])
+
+    def test_global_groups_are_for_branchless_admins_only(self):
+        admin = User.objects.create_user(
+            username="hq_admin", password="pass1234", user_type="ADMIN"
+        )
+        branch_admin = User.objects.create_user(
+            username="branch_admin",
+            password="pass1234",
+            user_type="ADMIN",
+            branch=self.branch,
+        )
+        waiter = User.objects.create_user(
+            username="floating_waiter", password="pass1234", user_type="WAITER"
+        )
+        orders, kitchen = OrdersConsumer(), KitchenOrdersConsumer()
+
+        self.assertEqual(orders.get_group_names(admin), ["orders"])
+        self.assertEqual(kitchen.get_group_names(admin), ["kitchen_orders"])
+        self.assertEqual(
+            orders.get_group_names(branch_admin), [f"orders_branch_{self.branch.id}"]
+        )
+        self.assertEqual(
+            orders.get_group_names(self.counter), [f"orders_branch_{self.branch.id}"]
+        )
+        self.assertEqual(orders.get_group_names(waiter), [])
+        self.assertEqual(kitchen.get_group_names(waiter), [])
+        self.assertEqual(orders.get_group_names(None), [])
+
+
+class OutboxSequenceTests(TestCase):
+    def test_late_commit_with_lower_id_is_replayed(self):
+        groups = ["orders"]
+        # The higher id commits and publishes first...
+        first = OutboxEvent.objects.create(
+            id=100, groups=groups, payload={"type": "invoice_created"}
+        )
+        self.assertEqual(publish_pending(), 1)
+        first.refresh_from_db()
+        # ...then an event inserted earlier commits late
+        late = OutboxEvent.objects.create(
+            id=50, groups=groups, payload={"type": "invoice_updated"}
+        )
+        self.assertEqual(publish_pending(), 1)
+        late.refresh_from_db()
+
+        self.assertEqual(late.seq, first.seq + 1)
+        self.assertEqual(
+            missed_events(groups, first.seq),
+            [{"type": "invoice_updated", "seq": late.seq}],
+        )
+        self.assertEqual(missed_events(groups, late.seq), [])
+        self.assertIsNone(missed_events(groups, late.seq + 1))
+
+
+    def test_replay_matches_the_joined_groups_not_the_branch(self):
+        branch, _, _ = create_branch_fixture()
+        OutboxEvent.objects.create(branch=branch, groups=["orders"], payload={})
+        publish_pending()
+        event = OutboxEvent.objects.create(
+            branch=branch,
+            groups=[stock_alerts_group(), stock_alerts_group(branch.id)],
+            payload={"type": "stock_alerts", "alerts": []},
+        )
+        publish_pending()
+        event.refresh_from_db()
+
+        # A branch-assigned admin listens on the global group
+        self.assertEqual(
+            missed_events([stock_alerts_group()], event.seq - 1),
+            [{"type": "stock_alerts", "alerts": [], "seq": event.seq}],
+        )
+        self.assertEqual(missed_events(["orders"], 0), [{"seq": event.seq - 1}])
+
+    def test_connect_always_hands_out_a_cursor(self):
+        from channels.testing import WebsocketCommunicator
+
+        _, _, counter = create_branch_fixture()
+
+        async def frames(query):
+            communicator = WebsocketCommunicator(
+                OrdersConsumer.as_asgi(), f"/ws/orders/{query}"
+            )
+            communicator.scope["user"] = counter
+            connected, _ = await communicator.connect()
+            received = []
+            while not await communicator.receive_nothing(timeout=0.05):
+                received.append(await communicator.receive_json_from())
+            await communicator.disconnect()
+            return connected, received
+
+        missed = [{"type": "invoice_created", "seq": 8, "invoice_id": "9"}]
+        with mock.patch("api.consumers.latest_seq", return_value=7), mock.patch(
+            "api.consumers.missed_events", return_value=missed
+        ) as replay:
+            connected, first = asyncio.run(frames(""))
+            _, reconnect = asyncio.run(frames("?reconnect=1"))
+            _, resumed = asyncio.run(frames("?last_seq=5&reconnect=1"))
+
+        self.assertTrue(connected)
+        self.assertEqual(first[0], {"type": "hello", "seq": 7})
+        self.assertEqual(first[1]["type"], "replay")
+        self.assertEqual(reconnect, [{"type": "hello", "seq": 7}, {"type": "resync"}])
+        self.assertEqual(resumed[0], {"type": "hello", "seq": 5})
+        self.assertEqual(replay.call_args.args, ([orders_group(counter.branch_id)], 5))
+
+class OutboxRelayTests(TestCase):
+    @override_settings(OUTBOX_RELAY_INTERVAL=30)
+    def test_commit_wakes_the_in_process_relay(self):
+        published = []
+
+        def publish(batch_size=100):
+            published.append(batch_size)
+            return 0
+
+        async def scenario():
+            relay = get_relay()
+            relay.start()
+            await asyncio.sleep(0.1)
+            # Committed in a worker thread, like a sync view under ASGI
+            await sync_to_async(wake_relays, thread_sensitive=False)()
+            await asyncio.sleep(0.1)
+            await relay.stop()
+            return len(published)
+
+        with mock.patch("api.outbox.publish_pending", publish), mock.patch(
+            "api.outbox.prune_published"
+        ):
+            self.assertEqual(asyncio.run(scenario()), 2)
+
+    def test_enqueue_wakes_the_relay_on_commit(self):
+        with mock.patch("api.outbox.wake_relays") as wake:
+            with self.captureOnCommitCallbacks(execute=True):
+                enqueue_broadcast({"type": "invoice_created"}, ["orders"])
+                wake.assert_not_called()
+        wake.assert_called_once()
+
+    def test_separate_relay_refuses_the_in_memory_layer(self):
+        with self.assertRaises(CommandError):
+            call_command("relay_outbox", "--once")
+
+class ProductSalesHistoryTests(TestCase):
+    def setUp(self):
+        self.branch, self.products, counter = create_branch_fixture()
+        self.product = self.products[0]
+        client = APIClient()
+        client.force_authenticate(counter)
+        for quantity in [1, 2, 3]:
+            response = client.post(
+                "/api/invoice/",
+                invoice_payload(self.branch, self.products[:2], quantity=quantity),
+                format="json",
+            )
+            self.assertEqual(response.status_code, 201, response.data)
+        self.manager = User.objects.create_user(
+            username="main_manager",
+            password="pass1234",
+            user_type="BRANCH_MANAGER",
+            branch=self.branch,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.manager)
+
+    def test_catalog_has_no_nested_sales(self):
+        response = self.client.get("/api/products/")
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("invoices", response.data["data"][0])
+        self.assertEqual(response.data["data"][0]["kitchentype_name"], "Bakery")
+
+    def test_sales_history_is_paged_with_totals(self):
+        url = f"/api/products/{self.product.id}/sales/"
+        response = self.client.get(url, {"limit": 2})
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data["summary"]["quantity"], 6)
+        self.assertEqual(response.data["summary"]["revenue"], 600.0)
+        self.assertEqual(response.data["summary"]["invoices"], 3)
+        self.assertEqual([row["quantity"] for row in response.data["data"]], [3, 2])
+
+        response = self.client.get(
+            url, {"limit": 2, "cursor": response.data["next_cursor"]}
+        )
+        self.assertEqual([row["quantity"] for row in response.data["data"]], [1])
+        self.assertIsNone(response.data["next_cursor"])
+
+        other_branch, _, _ = create_branch_fixture(name="North")
+        self.manager.branch = other_branch
+        self.manager.save()
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+
+def rollup_rows():
+    """Non-empty rows of every rollup table, comparable across rebuilds."""
+    return {
+        model.__name__: sorted(
+            tuple(str(value) for value in row)
+            for row in model.objects.values_list(*model.KEY_FIELDS, *model.SUM_FIELDS)
+            if any(row[len(model.KEY_FIELDS):])
+        )
+        for model in (SalesRollup, ProductSalesRollup, PaymentRollup)
+    }
+
+
+class StockLedgerTests(TestCase):
+    def setUp(self):
+        self.branch, self.products, self.counter = create_branch_fixture(stock=0)
+        self.product = self.products[0]
+        self.manager = User.objects.create_user(
+            username="main_manager",
+            password="pass1234",
+            user_type="BRANCH_MANAGER",
+            branch=self.branch,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.manager)
+
+    def move(self, action, change):
+        response = self.client.post(
+            f"/api/itemactivity/{self.product.id}/{action}/",
+            {"change": change},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data["data"]
+
+    def ledger(self):
+        response = self.client.get(f"/api/itemactivity/{self.product.id}/detail/")
+        return [row["quantity"] for row in reversed(response.data["data"])]
+
+    def test_product_create_and_edit_report_the_balance(self):
+        response = self.client.post(
+            "/api/products/",
+            {
+                "name": "Croissant",
+                "category": self.product.category_id,
+                "cost_price": 40,
+                "selling_price": 90,
+                "product_quantity": 12,
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data["item_activity"]["quantity"], 12)
+
+        product_id = response.data["data"]["id"]
+        response = self.client.put(
+            f"/api/products/{product_id}/", {"product_quantity": 7}, format="json"
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data["item_activity"]["delta"], -5)
+        self.assertEqual(response.data["item_activity"]["quantity"], 7)
+
+    def test_correction_updates_one_row_and_later_balances_follow(self):
+        first = self.move("add", 50)
+        self.assertEqual(first["quantity"], 50)
+        self.move("reduce", 5)
+        for _ in range(20):
+            self.move("add", 1)
+        counter = APIClient()
+        counter.force_authenticate(self.counter)
+        counter.post(
+            "/api/invoice/", invoice_payload(self.branch, [self.product]), format="json"
+        )
+        self.assertEqual(self.ledger()[-1], 64)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(
+                f"/api/itemactivity/{first['id']}/", {"change": 30}, format="json"
+            )
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data["data"]["quantity"], 30)
+        # The movement, the product and any later stock snapshots
+        updates = [q for q in queries if q["sql"].startswith("UPDATE")]
+        self.assertEqual(len(updates), 3)
+
+        balances = self.ledger()
+        self.assertEqual(balances[:3], [30, 25, 26])
+        self.assertEqual(balances[-1], 44)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.product_quantity, 44)
+
+    def test_sales_cannot_be_edited(self):
+        self.move("add", 5)
+        counter = APIClient()
+        counter.force_authenticate(self.counter)
+        counter.post(
+            "/api/invoice/", invoice_payload(self.branch, [self.product]), format="json"
+        )
+        sale = ItemActivity.objects.get(types="SALES")
+        self.assertEqual(sale.delta, -1)
+        response = self.client.patch(
+            f"/api/itemactivity/{sale.id}/", {"change": 3}, format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def receive(self, items):
+        return self.client.post(
+            "/api/itemactivity/receive/",
+            {"remarks": "Morning delivery", "items": items},
+            format="json",
+        )
+
+    def test_bulk_receive_applies_all_lines_in_fixed_queries(self):
+        def delivery(lines):
+            return [
+                {"product": self.products[i % 3].id, "change": 2 + i % 2}
+                for i in range(lines)
+            ]
+
+        with CaptureQueriesContext(connection) as small:
+            response = self.receive(delivery(3))
+        self.assertEqual(response.status_code, 200, response.data)
+        with CaptureQueriesContext(connection) as large:
+            response = self.receive(delivery(120))
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(len(large), len(small))
+
+        lines = response.data["data"]
+        self.assertEqual(len(lines), 120)
+        # Balances run in request order on top of the first delivery
+        self.assertEqual([line["quantity"] for line in lines[:6:3]], [2 + 2, 4 + 3])
+        self.assertEqual(lines[0]["remarks"], "Morning delivery")
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.product_quantity, lines[-3]["quantity"])
+        self.assertEqual(self.ledger()[-1], self.product.product_quantity)
+
+    def test_bulk_receive_rejects_the_whole_delivery_on_any_bad_line(self):
+        other_branch, other_products, _ = create_branch_fixture(name="North")
+        response = self.receive(
+            [
+                {"product": self.product.id, "change": 5},
+                {"product": self.product.id, "change": "1.5"},
+                {"product": other_products[0].id, "change": 5},
+            ]
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([e["line"] for e in response.data["errors"]], [1, 2])
+        self.assertFalse(ItemActivity.objects.exists())
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.product_quantity, 0)
+
+
+class StockSnapshotTests(TestCase):
+    def setUp(self):
+        self.branch, self.products, _ = create_branch_fixture(stock=0)
+        self.product = self.products[0]
+        self.today = timezone.localdate()
+        self.manager = User.objects.create_user(
+            username="main_manager",
+            password="pass1234",
+            user_type="BRANCH_MANAGER",
+            branch=self.branch,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.manager)
+
+    def at(self, days_ago, hour):
+        day = self.today - timedelta(days=days_ago)
+        return timezone.make_aware(datetime.combine(day, dt_time(hour)))
+
+    def move(self, delta, days_ago, hour, product=None):
+        types = "ADD_STOCK" if delta > 0 else "REDUCE_STOCK"
+        activity = record_stock_movement(
+            (product or self.product).id, delta, types, abs(delta)
+        )
+        ItemActivity.objects.filter(id=activity.id).update(
+            created_at=self.at(days_ago, hour)
+        )
+        return activity
+
+    def stock_at(self, at):
+        response = self.client.get("/api/calculate/stock-as-of/", {"at": at})
+        self.assertEqual(response.status_code, 200, response.data)
+        rows = {row["product_id"]: row for row in response.data["data"]}
+        return rows[self.product.id]["quantity"], response.data["snapshot_date"]
+
+    def test_snapshots_chain_and_as_of_reads_only_recent_movements(self):
+        opening = self.move(50, 3, 10)
+        self.move(-5, 3, 15)
+        self.move(10, 2, 9)
+        self.move(-3, 1, 11)
+        call_command(
+            "snapshot_stock",
+            "--date",
+            str(self.today - timedelta(days=2)),
+            "--days",
+            "2",
+            stdout=io.StringIO(),
+        )
+        closing = dict(
+            StockSnapshot.objects.filter(product=self.product).values_list(
+                "business_date", "quantity"
+            )
+        )
+        self.assertEqual(
+            closing,
+            {self.today - timedelta(days=3): 45, self.today - timedelta(days=2): 55},
+        )
+
+        self.assertEqual(
+            self.stock_at(self.at(2, 8).isoformat()),
+            (45, self.today - timedelta(days=3)),
+        )
+        self.assertEqual(
+            self.stock_at(str(self.today - timedelta(days=1))),
+            (52, self.today - timedelta(days=2)),
+        )
+
+        # A product added after the snapshots falls back to its own ledger
+        late = Product.objects.create(
+            name="Late Item",
+            category=self.product.category,
+            branch=self.branch,
+            selling_price=100,
+        )
+        self.move(7, 1, 9, product=late)
+        products = Product.objects.filter(branch=self.branch)
+        with CaptureQueriesContext(connection) as queries:
+            quantities, _ = stock_as_of(self.at(0, 0), products)
+        self.assertEqual(len(queries), 3)
+        self.assertEqual((quantities[self.product.id], quantities[late.id]), (52, 7))
+
+        # Correcting an old movement shifts every later snapshot with it
+        response = self.client.patch(
+            f"/api/itemactivity/{opening.id}/", {"change": 40}, format="json"
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(
+            list(
+                StockSnapshot.objects.filter(product=self.product)
+                .order_by("business_date")
+                .values_list("quantity", flat=True)
+            ),
+            [35, 45],
+        )
+        self.assertEqual(self.stock_at(str(self.today - timedelta(days=1)))[0], 42)
+
+
+class StockAlertTests(TestCase):
+    def setUp(self):
+        self.branch, self.products, self.counter = create_branch_fixture(stock=7)
+        self.product = self.products[0]
+        Product.objects.filter(id=self.product.id).update(low_stock_bar=5)
+        self.manager = User.objects.create_user(
+            username="main_manager",
+            password="pass1234",
+            user_type="BRANCH_MANAGER",
+            branch=self.branch,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.manager)
+
+    def sell(self, quantity):
+        counter = APIClient()
+        counter.force_authenticate(self.counter)
+        response = counter.post(
+            "/api/invoice/",
+            invoice_payload(self.branch, [self.product], quantity=quantity),
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201, response.data)
+
+    def alert_events(self):
+        return [
+            alert
+            for event in OutboxEvent.objects.filter(payload__type="stock_alerts")
+            for alert in event.payload["alerts"]
+        ]
+
+    def test_alerts_open_on_crossing_and_resolve_on_restock(self):
+        self.sell(1)
+        self.assertFalse(StockAlert.objects.exists())
+
+        self.sell(2)
+        self.sell(1)
+        alert = StockAlert.objects.get()
+        self.assertEqual((alert.quantity, alert.resolved_at), (4, None))
+        self.assertEqual(
+            [(e["status"], e["quantity"]) for e in self.alert_events()], [("open", 4)]
+        )
+        event = OutboxEvent.objects.get(payload__type="stock_alerts")
+        self.assertEqual(
+            event.groups, ["stock_alerts", f"stock_alerts_branch_{self.branch.id}"]
+        )
+
+        response = self.client.get("/api/stock-alerts/")
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(
+            [(row["product_id"], row["quantity"]) for row in response.data["data"]],
+            [(self.product.id, 3)],
+        )
+
+        response = self.client.post(
+            f"/api/itemactivity/{self.product.id}/add/", {"change": 10}, format="json"
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        alert.refresh_from_db()
+        self.assertIsNotNone(alert.resolved_at)
+        self.assertEqual(self.alert_events()[-1]["status"], "resolved")
+        self.assertEqual(self.client.get("/api/stock-alerts/").data["count"], 0)
+
+        # Raising the threshold past current stock opens a new alert
+        response = self.client.put(
+            f"/api/products/{self.product.id}/", {"low_stock_bar": 20}, format="json"
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(StockAlert.objects.filter(resolved_at__isnull=True).count(), 1)
+
+
+    def test_new_product_at_the_bar_alerts_until_archived(self):
+        response = self.client.post(
+            "/api/products/",
+            {
+                "name": "Muffin",
+                "category": self.product.category_id,
+                "cost_price": 40,
+                "selling_price": 90,
+                "product_quantity": 2,
+                "low_stock_bar": 5,
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201, response.data)
+        product_id = response.data["data"]["id"]
+        alert = StockAlert.objects.get(product_id=product_id)
+        self.assertIsNone(alert.resolved_at)
+        self.assertEqual(
+            [row["product_id"] for row in self.client.get("/api/stock-alerts/").data["data"]],
+            [product_id],
+        )
+
+        response = self.client.delete(f"/api/products/{product_id}/")
+        self.assertEqual(response.status_code, 200, response.data)
+        alert.refresh_from_db()
+        self.assertIsNotNone(alert.resolved_at)
+        self.assertEqual(self.alert_events()[-1]["status"], "resolved")
+        self.assertEqual(self.client.get("/api/stock-alerts/").data["count"], 0)
+
+    def test_branchless_products_fall_back_to_the_category_branch(self):
+        Product.objects.filter(id=self.product.id).update(branch=None)
+
+        self.sell(3)
+        self.assertEqual(
+            list(StockAlert.objects.values_list("product_id", "branch_id")),
+            [(self.product.id, self.branch.id)],
+        )
+
+    def test_inventory_pages_products_with_search(self):
+        first = self.client.get("/api/products/", {"limit": 2})
+        self.assertEqual(first.status_code, 200, first.data)
+        self.assertEqual(len(first.data["data"]), 2)
+        rest = self.client.get(
+            "/api/products/", {"limit": 2, "cursor": first.data["next_cursor"]}
+        )
+        self.assertIsNone(rest.data["next_cursor"])
+        self.assertEqual(
+            sorted(p["id"] for p in first.data["data"] + rest.data["data"]),
+            [p.id for p in self.products],
+        )
+
+        found = self.client.get("/api/products/", {"limit": 2, "search": "item 1"})
+        self.assertEqual(
+            [p["id"] for p in found.data["data"]], [self.products[1].id]
+        )
+
+    def test_backfill_opens_alerts_for_products_already_low(self):
+        from importlib import import_module
+
+        from django.apps import apps
+
+        backfill = import_module("api.migrations.0087_backfill_stock_alerts")
+        Product.objects.filter(id=self.products[1].id).update(low_stock_bar=7)
+        Product.objects.filter(id=self.products[2].id).update(
+            low_stock_bar=7, is_deleted=True
+        )
+
+        backfill.open_existing_alerts(apps, None)
+        backfill.open_existing_alerts(apps, None)
+        self.assertEqual(
+            list(StockAlert.objects.values_list("product_id", "branch_id", "quantity")),
+            [(self.products[1].id, self.branch.id, 7)],
+        )
+
+
+class SalesRollupTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.branch, self.products, self.counter = create_branch_fixture()
+        self.client = APIClient()
+        self.client.force_authenticate(self.counter)
+
+    def create_invoice(self, products, paid="0.00"):
+        payload = invoice_payload(self.branch, products, quantity=2)
+        payload["paid_amount"] = paid
+        response = self.client.post("/api/invoice/", payload, format="json")
+        self.assertEqual(response.status_code, 201, response.data)
+        return Invoice.objects.get(id=response.data["data"]["id"])
+
+    def test_incremental_rollups_match_rebuild(self):
+        paid = self.create_invoice(self.products, paid="600.00")
+        partial = self.create_invoice(self.products[:2], paid="100.00")
+        # Created without stock activity, so it can be deleted
+        doomed = Invoice.objects.create(
+            branch=self.branch, invoice_number="manual-1", total_amount=300
+        )
+        InvoiceItem.objects.create(
+            invoice=doomed, product=self.products[2], quantity=3, unit_price=100
+        )
+
+        response = self.client.post(
+            f"/api/invoice/{partial.id}/payments/",
+            {"amount": "50.00", "payment_method": "QR"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201, response.data)
+
+        line = paid.bills.first()
+        line.quantity = 5
+        line.save()
+        partial.bills.last().delete()
+
+        admin = User.objects.create_user(
+            username="hq_admin", password="pass1234", user_type="ADMIN"
+        )
+        self.client.force_authenticate(admin)
+        response = self.client.delete(f"/api/invoice/{doomed.id}/")
+        self.assertEqual(response.status_code, 204)
+
+        incremental = rollup_rows()
+        rebuild_rollups()
+        self.assertEqual(incremental, rollup_rows())
+
+    def test_rollups_commit_and_roll_back_with_the_sale(self):
+        # Written by the sale itself, without running on_commit callbacks
+        with self.captureOnCommitCallbacks():
+            self.create_invoice(self.products, paid="600.00")
+        self.assertEqual(
+            SalesRollup.objects.get(payment_status="PAID").total_amount, Decimal("600")
+        )
+        self.assertEqual(BranchStats.objects.get(branch=self.branch).revenue, 600)
+
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            self.create_invoice(self.products, paid="600.00")
+            raise RuntimeError
+        self.assertEqual(SalesRollup.objects.get(payment_status="PAID").invoice_count, 1)
+        self.assertEqual(BranchStats.objects.get(branch=self.branch).revenue, 600)
+
+    def test_report_reads_rollups(self):
+        self.create_invoice(self.products, paid="600.00")
+        self.create_invoice(self.products[:1])
+
+        manager = User.objects.create_user(
+            username="main_manager",
+            password="pass1234",
+            user_type="BRANCH_MANAGER",
+            branch=self.branch,
+        )
+        self.client.force_authenticate(manager)
+        report = self.client.get("/api/calculate/report-dashboard/", {"timeframe": "daily"})
+        self.assertEqual(report.status_code, 200)
+        self.assertEqual(report.data["total_month_orders"], 2)
+        self.assertEqual(report.data["total_month_sales"], 800.0)
+        self.assertEqual(
+            {row["payment_status"]: row["total_amount"] for row in report.data["sales_by_status"]},
+            {"PAID": 600, "PENDING": 200},
+        )
+        self.assertEqual(report.data["top_selling_items_count"][0]["total_orders"], 4)
+
+    def test_heatmap_groups_rollups_by_weekday_and_hour(self):
+        invoice = self.create_invoice(self.products, paid="600.00")
+        old = Invoice.objects.create(
+            branch=self.branch, invoice_number="manual-1", total_amount=300
+        )
+        old.created_at -= timedelta(weeks=3)
+        old.save()
+
+        manager = User.objects.create_user(
+            username="main_manager", user_type="BRANCH_MANAGER", branch=self.branch
+        )
+        self.client.force_authenticate(manager)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/calculate/sales-heatmap/", {"weeks": 4})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len([q for q in queries if "rollup" in q["sql"]]), 1)
+
+        local = timezone.localtime(invoice.created_at)
+        day, hour = local.weekday(), local.hour
+        self.assertEqual(sum(map(sum, response.data["orders"])), 2)
+        self.assertEqual(response.data["orders"][day][hour], 2)
+        self.assertEqual(response.data["revenue"][day][hour], 900.0)
+        self.assertEqual(response.data["weekday_occurrences"], [4] * 7)
+        self.assertEqual(response.data["avg_orders"][day][hour], 0.5)
+
+        response = self.client.get("/api/calculate/sales-heatmap/", {"weeks": 0})
+        self.assertEqual(response.status_code, 400)
+
+
+class DemandForecastTests(TestCase):
+    def setUp(self):
+        self.branch, self.products, self.counter = create_branch_fixture()
+        self.target = date(2026, 3, 10)
+        weekly = [10, 10, 10, 20]
+        for weeks_back, quantity in zip(range(4, 0, -1), weekly):
+            ProductSalesRollup.objects.create(
+                branch=self.branch,
+                product=self.products[0],
+                business_date=self.target - timedelta(weeks=weeks_back),
+                hour=9,
+                quantity=quantity,
+                amount=quantity * 100,
+            )
+        # Another weekday; must not count towards a Tuesday
+        ProductSalesRollup.objects.create(
+            branch=self.branch,
+            product=self.products[0],
+            business_date=self.target - timedelta(days=1),
+            hour=9,
+            quantity=100,
+            amount=10000,
+        )
+
+    @override_settings(FORECAST_SMOOTHING=0.3, FORECAST_SAFETY_MARGIN=0.1)
+    def test_forecast_smooths_the_same_weekday(self):
+        self.assertEqual(forecast_demand(self.target, weeks=4), 1)
+        forecast = DemandForecast.objects.get()
+        self.assertEqual(forecast.expected_quantity, Decimal("13.95"))
+        self.assertEqual(forecast.suggested_quantity, 16)
+        self.assertEqual(forecast.history_days, 4)
+
+        # Rerunning replaces the day's forecasts
+        forecast_demand(self.target, weeks=4)
+        self.assertEqual(DemandForecast.objects.count(), 1)
+
+    def test_bake_plan_lists_the_forecast(self):
+        forecast_demand(self.target, weeks=4)
+        kitchen = User.objects.create_user(
+            username="main_kitchen", user_type="KITCHEN", branch=self.branch
+        )
+        client = APIClient()
+        client.force_authenticate(kitchen)
+        response = client.get("/api/calculate/bake-plan/", {"date": "2026-03-10"})
+        self.assertEqual(response.status_code, 200)
+        [row] = response.data["data"]
+        self.assertEqual(row["product_id"], self.products[0].id)
+        self.assertEqual((row["in_stock"], row["to_bake"]), (100, 0))
+
+
+class BranchStatsTests(TestCase):
+    def setUp(self):
+        self.branch, self.products, self.counter = create_branch_fixture()
+        self.admin = User.objects.create_user(
+            username="hq_admin", password="pass1234", user_type="ADMIN"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def stats(self):
+        return BranchStats.objects.get(branch=self.branch)
+
+    def test_counters_follow_invoice_and_user_writes(self):
+        invoice = Invoice.objects.create(
+            branch=self.branch, invoice_number="B-1", total_amount=100
+        )
+        Invoice.objects.create(
+            branch=self.branch, invoice_number="B-2", total_amount=50
+        )
+        invoice.total_amount = 80
+        invoice.save()
+        self.assertEqual(self.stats().revenue, 130)
+
+        manager = User.objects.create_user(
+            username="main_manager", user_type="BRANCH_MANAGER", branch=self.branch
+        )
+        self.assertEqual(
+            (self.stats().staff_count, self.stats().manager_id), (2, manager.id)
+        )
+        other = Branch.objects.create(name="Other", location="Lalitpur")
+        manager.branch = other
+        manager.save()
+        self.assertEqual(
+            (self.stats().staff_count, self.stats().manager_id), (1, None)
+        )
+        self.assertEqual(BranchStats.objects.get(branch=other).manager_id, manager.id)
+
+        columns = ("branch", "revenue", "staff_count", "manager")
+        expected = list(BranchStats.objects.values_list(*columns).order_by("branch"))
+        rebuild_branch_stats()
+        self.assertEqual(
+            list(BranchStats.objects.values_list(*columns).order_by("branch")),
+            expected,
+        )
+
+    def test_branch_list_is_one_query(self):
+        Invoice.objects.create(
+            branch=self.branch, invoice_number="B-1", total_amount=100
+        )
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/branch/")
+        self.assertEqual(len(queries), 1)
+        branch = response.data["data"][0]
+        self.assertEqual(
+            (branch["revenue"], branch["today_revenue"]), ("100.00", "100.00")
+        )
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.branch, self.products, counter = create_branch_fixture()
+        seed_branch_activity(self.branch, self.products, counter, invoices=3)
+        other, products, counter = create_branch_fixture(name="Other")
+        seed_branch_activity(other, products, counter)
+        self.manager = User.objects.create_user(
+            username="main_manager",
+            password="pass1234",
+            user_type="BRANCH_MANAGER",
+            branch=self.branch,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.manager)
+
+    def export(self, dataset, **params):
+        response = self.client.get(
+            f"/api/export/{dataset}/", {"timeframe": "daily", **params}
+        )
+        self.assertEqual(response.status_code, 200)
+        return response, b"".join(response.streaming_content)
+
+    def test_csv_export_streams_the_branch_rows(self):
+        response, content = self.export("items")
+        rows = list(csv.reader(content.decode().splitlines()))
+        self.assertEqual(
+            rows[0][:3], ["id", "invoice__invoice_number", "invoice__created_at"]
+        )
+        self.assertEqual(
+            len(rows) - 1,
+            InvoiceItem.objects.filter(invoice__branch=self.branch).count(),
+        )
+        self.assertIn('filename="items_', response["Content-Disposition"])
+
+    def test_gzipped_jsonl_export(self):
+        response, content = self.export("payments", file_type="jsonl", gzip="1")
+        self.assertEqual(response["Content-Type"], "application/gzip")
+        rows = [json.loads(line) for line in gzip.decompress(content).splitlines()]
+        self.assertEqual(len(rows), 3)
+        self.assertEqual({row["payment_method"] for row in rows}, {"CASH"})
+
+
+    @mock.patch("api.views_dir.export_view.EXPORT_FLUSH_BYTES", 1)
+    async def test_export_streams_block_by_block_under_asgi(self):
+        from rest_framework_simplejwt.tokens import AccessToken
+
+        token = AccessToken.for_user(self.manager)
+        response = await AsyncClient().get(
+            "/api/export/items/",
+            {"timeframe": "daily", "file_type": "jsonl"},
+            headers={"Authorization": f"Bearer {token}"},
+        )
+        self.assertEqual(response.status_code, 200)
+        # An async iterator is sent as it is produced, not list()ed first
+        self.assertTrue(response.is_async)
+        blocks = [block async for block in response.streaming_content]
+        rows = await InvoiceItem.objects.filter(invoice__branch=self.branch).acount()
+        self.assertEqual(len(blocks), rows)
+
+class DashboardCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.branch, self.products, self.counter = create_branch_fixture()
+        self.manager = User.objects.create_user(
+            username="main_manager",
+            password="pass1234",
+            user_type="BRANCH_MANAGER",
+            branch=self.branch,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.manager)
+
+    def report(self):
+        return self.client.get("/api/calculate/report-dashboard/", {"timeframe": "daily"})
+
+    def test_repeat_requests_are_served_from_cache(self):
+        self.report()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.report()
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([q for q in queries if "rollup" in q["sql"]])
+
+    def test_writes_invalidate_the_branch(self):
+        self.assertEqual(self.report().data["total_month_orders"], 0)
+
+        counter = APIClient()
+        counter.force_authenticate(self.counter)
+        with self.captureOnCommitCallbacks(execute=True):
+            counter.post(
+                "/api/invoice/",
+                invoice_payload(self.branch, self.products),
+                format="json",
+            )
+
+        self.assertEqual(self.report().data["total_month_orders"], 1)
+
+    def test_concurrent_misses_compute_once(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return {"value": 1}
+
+        def fetch():
+            results.append(
+                cached_dashboard("test", self.branch.id, "a", "b", "daily", compute)
+            )
+
+        results = []
+        threads = [threading.Thread(target=fetch) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{"value": 1}] * 5)
+
+
+    def test_evicted_version_does_not_revive_old_payloads(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return {"value": len(calls)}
+
+        def fetch():
+            return cached_dashboard("test", self.branch.id, "a", "b", "daily", compute)
+
+        self.assertEqual(fetch(), {"value": 1})
+        cache.delete(version_key(self.branch.id))
+        self.assertEqual(fetch(), {"value": 2})
+
+class CatalogTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.branch, self.products, counter = create_branch_fixture()
+        self.other_branch, self.other_products, _ = create_branch_fixture(name="North")
+        self.client = APIClient()
+        self.client.force_authenticate(counter)
+
+    def test_unchanged_catalog_is_a_304_without_queries(self):
+        response = self.client.get("/api/catalog/")
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+        catalog = json.loads(response.content)
+        self.assertEqual(
+            sorted(p["id"] for p in catalog["products"]),
+            [p.id for p in self.products],
+        )
+        self.assertNotIn("product_quantity", catalog["products"][0])
+
+        with self.assertNumQueries(0):
+            response = self.client.get("/api/catalog/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        response = self.client.get("/api/catalog/", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(json.loads(gzip.decompress(response.content)), catalog)
+        self.assertEqual(response["ETag"], etag[:-1] + '-gz"')
+
+        response = self.client.get(
+            "/api/catalog/",
+            HTTP_IF_NONE_MATCH=response["ETag"],
+            HTTP_ACCEPT_ENCODING="gzip",
+        )
+        self.assertEqual(response.status_code, 304)
+
+        # Other branches' writes and stock movements keep the version
+        with self.captureOnCommitCallbacks(execute=True):
+            self.other_products[0].selling_price = 80
+            self.other_products[0].save()
+            apply_stock_changes({self.products[0].id: -5})
+        response = self.client.get("/api/catalog/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Floor.objects.create(branch=self.branch, name="Rooftop", table_count=3)
+        response = self.client.get("/api/catalog/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(
+            [f["name"] for f in json.loads(response.content)["floors"]], ["Rooftop"]
+        )
+
+
+    def test_concurrent_misses_build_once(self):
+        calls = []
+
+        def build(branch_id=None):
+            calls.append(branch_id)
+            time.sleep(0.2)
+            return {"etag": '"x"', "body": b"{}", "gzip": b""}
+
+        def fetch():
+            results.append(cached_catalog(self.branch.id))
+
+        results = []
+        threads = [threading.Thread(target=fetch) for _ in range(5)]
+        with mock.patch("api.views_dir.catalog_view.build_catalog", build):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(calls, [self.branch.id])
+        self.assertEqual(len(results), 5)
+
+class DashboardHubTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    @override_settings(DASHBOARD_HUB_POLL_INTERVAL=0.01)
+    def test_streams_share_one_computation_per_change(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return f"payload {len(calls)}"
+
+        async def scenario():
+            hub = DashboardHub()
+            key = (7, "daily", "a", "b")
+            queues = [await hub.subscribe(key, 7, compute) for _ in range(10)]
+            first = [queue.get_nowait() for queue in queues]
+
+            await sync_to_async(bump_dashboard_version)(7)
+            second = [
+                await asyncio.wait_for(queue.get(), timeout=2) for queue in queues
+            ]
+
+            for queue in queues:
+                hub.unsubscribe(key, queue)
+            await asyncio.wait_for(hub.task, timeout=2)
+            return first, second, hub.subscriptions
+
+        first, second, remaining = asyncio.run(scenario())
+        self.assertEqual(first, ["payload 1"] * 10)
+        self.assertEqual(second, ["payload 2"] * 10)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(remaining, {})
+
+    def test_patch_carries_only_changed_sections(self):
+        before = DashboardSnapshot({"orders": 1, "trend": [1, 2], "old": "x"})
+        after = DashboardSnapshot({"orders": 2, "trend": [1, 2], "new": "y"})
+
+        event, data = after.patch_message(before).strip().split("\n")
+        patch = json.loads(data.removeprefix("data: "))
+        self.assertEqual(event, "event: dashboard_patch")
+        self.assertEqual(patch["base"], before.checksum)
+        self.assertEqual(patch["checksum"], after.checksum)
+        self.assertCountEqual(
+            patch["patch"],
+            [
+                {"op": "replace", "path": "/orders", "value": 2},
+                {"op": "add", "path": "/new", "value": "y"},
+                {"op": "remove", "path": "/old"},
+            ],
+        )
+        same = DashboardSnapshot({"new": "y", "orders": 2, "trend": [1, 2]})
+        self.assertIsNone(same.patch_message(after))
+
+
+class StaffReportTests(TestCase):
+    def setUp(self):
+        self.branch, self.products, self.counter = create_branch_fixture()
+        self.waiter = User.objects.create_user(
+            username="main_waiter",
+            password="pass1234",
+            user_type="WAITER",
+            branch=self.branch,
+        )
+        self.manager = User.objects.create_user(
+            username="main_manager",
+            password="pass1234",
+            user_type="BRANCH_MANAGER",
+            branch=self.branch,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.manager)
+
+    def invoice(self, total, **people):
+        return Invoice.objects.create(
+            branch=self.branch,
+            invoice_number=f"S-{Invoice.objects.count()}",
+            total_amount=total,
+            **people,
+        )
+
+    def report(self):
+        response = self.client.get(
+            "/api/calculate/staff-report/", {"timeframe": "daily"}
+        )
+        self.assertEqual(response.status_code, 200)
+        return {row["username"]: row for row in response.data["staff_performance"]}
+
+    def test_invoices_count_once_per_staff_member(self):
+        self.invoice(100, created_by=self.counter, received_by_counter=self.counter)
+        self.invoice(
+            50,
+            created_by=self.waiter,
+            received_by_waiter=self.waiter,
+            received_by_counter=self.counter,
+            payment_status="PARTIAL",
+        )
+        yesterday = self.invoice(70, created_by=self.waiter)
+        yesterday.created_at -= timedelta(days=1)
+        yesterday.save()
+
+        report = self.report()
+        self.assertEqual(
+            (report["main_counter"]["orders"], report["main_counter"]["sales"]),
+            (2, 150.0),
+        )
+        self.assertEqual(report["main_counter"]["cash_in_hand"], 50.0)
+        self.assertEqual(
+            (report["main_waiter"]["orders"], report["main_waiter"]["sales"]),
+            (1, 50.0),
+        )
+        self.assertEqual(report["main_manager"]["orders"], 0)
+
+    def test_query_count_does_not_grow_with_staff(self):
+        self.invoice(100, created_by=self.counter)
+        with CaptureQueriesContext(connection) as before:
+            self.report()
+
+        for i in range(10):
+            waiter = User.objects.create_user(
+                username=f"waiter_{i}", user_type="WAITER", branch=self.branch
+            )
+            self.invoice(10, created_by=self.counter, received_by_waiter=waiter)
+        with CaptureQueriesContext(connection) as after:
+            report = self.report()
+
+        self.assertEqual(len(after), len(before))
+        self.assertEqual(report["waiter_3"]["orders"], 1)
+
+
+@unittest.skipUnless(
+    os.environ.get("API_BENCHMARK_STAFF_REPORT"),
+    "Set API_BENCHMARK_STAFF_REPORT=1 to run the staff report benchmark",
+)
+class StaffReportBenchmarkTests(TestCase):
+    """Staff report over 200 staff and 100k invoices; timing goes to BENCHMARK_REPORT."""
+
+    STAFF = 200
+    INVOICES = 100_000
+
+    def test_staff_report_at_scale(self):
+        branch, _, _ = create_branch_fixture()
+        staff = User.objects.bulk_create(
+            User(
+                username=f"staff_{i}",
+                user_type=["WAITER", "COUNTER"][i % 2],
+                branch=branch,
+            )
+            for i in range(self.STAFF)
+        )
+        Invoice.objects.bulk_create(
+            (
+                Invoice(
+                    branch=branch,
+                    invoice_number=f"BENCH-{i}",
+                    total_amount=100,
+                    payment_status=["PAID", "PARTIAL"][i % 2],
+                    created_by=staff[i % self.STAFF],
+                    received_by_waiter=staff[(i * 7) % self.STAFF],
+                    received_by_counter=staff[(i * 13) % self.STAFF],
+                )
+                for i in range(self.INVOICES)
+            ),
+            batch_size=5000,
+        )
+        manager = User.objects.create_user(
+            username="bench_manager", user_type="BRANCH_MANAGER", branch=branch
+        )
+        client = APIClient()
+        client.force_authenticate(manager)
+
+        started = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(
+                "/api/calculate/staff-report/", {"timeframe": "daily"}
+            )
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        self.assertEqual(response.status_code, 200)
+        # The fixture's counter and the manager are staff too
+        self.assertEqual(len(response.data["staff_performance"]), self.STAFF + 2)
+        self.assertLessEqual(len(queries), 5)
+        path = os.path.splitext(BENCHMARK_REPORT)[0] + "_staff_report.json"
+        with open(path, "w") as report:
+            json.dump(
+                {
+                    "staff": self.STAFF,
+                    "invoices": self.INVOICES,
+                    "queries": len(queries),
+                    "ms": round(elapsed_ms, 1),
+                },
+                report,
+                indent=2,
+            )
+
+
+def query_plan(sql):
+    """Database plan for a captured query, as one string."""
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            cursor.execute("EXPLAIN " + sql)
+        else:
+            cursor.execute("EXPLAIN QUERY PLAN " + sql)
+        return "\n".join(str(row[-1]) for row in cursor.fetchall())
+
+
+class ReportIndexUsageTests(TestCase):
+    """The dashboard/report queries must not full-scan invoices or rollups."""
+
+    TABLES = (
+        "api_invoice",
+        "api_salesrollup",
+        "api_productsalesrollup",
+        "api_paymentrollup",
+    )
+
+    def setUp(self):
+        self.branch, self.products, counter = create_branch_fixture()
+        seed_branch_activity(self.branch, self.products, counter, invoices=3)
+        self.manager = User.objects.create_user(
+            username="main_manager",
+            password="pass1234",
+            user_type="BRANCH_MANAGER",
+            branch=self.branch,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.manager)
+
+    def test_report_queries_use_indexes(self):
+        urls = [
+            "/api/calculate/report-dashboard/",
+            "/api/calculate/dashboard-details/",
+            "/api/calculate/sales-heatmap/",
+        ]
+        for url in urls:
+            for timeframe in ["daily", "yearly"]:
+                cache.clear()
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url, {"timeframe": timeframe})
+                self.assertEqual(response.status_code, 200)
+
+                for query in queries:
+                    sql = query["sql"]
+                    tables = re.findall(r'FROM "(\w+)"', sql)
+                    if not sql.startswith("SELECT") or not set(tables) & set(self.TABLES):
+                        continue
+                    plan = query_plan(sql)
+                    with self.subTest(url=url, timeframe=timeframe, sql=sql):
+                        for table in self.TABLES:
+                            self.assertNotRegex(plan, rf"Seq Scan on {table}\b")
+                            self.assertNotRegex(plan, rf"SCAN {table}(\n|$)")
+                        # Date ranges must be index conditions, not row filters
+                        self.assertNotRegex(sql, r"django_datetime_cast_date|AT TIME ZONE")
+                        if re.search(r"\"(created_at|business_date)\" [<>]", sql):
+                            self.assertRegex(plan, r"(created_at|business_date)\W*\s*[<>]")
+
+
+# ------------------ Query budgets ------------------
+
+# Every GET route, formatted with the ids of the first seeded branch.
+BUDGET_ROUTES = [
+    "calculate/dashboard-details/",
+    "calculate/dashboard-details/{branch}/",
+    "calculate/report-dashboard/",
+    "calculate/report-dashboard/{branch}/",
+    "calculate/sales-heatmap/",
+    "calculate/sales-heatmap/{branch}/",
+    "calculate/staff-report/",
+    "calculate/staff-report/{branch}/",
+    "calculate/bake-plan/",
+    "calculate/bake-plan/{branch}/",
+    "calculate/stock-as-of/",
+    "calculate/stock-as-of/{branch}/",
+    "stock-alerts/",
+    "users/",
+    "users/{user}/",
+    "products/",
+    "products/{product}/",
+    "products/{product}/sales/",
+    "catalog/",
+    "category/",
+    "category/{category}/",
+    "kitchentype/",
+    "kitchentype/{kitchentype}/",
+    "branch/",
+    "branch/{branch}/",
+    "customer/",
+    "customer/{customer}/",
+    "invoice/",
+    "invoice/{invoice}/",
+    "payments/",
+    "invoice/{invoice}/payments/",
+    "payments/{payment}/",
+    "floor/",
+    "floor/{floor}/",
+    "itemactivity/{product}/detail/",
+    "itemactivity/{activity}/",
+    "notifications/",
+    "notifications/{notification}/",
+    "export/invoices/",
+    "export/items/",
+    "export/payments/",
+    "test-rate-limit/",
+]
+
+# Routes without a GET handler, or that never finish (SSE)
+UNBUDGETED_ROUTES = {
+    "change-password/",
+    "admin-reset-password/<int:user_id>/",
+    "dashboard/stream/",
+    "itemactivity/receive/",
+}
+
+BUDGET_ROLES = ["SUPER_ADMIN", "ADMIN", "BRANCH_MANAGER", "COUNTER", "WAITER", "KITCHEN"]
+
+# Upper bound for any single read request
+MAX_QUERIES_PER_REQUEST = 40
+
+BENCHMARK_REPORT = os.environ.get(
+    "API_BENCHMARK_REPORT",
+    os.path.join(tempfile.gettempdir(), "api_benchmark.json"),
+)
+
+
+def api_route_patterns(patterns=None, prefix=""):
+    """Every route string under api/ (including calculate/)."""
+    for pattern in api_urls.urlpatterns if patterns is None else patterns:
+        if isinstance(pattern, URLResolver):
+            yield from api_route_patterns(
+                pattern.url_patterns, prefix + str(pattern.pattern)
+            )
+        else:
+            yield prefix + str(pattern.pattern)
+
+
+def seed_branch_activity(branch, products, counter, invoices=2, customers=2):
+    """Customers, invoices (with items, payments and stock activity) and notifications."""
+    client = APIClient()
+    client.force_authenticate(counter)
+    for i in range(customers):
+        Customer.objects.create(
+            name=f"{branch.name} Customer {Customer.objects.count()}",
+            phone=f"98{i:08d}",
+            branch=branch,
+        )
+    customer = Customer.objects.filter(branch=branch).first()
+    for _ in range(invoices):
+        payload = invoice_payload(branch, products)
+        payload.update(
+            customer=customer.id, paid_amount="100.00", payment_method="CASH"
+        )
+        response = client.post("/api/invoice/", payload, format="json")
+        assert response.status_code == 201, response.data
+        invoice = Invoice.objects.get(id=response.data["data"]["id"])
+        Notification.objects.create(
+            invoice=invoice, branch=branch, message=f"{invoice.invoice_number} ready"
+        )
+
+
+class QueryBudgetTests(TestCase):
+    """
+    Read endpoints must run a fixed number of queries, whatever the data size.
+
+    Each route is requested by every role against a small multi-branch
+    dataset, the dataset is grown, and the route is requested again. The
+    query counts must match and stay under MAX_QUERIES_PER_REQUEST.
+    Timings go to BENCHMARK_REPORT as JSON.
+    """
+
+    timings = []
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        if cls.timings:
+            with open(BENCHMARK_REPORT, "w") as report:
+                json.dump(cls.timings, report, indent=2)
+
+    def setUp(self):
+        cache.clear()
+        self.fixtures = []
+        for name in ["Main", "North", "South"]:
+            branch, products, counter = create_branch_fixture(name=name)
+            Floor.objects.create(branch=branch, name=f"{name} Ground", table_count=4)
+            self.fixtures.append((branch, products, counter))
+            seed_branch_activity(branch, products, counter)
+
+        branch, products, counter = self.fixtures[0]
+        self.users = {
+            "SUPER_ADMIN": User.objects.create_superuser(
+                username="root", password="pass1234", email="root@example.com"
+            ),
+            "ADMIN": User.objects.create_user(
+                username="hq_admin", password="pass1234", user_type="ADMIN"
+            ),
+            "COUNTER": counter,
+        }
+        for role in ["BRANCH_MANAGER", "WAITER", "KITCHEN"]:
+            self.users[role] = User.objects.create_user(
+                username=f"main_{role.lower()}",
+                password="pass1234",
+                user_type=role,
+                branch=branch,
+                kitchentype=branch.kitchentype_branch.first(),
+            )
+
+        invoice = Invoice.objects.filter(branch=branch).first()
+        self.ids = {
+            "branch": branch.id,
+            "user": counter.id,
+            "product": products[0].id,
+            "category": products[0].category_id,
+            "kitchentype": products[0].category.kitchentype_id,
+            "customer": invoice.customer_id,
+            "invoice": invoice.id,
+            "payment": Payment.objects.filter(invoice=invoice).first().id,
+            "floor": Floor.objects.get(branch=branch).id,
+            "activity": ItemActivity.objects.filter(product=products[0]).first().id,
+            "notification": Notification.objects.filter(branch=branch).first().id,
+        }
+
+    def grow_dataset(self):
+        branch, products, counter = create_branch_fixture(name="East")
+        Floor.objects.create(branch=branch, name="East Ground", table_count=4)
+        self.fixtures.append((branch, products, counter))
+        for branch, products, counter in self.fixtures:
+            seed_branch_activity(branch, products, counter, invoices=6, customers=6)
+            for i in range(3):
+                Product.objects.create(
+                    name=f"{branch.name} Extra {i}",
+                    category=products[0].category,
+                    branch=branch,
+                    selling_price=50,
+                    product_quantity=10,
+                )
+            User.objects.create_user(
+                username=f"{branch.name.lower()}_waiter_extra",
+                password="pass1234",
+                user_type="WAITER",
+                branch=branch,
+            )
+
+    def measure(self, client, url, repeat=3):
+        durations = []
+        for _ in range(repeat):
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = client.get(url)
+                if response.streaming:
+                    b"".join(response.streaming_content)
+                durations.append(time.perf_counter() - started)
+        return response, len(queries), statistics.median(durations)
+
+    def run_routes(self, scale):
+        counts = {}
+        for role in BUDGET_ROLES:
+            client = APIClient()
+            client.force_authenticate(self.users[role])
+            for route in BUDGET_ROUTES:
+                url = "/api/" + route.format(**self.ids)
+                response, queries, seconds = self.measure(client, url)
+                self.assertLess(
+                    response.status_code, 500, f"{role} GET {url} -> {response.status_code}"
+                )
+                counts[role, route] = queries
+                self.timings.append(
+                    {
+                        "role": role,
+                        "route": route,
+                        "scale": scale,
+                        "status": response.status_code,
+                        "queries": queries,
+                        "seconds": round(seconds, 5),
+                    }
+                )
+        return counts
+
+    def test_every_route_is_budgeted(self):
+        budgeted = {
+            resolve("/api/" + route.format(**self.ids)).route.removeprefix("api/")
+            for route in BUDGET_ROUTES
+        }
+        missing = [
+            pattern
+            for pattern in api_route_patterns()
+            if pattern not in budgeted | UNBUDGETED_ROUTES
+        ]
+        self.assertEqual(missing, [])
+
+    def test_query_counts_do_not_grow_with_data(self):
+        small = self.run_routes("small")
+        self.grow_dataset()
+        large = self.run_routes("large")
+
+        for key, queries in large.items():
+            with self.subTest(role=key[0], route=key[1]):
+                self.assertEqual(
+                    queries,
+                    small[key],
+                    f"{key[1]} as {key[0]}: {small[key]} -> {queries} queries",
+                )
+                self.assertLessEqual(queries, MAX_QUERIES_PER_REQUEST)
+
+    def test_invoice_create_query_count_is_independent_of_basket_size(self):
+        branch, products, counter = self.fixtures[0]
+        client = APIClient()
+        client.force_authenticate(counter)
+
+        counts = []
+        for basket in [products[:1], products]:
+            with CaptureQueriesContext(connection) as queries:
+                response = client.post(
+                    "/api/invoice/", invoice_payload(branch, basket), format="json"
+                )
+            self.assertEqual(response.status_code, 201, response.data)
+            counts.append(len(queries))
+
+        self.assertEqual(counts[0], counts[1])
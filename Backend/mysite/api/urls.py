@@ -9,6 +9,12 @@ urlpatterns = [
     path("users/<int:id>/", views.UserView.as_view(), name="users"),
     path("products/<int:id>/", views.ProductView.as_view(), name="product"),
     path("products/", views.ProductView.as_view(), name="product_details"),
+    path(
+        "products/<int:id>/sales/",
+        views.ProductSalesView.as_view(),
+        name="product_sales",
+    ),
+    path("catalog/", views.CatalogView.as_view(), name="catalog"),
     path("category/", views.CategoryViewClass.as_view(), name="Category"),
     path(
         "category/<int:id>/", views.CategoryViewClass.as_view(), name="Category_details"
@@ -30,8 +36,14 @@ urlpatterns = [
     path(
         "payments/<int:payment_id>/", views.PaymentView.as_view(), name="payment-detail"
     ),
+    path("export/<str:dataset>/", views.ExportView.as_view(), name="export"),
     path("floor/", views.FloorView.as_view(), name="floor-detail"),
     path("floor/<int:floor_id>/", views.FloorView.as_view(), name="floor-details"),
+    path(
+        "itemactivity/receive/",
+        views.StockReceiveView.as_view(),
+        name="stock_receive",
+    ),  # bulk add stock for a delivery
     path(
         "itemactivity/<int:product_id>/<str:action>/",
         views.ItemActivityView.as_view(),
@@ -41,6 +53,7 @@ urlpatterns = [
         views.ItemActivityView.as_view(),
         name="activity_detail",
     ),
+    path("stock-alerts/", views.StockAlertView.as_view(), name="stock_alerts"),
     path("notifications/", views.NotificationViewClass.as_view(), name="notifications"),
     path("notifications/<int:id>/", views.NotificationViewClass.as_view(), name="notification_detail"),
     path("change-password/", views.change_own_password, name="change-password"),
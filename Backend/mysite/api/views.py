@@ -13,17 +13,25 @@ from .views_dir import floor_view, item_activity_view, auth_view
 from .views_dir.auth_view import CookieTokenObtainPairView, CookieTokenRefreshView, LogoutView
 
 from .views_dir.branch_view import BranchViewClass
+from .views_dir.catalog_view import CatalogViewClass
 from .views_dir.categorys_view import CategoryViewClass
 from .views_dir.customer_view import CustomerViewClass
 from .views_dir.invoice_view import InvoiceViewClass
-from .views_dir.dashboard_view import DashboardViewClass, ReportDashboardViewClass
+from .views_dir.dashboard_view import (
+    DashboardViewClass,
+    ReportDashboardViewClass,
+    SalesHeatmapViewClass,
+)
+from .views_dir.export_view import ExportViewClass
+from .views_dir.forecast_view import BakePlanViewClass
 from .views_dir.staff_view import StaffReportViewClass
+from .views_dir.stock_view import StockAlertViewClass, StockAsOfViewClass
 from .views_dir.payment_view import PaymentClassView
 from .views_dir.kitchentype_view import KitchenViewClass
 from .views_dir.notification_view import NotificationViewClass
 
 # custom
-from .views_dir.product_view import ProductViewClass
+from .views_dir.product_view import ProductSalesViewClass, ProductViewClass
 from .views_dir.users_view import UserViewClass
 
 
@@ -124,6 +132,8 @@ class CustomTokenObtainPairView(TokenObtainPairView):
 
 UserView = UserViewClass
 ProductView = ProductViewClass
+ProductSalesView = ProductSalesViewClass
+CatalogView = CatalogViewClass
 CategoryView = CategoryViewClass
 BranchView = BranchViewClass
 CustomerView = CustomerViewClass
@@ -131,8 +141,14 @@ InvoiceView = InvoiceViewClass
 PaymentView = PaymentClassView
 FloorView = floor_view.FloorViewClass
 ItemActivityView = item_activity_view.ItemActivityClassView
+StockReceiveView = item_activity_view.StockReceiveViewClass
 DashboardView = DashboardViewClass
 ReportDashboardView = ReportDashboardViewClass
+SalesHeatmapView = SalesHeatmapViewClass
+BakePlanView = BakePlanViewClass
 StaffReportView = StaffReportViewClass
+StockAsOfView = StockAsOfViewClass
+StockAlertView = StockAlertViewClass
+ExportView = ExportViewClass
 KitchenView = KitchenViewClass
 
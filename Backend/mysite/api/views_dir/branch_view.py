@@ -1,12 +1,49 @@
 from rest_framework import status
 from rest_framework.views import APIView, Response
 
-from django.db.models import Sum, Value, DecimalField
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
 from django.db.models.functions import Coalesce
-from ..models import Branch, ProductCategory, User
+from django.utils import timezone
+
+from ..models import Branch, ProductCategory, SalesRollup, User
 from ..serializer_dir.branch_serializer import BranchSerializers
 
 
+def branch_list_queryset():
+    """
+    Branches with their revenue, staff count and manager in one query:
+    lifetime figures come from BranchStats, today's revenue from the
+    sales rollup.
+    """
+    today_revenue = (
+        SalesRollup.objects.filter(
+            branch=OuterRef("pk"), business_date=timezone.localdate()
+        )
+        .values("branch")
+        .annotate(total=Sum("total_amount"))
+        .values("total")
+    )
+    zero = Value(0, output_field=DecimalField())
+    return Branch.objects.select_related("stats__manager").annotate(
+        revenue=Coalesce(F("stats__revenue"), zero),
+        today_revenue=Coalesce(Subquery(today_revenue), zero),
+    )
+
+
+def branch_manager(branch, with_email=False):
+    stats = getattr(branch, "stats", None)
+    if stats is None or stats.manager is None:
+        return None
+    manager = {
+        "id": stats.manager.id,
+        "username": stats.manager.username,
+        "total_user": stats.staff_count,
+    }
+    if with_email:
+        manager["email"] = stats.manager.email
+    return manager
+
+
 class BranchViewClass(APIView):
     def get_user_role(self, user):
         return "SUPER_ADMIN" if user.is_superuser else getattr(user, "user_type", "")
@@ -23,13 +60,8 @@ class BranchViewClass(APIView):
             )
 
         if id:
-            # Single branch with prefetch
             try:
-                branch = Branch.objects.annotate(
-                    revenue=Coalesce(Sum("invoices__total_amount"), Value(0, output_field=DecimalField()))
-                ).prefetch_related(
-                    "branch_user"
-                ).get(id=id)
+                branch = branch_list_queryset().get(id=id)
 
             except Branch.DoesNotExist:
                 return Response(
@@ -42,30 +74,13 @@ class BranchViewClass(APIView):
                 {"success": False, "message": "Something went wrong while fetching branch."},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
-                
-            serializer = BranchSerializers(branch)
-            response_data = dict(serializer.data)
-
-            # Get manager from prefetched users
-            manager = branch.branch_user.filter(user_type="BRANCH_MANAGER").first()
-
-            if manager:
-                response_data["branch_manager"] = {
-                        "id": manager.id,
-                        "username": manager.username,
-                        "total_user": branch.branch_user.count(),
-                    }
-            else:
-                    response_data["branch_manager"] = None
 
+            response_data = dict(BranchSerializers(branch).data)
+            response_data["branch_manager"] = branch_manager(branch)
             return Response({"success": True, "data": response_data})
 
-            
         try:
-            # All branches with prefetch and revenue annotation
-            branches = Branch.objects.annotate(
-                revenue=Coalesce(Sum("invoices__total_amount"), Value(0, output_field=DecimalField()))
-            ).prefetch_related("branch_user").all()
+            branches = list(branch_list_queryset())
         except Exception:
             return Response(
                     {"success": False, "message": "Something went wrong while fetching branches."},
@@ -74,23 +89,8 @@ class BranchViewClass(APIView):
 
         response_data = []
         for branch in branches:
-            # Serialize each branch
-            branch_data = BranchSerializers(branch).data
-            branch_dict = dict(branch_data)
-
-            # Get manager from prefetched users
-            manager = branch.branch_user.filter(user_type="BRANCH_MANAGER").first()
-
-            if manager:
-                branch_dict["branch_manager"] = {
-                        "id": manager.id,
-                        "username": manager.username,
-                        "email": manager.email,
-                        "total_user": branch.branch_user.count(),
-                    }
-            else:
-                branch_dict["branch_manager"] = None
-
+            branch_dict = dict(BranchSerializers(branch).data)
+            branch_dict["branch_manager"] = branch_manager(branch, with_email=True)
             response_data.append(branch_dict)
 
         return Response(
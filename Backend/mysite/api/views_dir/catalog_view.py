@@ -0,0 +1,145 @@
+import gzip
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from ..caching import ALL_BRANCHES, catalog_version, get_or_compute
+from ..models import Floor, Kitchentype, Product, ProductCategory
+
+
+def build_catalog(branch_id=None):
+    """
+    The POS catalog of a branch (or of every branch) as JSON bytes, gzipped
+    bytes and a strong ETag over the JSON (the gzip body's ETag is that
+    tag with a -gz suffix, see gzip_etag). Stock and cost are left out:
+    stock moves with every sale and is read from products/.
+    """
+    products = Product.objects.filter(is_deleted=False)
+    categories = ProductCategory.objects.all()
+    kitchentypes = Kitchentype.objects.all()
+    floors = Floor.objects.all()
+    if branch_id:
+        products = products.filter(branch_id=branch_id)
+        categories = categories.filter(branch_id=branch_id)
+        kitchentypes = kitchentypes.filter(branch_id=branch_id)
+        floors = floors.filter(branch_id=branch_id)
+
+    catalog = {
+        "success": True,
+        "branch_id": branch_id,
+        "products": list(
+            products.order_by("name", "id").values(
+                "id",
+                "name",
+                "selling_price",
+                "category",
+                "branch_id",
+                "is_available",
+                category_name=F("category__name"),
+                kitchentype_id=F("category__kitchentype_id"),
+                kitchentype_name=F("category__kitchentype__name"),
+            )
+        ),
+        "categories": list(
+            categories.order_by("name", "id").values(
+                "id",
+                "name",
+                "branch",
+                "kitchentype",
+                kitchentype_name=F("kitchentype__name"),
+            )
+        ),
+        "kitchentypes": list(
+            kitchentypes.order_by("name", "id").values("id", "name", "branch")
+        ),
+        "floors": list(
+            floors.order_by("name", "id").values("id", "name", "branch", "table_count")
+        ),
+    }
+    body = json.dumps(catalog, cls=DjangoJSONEncoder, separators=(",", ":")).encode()
+    return {
+        "etag": f'"{hashlib.sha256(body).hexdigest()[:32]}"',
+        "body": body,
+        "gzip": gzip.compress(body, mtime=0),
+    }
+
+
+def cached_catalog(branch_id=None):
+    """build_catalog() from the cache, rebuilt once per catalog version."""
+    version = catalog_version(branch_id)
+    return get_or_compute(
+        f"catalog:{branch_id or ALL_BRANCHES}:v{version}",
+        lambda: build_catalog(branch_id),
+        timeout=settings.CATALOG_CACHE_TIMEOUT,
+        lock_timeout=settings.CATALOG_CACHE_LOCK_TIMEOUT,
+    )
+
+
+def gzip_etag(etag):
+    """The gzip body is a different representation, so it gets its own tag."""
+    return f'{etag[:-1]}-gz"'
+
+
+def etag_matches(etag, if_none_match):
+    """If-None-Match check that accepts the identity or the gzip tag."""
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags or gzip_etag(etag) in tags
+
+
+class CatalogViewClass(APIView):
+    """
+    Products, categories, kitchen types and floors of the user's branch
+    in one response (admins: ?branch_id=, or every branch).
+
+    The body is serialized and gzipped once per catalog version and kept
+    in the cache. Clients that send the ETag back in If-None-Match get a
+    304 while the catalog is unchanged, which costs two cache reads and
+    no catalog queries.
+    """
+
+    def get_user_role(self, user):
+        return "SUPER_ADMIN" if user.is_superuser else getattr(user, "user_type", "")
+
+    def get(self, request):
+        role = self.get_user_role(request.user)
+
+        if role in ["SUPER_ADMIN", "ADMIN"]:
+            branch_id = request.query_params.get("branch_id")
+            try:
+                branch_id = int(branch_id) if branch_id else None
+            except ValueError:
+                return Response(
+                    {"success": False, "message": "branch_id must be a number"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+        else:
+            branch_id = request.user.branch_id
+            if not branch_id:
+                return Response(
+                    {"success": False, "message": "No branch associated with this user"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+        blob = cached_catalog(branch_id)
+        gzipped = "gzip" in request.headers.get("Accept-Encoding", "")
+        if etag_matches(blob["etag"], request.headers.get("If-None-Match", "")):
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        elif gzipped:
+            response = HttpResponse(blob["gzip"], content_type="application/json")
+            response["Content-Encoding"] = "gzip"
+        else:
+            response = HttpResponse(blob["body"], content_type="application/json")
+
+        response["ETag"] = gzip_etag(blob["etag"]) if gzipped else blob["etag"]
+        # Stored per user, but always revalidated
+        response["Cache-Control"] = "private, no-cache"
+        patch_vary_headers(response, ["Accept-Encoding"])
+        return response
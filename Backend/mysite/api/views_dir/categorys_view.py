@@ -53,6 +53,7 @@ class CategoryViewClass(APIView):
             else:
                 categories = ProductCategory.objects.filter(branch=my_branch)
 
+            categories = categories.select_related("branch", "kitchentype")
             serializer = ProductCategorySerializer(categories, many=True)
             return Response(
                 {"success": True, "data": serializer.data},
@@ -81,8 +81,8 @@ class CustomerViewClass(APIView):
                     | customers.filter(email__icontains=search)
                 )
 
-            # Order by date (newest first)
-            customers = customers.order_by("-created_at")
+            # Order by date (newest first); invoices are serialized per customer
+            customers = customers.order_by("-created_at").prefetch_related("invoices")
 
             serializer = CustomerSerializer(customers, many=True)
 
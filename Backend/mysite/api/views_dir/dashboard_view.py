@@ -1,22 +1,22 @@
+from collections import defaultdict
 from datetime import date, datetime, time, timedelta
-from decimal import Decimal
-
-from dateutil.relativedelta import relativedelta
-from django.db.models import Count, DecimalField, ExpressionWrapper, F, Max, Q, Sum, Value
-from django.db.models.functions import (
-    Coalesce,
-    ExtractHour,
-    ExtractWeek,
-    ExtractWeekDay,
-    ExtractYear,
-    TruncHour,
-)
+
+from django.db.models import DecimalField, Q, Sum, Value
+from django.db.models.functions import Coalesce, ExtractIsoWeekDay
 from django.utils import timezone
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from ..models import Branch, Invoice, InvoiceItem, User, Payment
+from ..caching import cached_dashboard
+from ..models import (
+    Branch,
+    Invoice,
+    PaymentRollup,
+    ProductSalesRollup,
+    SalesRollup,
+    User,
+)
 from ..serializer_dir.invoice_serializer import InvoiceResponseSerializer
 
 
@@ -70,21 +70,24 @@ def get_date_range(request):
     return start_of_week, today, "weekly"
 
 
-class DashboardViewClass(APIView):
-    todaydate = date.today()
-    yesterdaydate = todaydate - timedelta(days=1)
+def local_datetime_range(start_date, end_date):
+    """
+    Half-open [start, end) aware datetimes covering the local dates
+    start_date..end_date. Filtering created_at on these keeps the
+    (branch, created_at) index usable, unlike created_at__date lookups.
+    """
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.combine(start_date, time.min), tz)
+    end = timezone.make_aware(
+        datetime.combine(end_date + timedelta(days=1), time.min), tz
+    )
+    return start, end
+
 
+class DashboardViewClass(APIView):
     def get_user_role(self, user):
         return "SUPER_ADMIN" if user.is_superuser else getattr(user, "user_type", "")
 
-    def date_filter(self, branch, start_date, end_date):
-        start_datetime = datetime.combine(start_date, time.min)
-        end_datetime = datetime.combine(end_date + timedelta(days=1), time.min)
-
-        return Invoice.objects.filter(
-            branch=branch, created_at__gte=start_datetime, created_at__lt=end_datetime
-        )
-
     def get(self, request, branch_id=None):
         role = self.get_user_role(request.user)
         # For global overview, we want no branch filter even if the user is assigned one,
@@ -106,186 +109,201 @@ class DashboardViewClass(APIView):
         elif role in ["BRANCH_MANAGER"] and my_branch:
             target_branch = my_branch
 
-        # Get base report data from the generalized function
-        report_data = report_dashboard(target_branch, request)
-        start_date = report_data["start_date"]
-        end_date = report_data["end_date"]
-
-        # Base filter for extra aggregations
-        base_filter = {"created_at__date__gte": start_date, "created_at__date__lte": end_date}
-        if target_branch:
-            base_filter["branch"] = target_branch
-
-        # Common extra dashboard data
-        recent_orders_objs = (
-            Invoice.objects.filter(**base_filter)
-            .select_related("branch", "created_by")
-            .prefetch_related("bills", "bills__product", "payments")
-            .order_by("-created_at")[:5]
+        start_date, end_date, timeframe = get_date_range(request)
+        payload = cached_dashboard(
+            "dashboard", target_branch, start_date, end_date, timeframe,
+            lambda: dashboard_payload(target_branch, request),
         )
-        recent_orders = InvoiceResponseSerializer(recent_orders_objs, many=True).data
-
-        user_count = (
-            User.objects.filter(branch=target_branch).count() 
-            if target_branch else User.objects.all().count() - 1
+        return Response(payload, status=status.HTTP_200_OK)
+
+
+def dashboard_payload(target_branch=None, request=None):
+    """
+    Full admin dashboard: report_dashboard plus recent orders, counts,
+    top branches and peak hours. Shared by DashboardViewClass and the SSE stream.
+    """
+    report_data = report_dashboard(target_branch, request)
+    start_date = report_data["start_date"]
+    end_date = report_data["end_date"]
+    start, end = local_datetime_range(start_date, end_date)
+
+    invoices = Invoice.objects.filter(created_at__gte=start, created_at__lt=end)
+    rollups = SalesRollup.objects.filter(
+        business_date__gte=start_date, business_date__lte=end_date
+    )
+    if target_branch:
+        invoices = invoices.filter(branch=target_branch)
+        rollups = rollups.filter(branch=target_branch)
+
+    # Common extra dashboard data
+    recent_orders_objs = (
+        invoices.select_related(
+            "customer",
+            "branch",
+            "floor",
+            "created_by",
+            "received_by_waiter",
+            "received_by_counter",
         )
+        .prefetch_related("bills__product", "payments")
+        .order_by("-created_at")[:5]
+    )
+    recent_orders = InvoiceResponseSerializer(recent_orders_objs, many=True).data
 
-        response_data = {
-            **report_data,
-            "recent_orders": recent_orders,
-            "total_sum": report_data["total_month_sales"],
-            "total_sales": report_data["total_month_sales"],
-            "total_count_order": report_data["total_month_orders"],
-            "total_orders": report_data["total_month_orders"],
-            "average_order_value": report_data["avg_order"],
-            "avg_orders": report_data["avg_order"],
-            "total_sales_per_category": report_data["sales_by_category"],
-            "sales_percent": report_data["growth_percent"],
-            "order_percent": report_data["growth_percent"],
-            "avg_order_percent": report_data["growth_percent"],
-            "total_user": user_count,
-            "total_user_count": user_count,
-            "total_branch": Branch.objects.all().count(),
-            "total_count_branch": Branch.objects.all().count(),
-        }
-
-        if not target_branch:
-            # Add global-only fields
-            response_data.update({
-                "top_perfomance_branch": list(Branch.objects.annotate(
-                    total_sales_per_branch=Coalesce(
-                        Sum("invoices__total_amount", filter=Q(invoices__created_at__date__gte=start_date, invoices__created_at__date__lte=end_date)),
-                        Value(0.0, output_field=DecimalField())
-                    )
-                ).values("name", "total_sales_per_branch").order_by("-total_sales_per_branch")[:5]),
-                "top_selling_items": report_data["top_selling_items_count"],
-            })
-        else:
-            # Add branch-specific fields
-            response_data.update({
-                "today_sales": report_data["total_month_sales"],
-                "top_selling_items": report_data["top_selling_items_count"],
-            })
-            
-            # Peak hours for single day
-            if (end_date - start_date).days == 0:
-                hourly_orders = (
-                    Invoice.objects.filter(**base_filter)
-                    .annotate(hour=TruncHour("created_at"))
-                    .values("hour")
-                    .annotate(total_orders=Count("id"))
+    user_count = (
+        User.objects.filter(branch=target_branch).count()
+        if target_branch else User.objects.all().count() - 1
+    )
+    branch_count = Branch.objects.all().count()
+
+    response_data = {
+        **report_data,
+        "recent_orders": recent_orders,
+        "total_sum": report_data["total_month_sales"],
+        "total_sales": report_data["total_month_sales"],
+        "total_count_order": report_data["total_month_orders"],
+        "total_orders": report_data["total_month_orders"],
+        "average_order_value": report_data["avg_order"],
+        "avg_orders": report_data["avg_order"],
+        "total_sales_per_category": report_data["sales_by_category"],
+        "sales_percent": report_data["growth_percent"],
+        "order_percent": report_data["growth_percent"],
+        "avg_order_percent": report_data["growth_percent"],
+        "total_user": user_count,
+        "total_user_count": user_count,
+        "total_branch": branch_count,
+        "total_count_branch": branch_count,
+    }
+
+    if not target_branch:
+        # Add global-only fields
+        response_data.update({
+            "top_perfomance_branch": list(Branch.objects.annotate(
+                total_sales_per_branch=Coalesce(
+                    Sum(
+                        "sales_rollups__total_amount",
+                        filter=Q(
+                            sales_rollups__business_date__gte=start_date,
+                            sales_rollups__business_date__lte=end_date,
+                        ),
+                    ),
+                    Value(0.0, output_field=DecimalField())
                 )
-                max_orders = hourly_orders.aggregate(max_orders=Max("total_orders"))["max_orders"]
-                if max_orders is not None:
-                    peak_hours = hourly_orders.filter(total_orders=max_orders)
-                    response_data["peak_hours"] = [h["hour"].strftime("%I:%M %p") for h in peak_hours]
+            ).values("name", "total_sales_per_branch").order_by("-total_sales_per_branch")[:5]),
+            "top_selling_items": report_data["top_selling_items_count"],
+        })
+    else:
+        # Add branch-specific fields
+        response_data.update({
+            "today_sales": report_data["total_month_sales"],
+            "top_selling_items": report_data["top_selling_items_count"],
+        })
+
+        # Peak hours for single day
+        if (end_date - start_date).days == 0:
+            hourly_orders = list(
+                rollups.values("hour")
+                .annotate(total_orders=Sum("invoice_count"))
+                .filter(total_orders__gt=0)
+            )
+            if hourly_orders:
+                max_orders = max(h["total_orders"] for h in hourly_orders)
+                response_data["peak_hours"] = [
+                    time(h["hour"]).strftime("%I:%M %p")
+                    for h in sorted(hourly_orders, key=lambda h: h["hour"])
+                    if h["total_orders"] == max_orders
+                ]
 
-        return Response(response_data, status=status.HTTP_200_OK)
+    return response_data
 
 
 def report_dashboard(my_branch=None, request=None):
+    """
+    Sales report for a branch (or all branches) over the requested timeframe.
+    Reads the rollup tables, so a yearly range costs about the same as a day.
+    """
     start_date, end_date, timeframe = get_date_range(request)
 
-    base_filter = {
-        "created_at__date__gte": start_date,
-        "created_at__date__lte": end_date,
-    }
-    if my_branch:
-        base_filter["branch"] = my_branch
-
-    current_sales = (
-        Invoice.objects.filter(**base_filter).aggregate(total_sales_amount=Sum("total_amount"))["total_sales_amount"]
-        or 0
-    )
-
-    # total orders
-    current_orders_qs = Invoice.objects.filter(**base_filter)
-    current_orders_count = current_orders_qs.count()
-
-    # average order
-    avg_order = current_sales / current_orders_count if current_orders_count > 0 else 0
-
     # growth percent comparison (compare with previous period of same length)
     period_length = (end_date - start_date).days + 1
     prev_end_date = start_date - timedelta(days=1)
     prev_start_date = prev_end_date - timedelta(days=period_length - 1)
 
-    prev_base_filter = {
-        "created_at__date__gte": prev_start_date,
-        "created_at__date__lte": prev_end_date,
-    }
-    if my_branch:
-        prev_base_filter["branch"] = my_branch
-
-    prev_period_sales = (
-        Invoice.objects.filter(**prev_base_filter).aggregate(total_sales=Sum("total_amount"))["total_sales"]
-        or 0
+    def in_period(model, start, end):
+        rows = model.objects.filter(business_date__gte=start, business_date__lte=end)
+        if my_branch:
+            rows = rows.filter(branch=my_branch)
+        return rows
+
+    sales = in_period(SalesRollup, start_date, end_date)
+    products = in_period(ProductSalesRollup, start_date, end_date)
+    payments = in_period(PaymentRollup, start_date, end_date)
+
+    # Current and previous period in one pass over the rollup index
+    current = Q(business_date__gte=start_date)
+    totals = in_period(SalesRollup, prev_start_date, end_date).aggregate(
+        total_sales_amount=Sum("total_amount", filter=current),
+        total_orders=Sum("invoice_count", filter=current),
+        prev_sales=Sum("total_amount", filter=~current),
     )
+    current_sales = totals["total_sales_amount"] or 0
+    current_orders_count = totals["total_orders"] or 0
+    prev_period_sales = totals["prev_sales"] or 0
+
+    # average order
+    avg_order = current_sales / current_orders_count if current_orders_count > 0 else 0
 
     if prev_period_sales == 0:
         growth_percent = current_sales - prev_period_sales
     else:
         growth_percent = ((current_sales - prev_period_sales) / prev_period_sales) * 100
 
-    # Trend Data
-    trend_data = (
-        Invoice.objects.filter(**base_filter)
-    )
-
     # Weekly Sales (Specific format for frontend bars)
-    today = date.today() # Ensure 'today' is defined for this scope
+    today = timezone.localdate()
     start_of_current_week = today - timedelta(days=today.weekday())
-    weekly_qs = trend_data.filter(created_at__date__gte=start_of_current_week).annotate(label=ExtractWeekDay("created_at")).values("label").annotate(sales=Sum("total_amount"))
-    day_names_full = {1: "sunday", 2: "monday", 3: "tuesday", 4: "wednesday", 5: "thursday", 6: "friday", 7: "saturday"}
-    weekly_sales_dict = {name: 0.0 for name in day_names_full.values()}
+    weekly_qs = (
+        sales.filter(business_date__gte=start_of_current_week)
+        .values("business_date")
+        .annotate(sales=Sum("total_amount"))
+    )
+    day_names_full = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+    weekly_sales_dict = {name: 0.0 for name in day_names_full[-1:] + day_names_full[:-1]}
     for item in weekly_qs:
-        weekly_sales_dict[day_names_full[item["label"]]] = float(item["sales"])
+        weekly_sales_dict[day_names_full[item["business_date"].weekday()]] += float(item["sales"])
 
     if timeframe == "daily" or period_length <= 1:
         # Show hourly trend for single day or daily view
-        trend_qs = trend_data.annotate(label=ExtractHour("created_at")).values("label").annotate(sales=Sum("total_amount")).order_by("label")
+        hourly = dict(sales.values_list("hour").annotate(sales=Sum("total_amount")))
         trend_chart = []
         for h in range(8, 21):
             lbl = f"{h if h <= 12 else h - 12} {'AM' if h < 12 else 'PM'}"
-            val = next((item["sales"] for item in trend_qs if item["label"] == h), 0)
-            trend_chart.append({"label": lbl, "sales": float(val)})
+            trend_chart.append({"label": lbl, "sales": float(hourly.get(h, 0))})
     elif timeframe == "weekly" or period_length <= 7:
         # Show daily trend for the week
-        trend_qs = trend_data.annotate(label=ExtractWeekDay("created_at")).values("label").annotate(sales=Sum("total_amount")).order_by("label")
-        day_names = {1: "Sun", 2: "Mon", 3: "Tue", 4: "Wed", 5: "Thu", 6: "Fri", 7: "Sat"}
-        trend_chart = []
-        for d_idx in [2, 3, 4, 5, 6, 7, 1]:
-            val = next((item["sales"] for item in trend_qs if item["label"] == d_idx), 0)
-            trend_chart.append({"label": day_names[d_idx], "sales": float(val)})
+        by_weekday = defaultdict(float)
+        for business_date, total in sales.values_list("business_date").annotate(sales=Sum("total_amount")):
+            by_weekday[business_date.weekday()] += float(total)
+        day_names = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+        trend_chart = [{"label": day_names[d], "sales": by_weekday[d]} for d in range(7)]
     else:
         # Show daily trend for the month/range
-        trend_qs = trend_data.annotate(label=F("created_at__date")).values("label").annotate(sales=Sum("total_amount")).order_by("label")
-        trend_chart = [{"label": item["label"].strftime("%d %b"), "sales": float(item["sales"])} for item in trend_qs]
-
-    # Aggregate distribution data
-    def get_distribution(model, period_filter, values_field, annotate_field="total_amount"):
-        return list(model.objects.filter(**period_filter).values(values_field).annotate(**{annotate_field: Coalesce(Sum(
-            ExpressionWrapper(
-                F("quantity") * F("unit_price") - F("discount_amount"),
-                output_field=DecimalField(max_digits=12, decimal_places=2),
-            ) if model == InvoiceItem else F("amount"),
-            output_field=DecimalField()
-        ), Value(0.0, output_field=DecimalField()))}).order_by(f"-{annotate_field}"))
-
-    period_filter_ii = {"invoice__created_at__date__gte": start_date, "invoice__created_at__date__lte": end_date}
-    if my_branch:
-        period_filter_ii["invoice__branch"] = my_branch
-    
-    period_filter_p = {"invoice__created_at__date__gte": start_date, "invoice__created_at__date__lte": end_date}
-    if my_branch:
-        period_filter_p["invoice__branch"] = my_branch
+        trend_qs = sales.values("business_date").annotate(sales=Sum("total_amount")).order_by("business_date")
+        trend_chart = [{"label": item["business_date"].strftime("%d %b"), "sales": float(item["sales"])} for item in trend_qs]
+
+    def get_distribution(rows, values_field, label, sum_field, annotate_field="total_amount"):
+        return [
+            {label: row[values_field], annotate_field: row[annotate_field]}
+            for row in rows.values(values_field)
+            .annotate(**{annotate_field: Coalesce(Sum(sum_field), Value(0.0, output_field=DecimalField()))})
+            .order_by(f"-{annotate_field}")
+        ]
 
-    sales_by_category = get_distribution(InvoiceItem, period_filter_ii, "product__category__name", "category_total_sales")
-    sales_by_kitchen = get_distribution(InvoiceItem, period_filter_ii, "product__category__kitchentype__name")
-    sales_by_payment = get_distribution(Payment, period_filter_p, "payment_method")
-    sales_by_status = list(Invoice.objects.filter(**base_filter).values("payment_status").annotate(total_amount=Coalesce(Sum("total_amount"), Value(0.0, output_field=DecimalField()))).order_by("-total_amount"))
+    sales_by_category = get_distribution(products, "category__name", "product__category__name", "amount", "category_total_sales")
+    sales_by_kitchen = get_distribution(products, "kitchentype__name", "product__category__kitchentype__name", "amount")
+    sales_by_payment = get_distribution(payments, "payment_method", "payment_method", "amount")
+    sales_by_status = get_distribution(sales, "payment_status", "payment_status", "total_amount")
 
-    top_selling = list(InvoiceItem.objects.filter(**period_filter_ii).values("product__name").annotate(total_orders=Sum("quantity")).annotate(total_sales=Sum(ExpressionWrapper(F("quantity") * F("unit_price") - F("discount_amount"), output_field=DecimalField(max_digits=12, decimal_places=2)))).order_by("-total_orders")[:5])
+    top_selling = list(products.values("product__name").annotate(total_orders=Sum("quantity"), total_sales=Sum("amount")).order_by("-total_orders")[:5])
 
     return {
         "success": True,
@@ -331,5 +349,115 @@ class ReportDashboardViewClass(APIView):
                 )
             my_branch = branch_id
 
-        data = report_dashboard(my_branch, request)
+        start_date, end_date, timeframe = get_date_range(request)
+        data = cached_dashboard(
+            "report", my_branch, start_date, end_date, timeframe,
+            lambda: report_dashboard(my_branch, request),
+        )
+        return Response({"success": True, **data}, status=status.HTTP_200_OK)
+
+
+HEATMAP_DAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+HEATMAP_MAX_WEEKS = 104
+
+
+def sales_heatmap(my_branch, start_date, end_date):
+    """
+    Orders and revenue by weekday (Mon..Sun) x hour (0..23) over the range,
+    from one grouped query on the hourly sales rollup. avg_orders divides by
+    how many times each weekday occurs in the range.
+    """
+    rows = SalesRollup.objects.filter(
+        business_date__gte=start_date, business_date__lte=end_date
+    )
+    if my_branch:
+        rows = rows.filter(branch=my_branch)
+    rows = (
+        rows.annotate(weekday=ExtractIsoWeekDay("business_date"))
+        .values_list("weekday", "hour")
+        .annotate(orders=Sum("invoice_count"), revenue=Sum("total_amount"))
+        .order_by()
+    )
+
+    orders = [[0] * 24 for _ in HEATMAP_DAYS]
+    revenue = [[0.0] * 24 for _ in HEATMAP_DAYS]
+    for weekday, hour, order_count, total in rows:
+        orders[weekday - 1][hour] = order_count or 0
+        revenue[weekday - 1][hour] = float(total or 0)
+
+    days = (end_date - start_date).days + 1
+    occurrences = [
+        days // 7 + ((day - start_date.weekday()) % 7 < days % 7)
+        for day in range(7)
+    ]
+    avg_orders = [
+        [round(count / occurrences[day], 2) if occurrences[day] else 0 for count in row]
+        for day, row in enumerate(orders)
+    ]
+
+    return {
+        "start_date": start_date,
+        "end_date": end_date,
+        "days": HEATMAP_DAYS,
+        "hours": list(range(24)),
+        "weekday_occurrences": occurrences,
+        "orders": orders,
+        "revenue": revenue,
+        "avg_orders": avg_orders,
+    }
+
+
+class SalesHeatmapViewClass(APIView):
+    """
+    Weekday x hour heatmap of orders and revenue, for staffing decisions.
+    Takes the usual timeframe/start_date/end_date params, or ?weeks=N for
+    the last N weeks up to today. Admins may leave out the branch to see
+    every branch together.
+    """
+
+    def get_user_role(self, user):
+        return "SUPER_ADMIN" if user.is_superuser else getattr(user, "user_type", "")
+
+    def get(self, request, branch_id=None):
+        role = self.get_user_role(request.user)
+        my_branch = getattr(request.user, "branch", None)
+
+        if role not in ["SUPER_ADMIN", "ADMIN", "BRANCH_MANAGER"]:
+            return Response(
+                {"success": False, "message": "Insufficient permissions"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        if role in ["SUPER_ADMIN", "ADMIN"]:
+            my_branch = branch_id
+        elif not my_branch:
+            return Response(
+                {"success": False, "message": "No branch associated with this user"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        weeks = request.query_params.get("weeks")
+        if weeks:
+            try:
+                weeks = int(weeks)
+            except ValueError:
+                weeks = 0
+            if not 1 <= weeks <= HEATMAP_MAX_WEEKS:
+                return Response(
+                    {
+                        "success": False,
+                        "message": f"weeks must be between 1 and {HEATMAP_MAX_WEEKS}",
+                    },
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            end_date = timezone.localdate()
+            start_date = end_date - timedelta(weeks=weeks) + timedelta(days=1)
+            timeframe = f"{weeks}weeks"
+        else:
+            start_date, end_date, timeframe = get_date_range(request)
+
+        data = cached_dashboard(
+            "heatmap", my_branch, start_date, end_date, timeframe,
+            lambda: sales_heatmap(my_branch, start_date, end_date),
+        )
         return Response({"success": True, **data}, status=status.HTTP_200_OK)
@@ -0,0 +1,228 @@
+import csv
+import json
+import zlib
+from datetime import datetime
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from ..models import Invoice, InvoiceItem, Payment
+from .dashboard_view import get_date_range, local_datetime_range
+
+# Rows fetched per round trip; PostgreSQL streams them from a server-side cursor
+EXPORT_CHUNK_SIZE = 2000
+# Rows are written out in blocks of about this many bytes
+EXPORT_FLUSH_BYTES = 64 * 1024
+
+# dataset -> (model, lookup path to the invoice, exported columns)
+EXPORTS = {
+    "invoices": (
+        Invoice,
+        "",
+        [
+            "id",
+            "invoice_number",
+            "created_at",
+            "branch__name",
+            "customer__name",
+            "customer__phone",
+            "table_no",
+            "invoice_type",
+            "invoice_status",
+            "payment_status",
+            "subtotal",
+            "tax_amount",
+            "discount",
+            "total_amount",
+            "paid_amount",
+            "created_by__username",
+        ],
+    ),
+    "items": (
+        InvoiceItem,
+        "invoice__",
+        [
+            "id",
+            "invoice__invoice_number",
+            "invoice__created_at",
+            "product__name",
+            "product__category__name",
+            "quantity",
+            "unit_price",
+            "discount_amount",
+        ],
+    ),
+    # Payments follow their invoice's date, like the sales reports
+    "payments": (
+        Payment,
+        "invoice__",
+        [
+            "id",
+            "transaction_id",
+            "invoice__invoice_number",
+            "invoice__created_at",
+            "created_at",
+            "payment_method",
+            "amount",
+            "received_by__username",
+        ],
+    ),
+}
+
+FILE_TYPES = {"csv": "text/csv", "jsonl": "application/x-ndjson"}
+
+
+class Echo:
+    """File-like object for csv.writer that hands each line back."""
+
+    def write(self, value):
+        return value
+
+
+def export_value(value):
+    return timezone.localtime(value) if isinstance(value, datetime) else value
+
+
+def encode_rows(rows, columns, file_type):
+    """Yield the export as text, one line per row (after a CSV header)."""
+    if file_type == "csv":
+        writer = csv.writer(Echo())
+        yield writer.writerow(columns)
+        for row in rows:
+            yield writer.writerow([export_value(row[column]) for column in columns])
+    else:
+        for row in rows:
+            data = {column: export_value(row[column]) for column in columns}
+            yield json.dumps(data, cls=DjangoJSONEncoder) + "\n"
+
+
+def buffered(lines, compress=False):
+    """
+    Join lines into blocks of about EXPORT_FLUSH_BYTES, gzipping them on the
+    fly when `compress` is set. Only one block is held in memory at a time.
+    """
+    compressor = zlib.compressobj(wbits=31) if compress else None
+    block, size = [], 0
+    for line in lines:
+        data = line.encode()
+        block.append(data)
+        size += len(data)
+        if size >= EXPORT_FLUSH_BYTES:
+            data = b"".join(block)
+            block, size = [], 0
+            if compressor:
+                data = compressor.compress(data)
+            if data:
+                yield data
+    data = b"".join(block)
+    if compressor:
+        data = compressor.compress(data) + compressor.flush()
+    if data:
+        yield data
+
+
+async def async_blocks(blocks):
+    """
+    Hand the blocks of a sync iterator to an ASGI server one at a time.
+    Given a sync iterator, Django's ASGI handler would list() it first.
+    Each block is pulled in the thread-sensitive executor, where the
+    request's database connection (and its cursor) lives.
+    """
+    next_block = sync_to_async(next)
+    try:
+        while (block := await next_block(blocks, None)) is not None:
+            yield block
+    finally:
+        await sync_to_async(blocks.close)()
+
+
+class ExportViewClass(APIView):
+    """
+    Streams invoices, invoice items or payments for a branch and date range
+    as CSV or JSON Lines, optionally gzipped:
+
+        GET export/<dataset>/?file_type=csv|jsonl&gzip=1
+            &start_date=YYYY-MM-DD&end_date=YYYY-MM-DD&branch_id=<id>
+
+    Rows are read with a values() projection through .iterator(), so memory
+    stays flat however long the range is, under WSGI and ASGI alike.
+    """
+
+    def get_user_role(self, user):
+        return "SUPER_ADMIN" if user.is_superuser else getattr(user, "user_type", "")
+
+    def get(self, request, dataset=None):
+        role = self.get_user_role(request.user)
+
+        if role not in ["SUPER_ADMIN", "ADMIN", "BRANCH_MANAGER"]:
+            return Response(
+                {"success": False, "message": "Insufficient permissions"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        if dataset not in EXPORTS:
+            return Response(
+                {
+                    "success": False,
+                    "message": f"dataset must be one of: {', '.join(EXPORTS)}",
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        file_type = request.query_params.get("file_type", "csv")
+        if file_type not in FILE_TYPES:
+            return Response(
+                {
+                    "success": False,
+                    "message": f"file_type must be one of: {', '.join(FILE_TYPES)}",
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        if role in ["SUPER_ADMIN", "ADMIN"]:
+            branch_id = request.query_params.get("branch_id")
+        else:
+            branch_id = request.user.branch_id
+            if not branch_id:
+                return Response(
+                    {"success": False, "message": "No branch associated with this user"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+        start_date, end_date, timeframe = get_date_range(request)
+        start, end = local_datetime_range(start_date, end_date)
+
+        model, invoice_path, columns = EXPORTS[dataset]
+        rows = model.objects.filter(
+            **{
+                f"{invoice_path}created_at__gte": start,
+                f"{invoice_path}created_at__lt": end,
+            }
+        )
+        if branch_id:
+            rows = rows.filter(**{f"{invoice_path}branch_id": branch_id})
+        rows = (
+            rows.order_by(f"{invoice_path}created_at", "id")
+            .values(*columns)
+            .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        )
+
+        compress = request.query_params.get("gzip") in ["1", "true"]
+        filename = f"{dataset}_{start_date}_{end_date}.{file_type}"
+        content_type = FILE_TYPES[file_type]
+        if compress:
+            filename += ".gz"
+            content_type = "application/gzip"
+
+        blocks = buffered(encode_rows(rows, columns, file_type), compress)
+        if isinstance(request._request, ASGIRequest):
+            blocks = async_blocks(blocks)
+        response = StreamingHttpResponse(blocks, content_type=content_type)
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
@@ -58,6 +58,7 @@ class FloorViewClass(APIView):
                 # SUPER_ADMIN and ADMIN can see all floors
                 floors = Floor.objects.all()
 
+            floors = floors.select_related("branch")
             serializer = FloorSerializer(floors, many=True)
             return Response({"success": True, "data": serializer.data})
 
@@ -0,0 +1,90 @@
+from datetime import date, timedelta
+
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from ..models import DemandForecast
+
+
+class BakePlanViewClass(APIView):
+    """
+    Suggested bake quantities for a branch on a date (tomorrow by default),
+    from the forecasts written nightly by the forecast_demand command.
+    """
+
+    def get_user_role(self, user):
+        return "SUPER_ADMIN" if user.is_superuser else getattr(user, "user_type", "")
+
+    def get(self, request, branch_id=None):
+        role = self.get_user_role(request.user)
+        my_branch = getattr(request.user, "branch", None)
+
+        if role not in ["SUPER_ADMIN", "ADMIN", "BRANCH_MANAGER", "KITCHEN"]:
+            return Response(
+                {"success": False, "message": "Insufficient permissions"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        if role in ["SUPER_ADMIN", "ADMIN"]:
+            if not branch_id:
+                return Response(
+                    {
+                        "success": False,
+                        "message": "branch_id is required for admin/superadmin",
+                    },
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            my_branch = branch_id
+
+        if not my_branch:
+            return Response(
+                {"success": False, "message": "No branch associated with this user"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        plan_date = request.query_params.get("date")
+        try:
+            plan_date = (
+                date.fromisoformat(plan_date)
+                if plan_date
+                else timezone.localdate() + timedelta(days=1)
+            )
+        except ValueError:
+            return Response(
+                {"success": False, "message": "date must be YYYY-MM-DD"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        forecasts = (
+            DemandForecast.objects.filter(branch=my_branch, forecast_date=plan_date)
+            .select_related("product__category")
+            .order_by("-suggested_quantity", "product__name")
+        )
+
+        data = [
+            {
+                "product_id": forecast.product_id,
+                "product_name": forecast.product.name,
+                "category": forecast.product.category.name,
+                "expected_quantity": float(forecast.expected_quantity),
+                "suggested_quantity": forecast.suggested_quantity,
+                "in_stock": forecast.product.product_quantity,
+                "to_bake": max(
+                    forecast.suggested_quantity - forecast.product.product_quantity, 0
+                ),
+            }
+            for forecast in forecasts
+        ]
+
+        return Response(
+            {
+                "success": True,
+                "date": plan_date,
+                "generated_at": forecasts[0].generated_at if data else None,
+                "count": len(data),
+                "data": data,
+            },
+            status=status.HTTP_200_OK,
+        )
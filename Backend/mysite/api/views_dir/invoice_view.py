@@ -1,17 +1,62 @@
-from datetime import date
+import base64
+from datetime import date, datetime
 
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
 from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from ..consumers import invoice_groups
 from ..models import Invoice
+from ..outbox import enqueue_broadcast
+from ..stock import InsufficientStock
 from ..serializer_dir.invoice_serializer import (
     InvoiceResponseSerializer,
     InvoiceSerializer,
 )
+from .dashboard_view import local_datetime_range
+
+INVOICE_PAGE_SIZE = 50
+INVOICE_PAGE_MAX = 200
+
+
+def paginate_newest_first(rows, params):
+    """
+    Keyset pagination on (created_at, id), newest first.
+    Returns the page and an opaque cursor for the next one (or None).
+    """
+    try:
+        limit = min(int(params.get("limit", INVOICE_PAGE_SIZE)), INVOICE_PAGE_MAX)
+    except ValueError:
+        raise ValueError("limit must be a number")
+    if limit < 1:
+        raise ValueError("limit must be positive")
+
+    cursor = params.get("cursor")
+    if cursor:
+        try:
+            created_at, last_id = (
+                base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+            )
+            created_at = datetime.fromisoformat(created_at)
+            last_id = int(last_id)
+        except (ValueError, UnicodeDecodeError):
+            raise ValueError("Invalid cursor")
+        rows = rows.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=last_id)
+        )
+
+    page = list(rows.order_by("-created_at", "-id")[: limit + 1])
+    next_cursor = None
+    if len(page) > limit:
+        page = page[:limit]
+        last = page[-1]
+        next_cursor = base64.urlsafe_b64encode(
+            f"{last.created_at.isoformat()}|{last.id}".encode()
+        ).decode()
+    return page, next_cursor
 
 
 class InvoiceViewClass(APIView):
@@ -28,18 +73,19 @@ class InvoiceViewClass(APIView):
     def get(self, request, id=None):
         role = self.get_user_role(request.user)
         my_branch = request.user.branch
-        today_date = date.today()
-        from django.utils import timezone
-
-        current_time = timezone.now()
-        print(f"DEBUG: Current Time: {current_time}, Today Date Filter: {today_date}")
+        today_start, today_end = local_datetime_range(
+            timezone.localdate(), timezone.localdate()
+        )
 
         if id:
             try:
                 # Apply branch filter for non-admin users
                 if role not in ["ADMIN", "SUPER_ADMIN"] and my_branch:
                     invoice = Invoice.objects.get(
-                        branch=my_branch, created_at__date=today_date, id=id
+                        branch=my_branch,
+                        created_at__gte=today_start,
+                        created_at__lt=today_end,
+                        id=id,
                     )
                     serializer = InvoiceResponseSerializer(invoice)
                     return Response({"success": True, "data": serializer.data})
@@ -57,21 +103,88 @@ class InvoiceViewClass(APIView):
             # Base filtering
             if role in ["COUNTER", "WAITER", "KITCHEN"]:
                 invoices = Invoice.objects.filter(
-                    branch=my_branch, created_at__date=today_date
+                    branch=my_branch,
+                    created_at__gte=today_start,
+                    created_at__lt=today_end,
                 ).exclude(payment_status__in=["CANCELLED"])
             elif role == "BRANCH_MANAGER":
                 invoices = Invoice.objects.filter(branch=my_branch)
             else:
                 invoices = Invoice.objects.all()
+                branch_id = request.query_params.get("branch_id")
+                if branch_id:
+                    invoices = invoices.filter(branch_id=branch_id)
+
+            try:
+                invoices = self.apply_list_filters(invoices, request.query_params)
+            except ValueError as e:
+                return Response(
+                    {"success": False, "error": str(e)},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+            invoices = invoices.select_related(
+                "customer",
+                "branch",
+                "floor",
+                "created_by",
+                "received_by_waiter",
+                "received_by_counter",
+            ).prefetch_related("bills__product", "payments")
+
+            # Staff lists are bounded to today; full history is paged
+            if role in ["COUNTER", "WAITER", "KITCHEN"]:
+                invoices = invoices.order_by("-created_at", "-id")
+                data = InvoiceResponseSerializer(invoices, many=True).data
+                return Response({"success": True, "count": len(data), "data": data})
+
+            try:
+                page, next_cursor = paginate_newest_first(invoices, request.query_params)
+            except ValueError as e:
+                return Response(
+                    {"success": False, "error": str(e)},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            data = InvoiceResponseSerializer(page, many=True).data
+            return Response(
+                {
+                    "success": True,
+                    "count": len(data),
+                    "next_cursor": next_cursor,
+                    "data": data,
+                }
+            )
+
+    def apply_list_filters(self, invoices, params):
+        """Optional list filters; all of them work on the (branch, created_at) index."""
+        customer_id = params.get("customer")
+        if customer_id:
+            invoices = invoices.filter(customer_id=customer_id)
 
-            # Filter by customer if provided
-            customer_id = request.query_params.get("customer")
-            if customer_id:
-                invoices = invoices.filter(customer_id=customer_id)
+        table_no = params.get("table_no") or params.get("table")
+        if table_no:
+            invoices = invoices.filter(table_no=table_no)
 
-            invoices = invoices.order_by("-created_at")
-            serializer = InvoiceResponseSerializer(invoices, many=True)
-            return Response({"success": True, "count": invoices.count(), "data": serializer.data})
+        if params.get("payment_status"):
+            invoices = invoices.filter(payment_status=params["payment_status"])
+        if params.get("invoice_status"):
+            invoices = invoices.filter(invoice_status=params["invoice_status"])
+
+        start_date = params.get("start_date")
+        end_date = params.get("end_date")
+        if start_date or end_date:
+            try:
+                start = date.fromisoformat(start_date) if start_date else None
+                end = date.fromisoformat(end_date) if end_date else None
+            except ValueError:
+                raise ValueError("Dates must be in YYYY-MM-DD format")
+            start_dt, end_dt = local_datetime_range(start or end, end or start)
+            if start:
+                invoices = invoices.filter(created_at__gte=start_dt)
+            if end:
+                invoices = invoices.filter(created_at__lt=end_dt)
+
+        return invoices
 
     # ------------------ POST (Create) ------------------
     @transaction.atomic
@@ -122,11 +235,32 @@ class InvoiceViewClass(APIView):
             print("yy")
             try:
                 invoice = serializer.save()
-                response_serializer = InvoiceResponseSerializer(invoice)
+                invoice = Invoice.objects.prefetch_related(
+                    "bills__product", "payments"
+                ).get(id=invoice.id)
+                response_data = InvoiceResponseSerializer(invoice).data
+
+                # Notify all screens via WebSocket (kitchen, waiter, counter)
+                # once this transaction commits. The full invoice rides along
+                # so clients can update local state without refetching.
+                enqueue_broadcast(
+                    {
+                        "type": "invoice_created",
+                        "invoice_id": str(invoice.id),
+                        "invoice": response_data,
+                    },
+                    invoice_groups(invoice),
+                    branch_id=invoice.branch_id,
+                )
                 return Response(
-                    {"success": True, "data": response_serializer.data},
+                    {"success": True, "data": response_data},
                     status=status.HTTP_201_CREATED,  # ✅ Use status constants
                 )
+            except InsufficientStock as e:
+                return Response(
+                    {"success": False, "error": str(e)},
+                    status=status.HTTP_409_CONFLICT,
+                )
             except Exception as e:
                 print("except:::::")
                 return Response(
@@ -194,22 +328,17 @@ class InvoiceViewClass(APIView):
                         message=f"Order #{invoice.invoice_number or id} is ready! Prepared by {request.user.full_name or request.user.username}."
                     )
 
-                try:
-                    channel_layer = get_channel_layer()
-                    if channel_layer is not None:
-                        message = {
-                            "type": "invoice_updated",
-                            "invoice_id": str(id),
-                            "status": new_status,
-                        }
-                        # Notify kitchen screens
-                        async_to_sync(channel_layer.group_send)(
-                            "kitchen_orders", message
-                        )
-                        # Notify waiter/counter screens
-                        async_to_sync(channel_layer.group_send)("orders", message)
-                except Exception:
-                    pass
+                # Published to kitchen and waiter/counter screens after commit
+                enqueue_broadcast(
+                    {
+                        "type": "invoice_updated",
+                        "invoice_id": str(id),
+                        "status": new_status,
+                        "invoice": serializer.data,
+                    },
+                    invoice_groups(invoice),
+                    branch_id=invoice.branch_id,
+                )
 
             return Response({"success": True, "data": serializer.data})
 
@@ -4,11 +4,26 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework import status
 
+from django.conf import settings
 from django.shortcuts import get_object_or_404
 from ..models import ItemActivity, Product
 from ..serializer_dir.item_activity_serializer import ItemActivitySerializer
+from ..stock import (
+    correct_stock_movement,
+    record_stock_movement,
+    record_stock_movements,
+)
 from django.db import transaction
 
+
+def stock_change(value):
+    """Whole, positive number of units from a request's `change`."""
+    change = Decimal(value)
+    if change <= 0 or change != change.to_integral_value():
+        raise ValueError(f"Invalid change value: {value}")
+    return int(change)
+
+
 class ItemActivityClassView(APIView):
     def get_user_role(self, user):
         return "SUPER_ADMIN" if user.is_superuser else getattr(user, "user_type", "")
@@ -19,14 +34,15 @@ class ItemActivityClassView(APIView):
 
         if activity_id:
             item_activity = get_object_or_404(ItemActivity,id=activity_id)
+            item_activity.balance = item_activity.running_balance()
             serializer = ItemActivitySerializer(item_activity)
         else:
             if product_id:
                 if action == "detail":
-                    item_activity = ItemActivity.objects.filter(product=product_id).order_by('-created_at')
+                    item_activity = ItemActivity.objects.filter(product=product_id).select_related("product").with_balance().order_by('-created_at', '-id')
                     serializer = ItemActivitySerializer(item_activity, many=True)
             else:
-                item_activity = ItemActivity.objects.all()
+                item_activity = ItemActivity.objects.select_related("product").with_balance()
                 serializer = ItemActivitySerializer(item_activity, many=True)
         return Response({"success": True, "data": serializer.data})
 
@@ -43,66 +59,49 @@ class ItemActivityClassView(APIView):
 
             if product_id:
                 product = get_object_or_404(Product, id=product_id, is_deleted=False)
-                data = request.data.copy()
-                data["product"] = product_id
 
                 #  Validate change
                 try:
-                    change = Decimal(data.get("change"))
-                except (TypeError, ValueError):
+                    change = stock_change(request.data.get("change"))
+                except (TypeError, ValueError, ArithmeticError):
                     return Response(
                         {"success": False, "message": "Invalid change value"},
                         status=status.HTTP_400_BAD_REQUEST,
                     )
 
-                original_qty = product.product_quantity
-
                 if action == "add":
-                    data["quantity"] = original_qty + change
-                    data["types"] = "ADD_STOCK"
-
-                elif action == "reduce":
-                    data["quantity"] = original_qty - change
-                    data["types"] = "REDUCE_STOCK"
-
-                serializer = ItemActivitySerializer(data=data)
-
-                if serializer.is_valid():
-                    try:
-                        with transaction.atomic():
-                            product.product_quantity = Decimal(
-                                serializer.validated_data["quantity"]
-                            )
-                            product.save()
-                            serializer.save()
-
-                        return Response(
-                            {
-                                "success": True,
-                                "message": "Modified product successfully",
-                                "data": serializer.data,
-                            },
-                            status=status.HTTP_200_OK,
-                        )
+                    delta, types = change, "ADD_STOCK"
+                else:
+                    delta, types = -change, "REDUCE_STOCK"
 
-                    except Exception as e:
-                        return Response(
-                            {
-                                "success": False,
-                                "message": "Something went wrong",
-                                "error": str(e),  # remove in production
-                            },
-                            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                try:
+                    with transaction.atomic():
+                        activity = record_stock_movement(
+                            product.id,
+                            delta,
+                            types,
+                            change,
+                            remarks=request.data.get("remarks", ""),
                         )
 
-                return Response(
-                    {
-                        "success": False,
-                        "message": "Validation error",
-                        "errors": serializer.errors,
-                    },
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
+                    return Response(
+                        {
+                            "success": True,
+                            "message": "Modified product successfully",
+                            "data": ItemActivitySerializer(activity).data,
+                        },
+                        status=status.HTTP_200_OK,
+                    )
+
+                except Exception as e:
+                    return Response(
+                        {
+                            "success": False,
+                            "message": "Something went wrong",
+                            "error": str(e),  # remove in production
+                        },
+                        status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    )
 
         return Response(
             {"success": False, "message": "Invalid request"},
@@ -120,12 +119,22 @@ class ItemActivityClassView(APIView):
             )
 
         item_activity = get_object_or_404(ItemActivity, id=activity_id)
-        data = request.data.copy()
+
+        # Sales and stock edits are recorded by their own flows
+        signs = {"ADD_STOCK": 1, "REDUCE_STOCK": -1}
+        if item_activity.types not in signs:
+            return Response(
+                {
+                    "success": False,
+                    "message": "Only stock additions and reductions can be edited",
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
         # Validate change before transaction
         try:
-            new_change = Decimal(data.get("change"))
-        except (TypeError, ValueError):
+            new_change = stock_change(request.data.get("change"))
+        except (TypeError, ValueError, ArithmeticError):
             return Response(
                 {"success": False, "message": "Invalid change value"},
                 status=status.HTTP_400_BAD_REQUEST,
@@ -133,46 +142,106 @@ class ItemActivityClassView(APIView):
 
         try:
             with transaction.atomic():
+                # Later balances are summed from the deltas, so only this
+                # row and the product's quantity change
+                correct_stock_movement(
+                    item_activity, signs[item_activity.types] * new_change, new_change
+                )
+                item_activity.balance = item_activity.running_balance()
+
+        except Exception as e:
+            return Response(
+                {
+                    "success": False,
+                    "message": "Something went wrong",
+                    "error": str(e),  # remove in production
+                },
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
 
-                # Reverse old effect and apply new change
-                if item_activity.types == "ADD_STOCK":
-                    tempqty = item_activity.quantity - Decimal(item_activity.change)
-                    item_activity.quantity = tempqty + new_change
+        serializer = ItemActivitySerializer(item_activity)
+        return Response(
+            {"success": True, "data": serializer.data},
+            status=status.HTTP_200_OK,
+        )
 
-                elif item_activity.types == "REDUCE_STOCK":
-                    tempqty = item_activity.quantity + Decimal(item_activity.change)
-                    item_activity.quantity = tempqty - new_change
 
-                item_activity.change = new_change
-                item_activity.save()
+class StockReceiveViewClass(APIView):
+    """
+    Receive a delivery in one request:
 
-                prev = item_activity.quantity
+        POST itemactivity/receive/
+        {"remarks": "Morning delivery",
+         "items": [{"product": 12, "change": 40, "remarks": "Flour"}, ...]}
 
-                #  Update subsequent activities safely
-                subsequent_activities = ItemActivity.objects.filter(
-                    product=item_activity.product,
-                    created_at__gt=item_activity.created_at,
-                ).order_by("created_at")
+    Every line is checked before anything is written; if any fails, the
+    response lists the errors per line and no stock moves. Otherwise all
+    lines are applied in one transaction and each gets its ADD_STOCK
+    activity back, in request order.
+    """
 
-                for act in subsequent_activities:
-                    if act.types == "ADD_STOCK":
-                        act.quantity = prev + Decimal(act.change)
-                    elif act.types == "REDUCE_STOCK":
-                        act.quantity = prev - Decimal(act.change)
+    def get_user_role(self, user):
+        return "SUPER_ADMIN" if user.is_superuser else getattr(user, "user_type", "")
 
-                    prev = act.quantity
-                    act.save()
+    def post(self, request):
+        role = self.get_user_role(request.user)
+        my_branch = request.user.branch
 
-                #  Safe handling of last()
-                last_activity = subsequent_activities.last()
+        items = request.data.get("items")
+        max_lines = settings.STOCK_RECEIVE_MAX_LINES
+        if not isinstance(items, list) or not items:
+            return Response(
+                {"success": False, "message": "items must be a non-empty list"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(items) > max_lines:
+            return Response(
+                {
+                    "success": False,
+                    "message": f"At most {max_lines} items per request",
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
-                if last_activity:
-                    item_activity.product.product_quantity = last_activity.quantity
-                else:
-                    item_activity.product.product_quantity = item_activity.quantity
+        def product_id(item):
+            try:
+                return int(item.get("product"))
+            except (AttributeError, TypeError, ValueError):
+                return None
 
-                item_activity.product.save()
+        products = Product.objects.filter(
+            id__in={product_id(item) for item in items} - {None}, is_deleted=False
+        )
+        # Branch staff can only receive stock for their own branch
+        if role not in ["SUPER_ADMIN", "ADMIN"]:
+            products = products.filter(branch=my_branch)
+        products = {product.id: product for product in products}
+
+        default_remarks = request.data.get("remarks", "")
+        movements, errors = [], []
+        for line, item in enumerate(items):
+            pid = product_id(item)
+            if pid not in products:
+                errors.append({"line": line, "error": "Product not found"})
+                continue
+            try:
+                change = stock_change(item.get("change"))
+            except (TypeError, ValueError, ArithmeticError):
+                errors.append({"line": line, "error": "Invalid change value"})
+                continue
+            movements.append(
+                (pid, change, "ADD_STOCK", change, item.get("remarks") or default_remarks)
+            )
 
+        if errors:
+            return Response(
+                {"success": False, "message": "No stock was received", "errors": errors},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            with transaction.atomic():
+                activities = record_stock_movements(movements)
         except Exception as e:
             return Response(
                 {
@@ -183,8 +252,13 @@ class ItemActivityClassView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
 
-        serializer = ItemActivitySerializer(item_activity)
+        for activity in activities:
+            activity.product = products[activity.product_id]
         return Response(
-            {"success": True, "data": serializer.data},
+            {
+                "success": True,
+                "message": f"Received {len(activities)} item(s)",
+                "data": ItemActivitySerializer(activities, many=True).data,
+            },
             status=status.HTTP_200_OK,
         )
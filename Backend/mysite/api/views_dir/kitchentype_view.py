@@ -29,6 +29,7 @@ class KitchenViewClass(APIView):
             else:
                 kitchentypes = Kitchentype.objects.none()
             
+            kitchentypes = kitchentypes.select_related("branch")
             serializer = KitchenTypeSerializer(kitchentypes, many=True)
             return Response({"success": True, "data": serializer.data})
 
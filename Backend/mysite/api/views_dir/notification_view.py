@@ -9,7 +9,7 @@ class NotificationViewClass(APIView):
     def get_user_role(self, user):
         return "SUPER_ADMIN" if user.is_superuser else getattr(user, "user_type", "")
 
-    def get(self, request):
+    def get(self, request, id=None):
         role = self.get_user_role(request.user)
         my_branch = getattr(request.user, "branch", None)
 
@@ -19,7 +19,9 @@ class NotificationViewClass(APIView):
                 status=status.HTTP_403_FORBIDDEN,
             )
 
-        notifications = Notification.objects.all()
+        notifications = Notification.objects.select_related(
+            "invoice__floor", "kitchen_user__kitchentype", "received_by"
+        )
 
         if role not in ["ADMIN", "SUPER_ADMIN"] and my_branch:
             notifications = notifications.filter(branch=my_branch)
@@ -32,6 +34,16 @@ class NotificationViewClass(APIView):
                 Q(invoice__created_by=request.user) | Q(invoice__received_by_waiter=request.user)
             )
 
+        if id:
+            notification = notifications.filter(id=id).first()
+            if notification is None:
+                return Response(
+                    {"success": False, "message": "Notification not found"},
+                    status=status.HTTP_404_NOT_FOUND,
+                )
+            serializer = NotificationSerializer(notification)
+            return Response({"success": True, "data": serializer.data})
+
         # Return latest 50 notifications
         notifications = notifications.order_by("-created_at")[:50]
         
@@ -1,11 +1,23 @@
+from datetime import date
+
 from django.db import transaction
 from django.shortcuts import get_object_or_404
+from django.db.models import Count, Max, Min, Q, Sum
 from rest_framework import status
 from rest_framework.views import APIView, Response
 
-from ..models import Product, ProductCategory
+from ..models import InvoiceItem, Product, ProductCategory
+from ..rollups import LINE_TOTAL
 from ..serializer_dir.item_activity_serializer import ItemActivitySerializer
-from ..serializer_dir.product_serializer import ProductSerializer
+from ..serializer_dir.product_serializer import ProductSaleSerializer, ProductSerializer
+from ..stock import sync_product_stock_alert
+from .dashboard_view import local_datetime_range
+from .invoice_view import paginate_newest_first
+
+
+def catalog_queryset():
+    """Products with the category, kitchen type and branch the serializer shows."""
+    return Product.objects.select_related("category__kitchentype", "category__branch")
 
 
 class ProductViewClass(APIView):
@@ -26,7 +38,9 @@ class ProductViewClass(APIView):
 
         if id:
             # get single product
-            product = get_object_or_404(Product, id=id, is_deleted=False)
+            product = get_object_or_404(
+                catalog_queryset(), id=id, is_deleted=False
+            )
 
             # Permission check: Non-admins can only see their branch products
             if role not in ["SUPER_ADMIN", "ADMIN"] and product.branch != my_branch:
@@ -43,7 +57,7 @@ class ProductViewClass(APIView):
 
         else:
             # Base queryset: all active products
-            products = Product.objects.filter(is_deleted=False)
+            products = catalog_queryset().filter(is_deleted=False)
 
             if role in ["ADMIN", "SUPER_ADMIN"]:
                 # If a branch filter is provided, use it
@@ -63,6 +77,32 @@ class ProductViewClass(APIView):
                         status=status.HTTP_400_BAD_REQUEST,
                     )
 
+            # Opt-in paging for screens that list a whole branch's stock:
+            # ?limit= (with ?cursor= from next_cursor) and optional ?search=
+            if "limit" in request.query_params:
+                search = request.query_params.get("search", "").strip()
+                if search:
+                    products = products.filter(
+                        Q(name__icontains=search) | Q(category__name__icontains=search)
+                    )
+                try:
+                    page, next_cursor = paginate_newest_first(
+                        products, request.query_params
+                    )
+                except ValueError as e:
+                    return Response(
+                        {"success": False, "message": str(e)},
+                        status=status.HTTP_400_BAD_REQUEST,
+                    )
+                serializer = ProductSerializer(page, many=True)
+                return Response(
+                    {
+                        "success": True,
+                        "next_cursor": next_cursor,
+                        "data": serializer.data,
+                    }
+                )
+
             serializer = ProductSerializer(products, many=True)
             return Response({"success": True, "data": serializer.data})
 
@@ -160,7 +200,7 @@ class ProductViewClass(APIView):
 
                     itemactivity = {
                         "change": serializer.validated_data["product_quantity"],
-                        "quantity": serializer.validated_data["product_quantity"],
+                        "delta": serializer.validated_data["product_quantity"],
                         "product": serializer.data["id"],
                         "types": "ADD_STOCK",
                         "remarks": "Opening Stock",
@@ -168,7 +208,12 @@ class ProductViewClass(APIView):
 
                     itemserilizer = ItemActivitySerializer(data=itemactivity)
                     if itemserilizer.is_valid():
-                        itemserilizer.save()
+                        activity = itemserilizer.save()
+                        # Opening stock: the balance is the new quantity
+                        activity.balance = serializer.instance.product_quantity
+
+                    # Opening stock may already be at or below the bar
+                    sync_product_stock_alert(serializer.instance)
 
                 return Response(
                     {
@@ -319,7 +364,7 @@ class ProductViewClass(APIView):
             updated_product = serializer.save()
             itemactivity = {
                 "change": updated_product.product_quantity,
-                "quantity": updated_product.product_quantity,
+                "delta": updated_product.product_quantity - old_data["quantity"],
                 "product": updated_product.id,
                 "types": "EDIT_STOCK",
                 "remarks": "Edit Stock",
@@ -327,7 +372,12 @@ class ProductViewClass(APIView):
 
             itemserializer = ItemActivitySerializer(data=itemactivity)
             if itemserializer.is_valid():
-                itemserializer.save()
+                activity = itemserializer.save()
+                # The product is already saved, so its quantity is the balance
+                activity.balance = updated_product.product_quantity
+
+            # Stock or its threshold may have crossed the low-stock line
+            sync_product_stock_alert(updated_product)
 
             # Get new data for audit
             new_data = {
@@ -400,7 +450,10 @@ class ProductViewClass(APIView):
             # Soft delete: Just mark it as deleted and hidden
             product.is_deleted = True
             product.is_available = False
-            product.save()
+            with transaction.atomic():
+                product.save()
+                # Archived products drop out of the low-stock alerts
+                sync_product_stock_alert(product)
 
             return Response(
                 {
@@ -445,3 +498,93 @@ class ProductViewClass(APIView):
                 {"success": False, "message": f"An error occurred: {str(e)}"},
                 status=status.HTTP_400_BAD_REQUEST,
             )
+
+
+class ProductSalesViewClass(APIView):
+    """
+    Sales history of one product, newest first and keyset-paged like the
+    invoice list (`?limit=` and `?cursor=`), with totals over the whole
+    range:
+
+        GET products/<id>/sales/?start_date=YYYY-MM-DD&end_date=YYYY-MM-DD
+    """
+
+    def get_user_role(self, user):
+        return "SUPER_ADMIN" if user.is_superuser else getattr(user, "user_type", "")
+
+    def get(self, request, id):
+        role = self.get_user_role(request.user)
+        my_branch = request.user.branch
+
+        if role not in ["SUPER_ADMIN", "ADMIN", "BRANCH_MANAGER"]:
+            return Response(
+                {"success": False, "message": "Insufficient permissions"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        product = get_object_or_404(Product, id=id)
+        if role not in ["SUPER_ADMIN", "ADMIN"] and product.branch_id != getattr(
+            my_branch, "id", None
+        ):
+            return Response(
+                {"success": False, "message": "Access denied to other branch products."},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        lines = InvoiceItem.objects.filter(product=product)
+        start_date = request.query_params.get("start_date")
+        end_date = request.query_params.get("end_date")
+        try:
+            start = date.fromisoformat(start_date) if start_date else None
+            end = date.fromisoformat(end_date) if end_date else None
+        except ValueError:
+            return Response(
+                {"success": False, "message": "Dates must be in YYYY-MM-DD format"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if start or end:
+            start_dt, end_dt = local_datetime_range(start or end, end or start)
+            if start:
+                lines = lines.filter(created_at__gte=start_dt)
+            if end:
+                lines = lines.filter(created_at__lt=end_dt)
+
+        summary = lines.aggregate(
+            units=Sum("quantity"),
+            revenue=Sum(LINE_TOTAL),
+            invoice_count=Count("invoice", distinct=True),
+            first_sold=Min("created_at"),
+            last_sold=Max("created_at"),
+        )
+
+        try:
+            page, next_cursor = paginate_newest_first(
+                lines.select_related("invoice__created_by"), request.query_params
+            )
+        except ValueError as e:
+            return Response(
+                {"success": False, "message": str(e)},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        quantity = summary["units"] or 0
+        revenue = summary["revenue"] or 0
+        return Response(
+            {
+                "success": True,
+                "product_id": product.id,
+                "product_name": product.name,
+                "summary": {
+                    "quantity": quantity,
+                    "revenue": float(revenue),
+                    "invoices": summary["invoice_count"],
+                    "average_price": float(revenue / quantity) if quantity else 0,
+                    "first_sold": summary["first_sold"],
+                    "last_sold": summary["last_sold"],
+                },
+                "count": len(page),
+                "next_cursor": next_cursor,
+                "data": ProductSaleSerializer(page, many=True).data,
+            },
+            status=status.HTTP_200_OK,
+        )
@@ -1,10 +1,32 @@
 # backend/api/signals.py
 import logging
 
-from django.db.models.signals import post_delete, post_save
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
 from django.dispatch import receiver
 
-from ..models import Invoice, InvoiceItem, Payment, Product
+from ..caching import bump_catalog_version_on_commit, bump_dashboard_version_on_commit
+from ..models import (
+    Branch,
+    BranchStats,
+    Floor,
+    Invoice,
+    InvoiceItem,
+    Kitchentype,
+    Payment,
+    Product,
+    ProductCategory,
+    User,
+)
+from ..rollups import (
+    invoice_state,
+    item_state,
+    payment_state,
+    record_branch_revenue,
+    record_invoice_change,
+    record_item_lines,
+    record_payment_change,
+    refresh_branch_staff,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -12,9 +34,58 @@ logger = logging.getLogger(__name__)
 # from .sse_views import trigger_dashboard_update
 
 
+# ------------------ Rollup snapshots ------------------
+# Remember what each loaded row counted for in the rollup tables, so
+# saves and deletes can move it between buckets.
+
+SNAPSHOTS = {Invoice: invoice_state, InvoiceItem: item_state, Payment: payment_state}
+
+
+def load_snapshot(instance):
+    """Snapshot from the database, for rows loaded with deferred fields."""
+    fresh = type(instance).objects.filter(pk=instance.pk).first()
+    return SNAPSHOTS[type(instance)](fresh) if fresh else None
+
+
+@receiver(post_init, sender=Invoice)
+@receiver(post_init, sender=InvoiceItem)
+@receiver(post_init, sender=Payment)
+def rollup_snapshot(sender, instance, **kwargs):
+    instance._rollup_state = SNAPSHOTS[sender](instance)
+
+
+@receiver(pre_save, sender=Invoice)
+@receiver(pre_save, sender=InvoiceItem)
+@receiver(pre_save, sender=Payment)
+def rollup_snapshot_before_save(sender, instance, **kwargs):
+    if not instance._state.adding and instance._rollup_state is None:
+        instance._rollup_state = load_snapshot(instance)
+
+
+def saved_state(instance, created):
+    """(old, new) rollup states for a save, refreshing the snapshot."""
+    old = None if created else instance._rollup_state
+    new = SNAPSHOTS[type(instance)](instance) or load_snapshot(instance)
+    instance._rollup_state = new
+    return old, new
+
+
 @receiver(post_save, sender=Invoice)
 def invoice_saved(sender, instance, created, **kwargs):
     """Trigger dashboard update when invoice is created/updated"""
+    old, new = saved_state(instance, created)
+    if getattr(instance, "defer_rollups", False):
+        # A checkout's placeholder row is counted by its next (final) save
+        if created:
+            new = None
+        else:
+            old = None
+            instance.defer_rollups = False
+    if old != new:
+        record_invoice_change(old, new)
+        record_branch_revenue(old, new)
+    bump_dashboard_version_on_commit(instance.branch_id)
+
     action = "created" if created else "updated"
     logger.info(
         f"📝 Invoice {instance.invoice_number} {action} - branch: {instance.branch_id}"
@@ -26,6 +97,9 @@ def invoice_saved(sender, instance, created, **kwargs):
 @receiver(post_delete, sender=Invoice)
 def invoice_deleted(sender, instance, **kwargs):
     """Trigger dashboard update when invoice is deleted"""
+    record_invoice_change(instance._rollup_state, None)
+    record_branch_revenue(instance._rollup_state, None)
+    bump_dashboard_version_on_commit(instance.branch_id)
     logger.info(
         f"🗑️ Invoice {instance.invoice_number} deleted - branch: {instance.branch_id}"
     )
@@ -35,6 +109,11 @@ def invoice_deleted(sender, instance, **kwargs):
 @receiver(post_save, sender=Payment)
 def payment_saved(sender, instance, created, **kwargs):
     """Trigger dashboard update when payment is made"""
+    old, new = saved_state(instance, created)
+    if old != new:
+        record_payment_change(old, new)
+    bump_dashboard_version_on_commit(instance.invoice.branch_id)
+
     action = "created" if created else "updated"
     logger.info(
         f"💰 Payment {instance.transaction_id} {action} - invoice: {instance.invoice.invoice_number}"
@@ -45,15 +124,90 @@ def payment_saved(sender, instance, created, **kwargs):
 @receiver(post_save, sender=InvoiceItem)
 def invoice_item_saved(sender, instance, created, **kwargs):
     """Trigger dashboard update when items are added to invoice"""
+    old, new = saved_state(instance, created)
+    if old != new:
+        lines = [new]
+        if old:
+            invoice_id, product_id, quantity, amount = old
+            lines.append((invoice_id, product_id, -quantity, -amount))
+        record_item_lines(lines)
+    bump_dashboard_version_on_commit(instance.invoice.branch_id)
+
     if created:
         logger.info(f"🛒 Item added to invoice {instance.invoice.invoice_number}")
         # trigger_dashboard_update(branch_id=instance.invoice.branch_id)
 
 
+@receiver(post_delete, sender=Payment)
+def payment_deleted(sender, instance, **kwargs):
+    record_payment_change(instance._rollup_state, None)
+    bump_dashboard_version_on_commit(instance.invoice.branch_id)
+
+
+@receiver(post_delete, sender=InvoiceItem)
+def invoice_item_deleted(sender, instance, **kwargs):
+    if instance._rollup_state:
+        invoice_id, product_id, quantity, amount = instance._rollup_state
+        record_item_lines([(invoice_id, product_id, -quantity, -amount)])
+    bump_dashboard_version_on_commit(instance.invoice.branch_id)
+
+
 @receiver(post_save, sender=Product)
 def product_saved(sender, instance, **kwargs):
     """Trigger dashboard update when product stock changes"""
+    bump_dashboard_version_on_commit(instance.branch_id)
     logger.info(
         f"📦 Product {instance.name} stock updated to {instance.product_quantity}"
     )
     # trigger_dashboard_update(branch_id=instance.branch_id)
+
+
+# ------------------ Catalog ------------------
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductCategory)
+@receiver(post_delete, sender=ProductCategory)
+@receiver(post_save, sender=Kitchentype)
+@receiver(post_delete, sender=Kitchentype)
+@receiver(post_save, sender=Floor)
+@receiver(post_delete, sender=Floor)
+def catalog_changed(sender, instance, **kwargs):
+    bump_catalog_version_on_commit(instance.branch_id)
+
+
+# ------------------ Branch stats ------------------
+
+
+@receiver(post_save, sender=Branch)
+def branch_saved(sender, instance, created, **kwargs):
+    if created:
+        BranchStats.objects.get_or_create(branch=instance)
+
+
+def affects_branch_staff(update_fields):
+    return not update_fields or bool({"branch", "user_type"} & set(update_fields))
+
+
+@receiver(pre_save, sender=User)
+def user_branch_before_save(sender, instance, update_fields=None, **kwargs):
+    instance._previous_branch_id = None
+    if not instance._state.adding and affects_branch_staff(update_fields):
+        instance._previous_branch_id = (
+            User.objects.filter(pk=instance.pk)
+            .values_list("branch_id", flat=True)
+            .first()
+        )
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, update_fields=None, **kwargs):
+    """Keep staff counts and managers current when users join, move or change role."""
+    if affects_branch_staff(update_fields):
+        refresh_branch_staff([instance._previous_branch_id, instance.branch_id])
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    refresh_branch_staff([instance.branch_id])
@@ -1,39 +1,24 @@
+import hashlib
 import json
 import logging
 import asyncio
-import time
-from datetime import date, datetime, timedelta
+from datetime import date, datetime
 from decimal import Decimal
 from json import JSONEncoder
 
 from asgiref.sync import sync_to_async
 
-from django.db.models import Count, F, Sum, ExpressionWrapper, Value, DecimalField, Q, Max
-from django.db.models.functions import (
-    ExtractHour,
-    ExtractWeek,
-    ExtractWeekDay,
-    ExtractYear,
-    TruncHour,
-    Coalesce,
-)
 from django.http import StreamingHttpResponse
-from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_GET
-from rest_framework.decorators import permission_classes
-from rest_framework.permissions import IsAuthenticated
 
-from ..models import Branch, Invoice, InvoiceItem, Payment, User
-from ..serializer_dir.invoice_serializer import InvoiceResponseSerializer
-from .dashboard_view import report_dashboard
+from ..caching import bump_dashboard_version, cached_dashboard
+from ..dashboard_hub import get_hub
+from ..models import Branch
+from .dashboard_view import dashboard_payload, get_date_range
 
 logger = logging.getLogger(__name__)
 
-# Store active connections for broadcasting
-active_connections = set()
-
-
 # Custom JSON encoder to handle Decimal and datetime objects
 class CustomJSONEncoder(JSONEncoder):
     def default(self, obj):
@@ -44,6 +29,79 @@ class CustomJSONEncoder(JSONEncoder):
         return super().default(obj)
 
 
+def sse_event(event, data):
+    return f"event: {event}\ndata: {data}\n\n"
+
+
+def json_pointer(key):
+    return "/" + str(key).replace("~", "~0").replace("/", "~1")
+
+
+class DashboardSnapshot:
+    """
+    One computed dashboard payload, encoded once and shared by every stream.
+
+    Each top-level key is a section, encoded and hashed on its own, so a
+    stream in patch mode can send just the sections that changed since the
+    snapshot it sent last without encoding anything again.
+    """
+
+    def __init__(self, data):
+        self.sections = {
+            key: json.dumps(value, cls=CustomJSONEncoder, sort_keys=True)
+            for key, value in data.items()
+        }
+        self.digests = {
+            key: hashlib.sha1(text.encode()).hexdigest()
+            for key, text in self.sections.items()
+        }
+        self.checksum = hashlib.sha1(
+            json.dumps(self.digests, sort_keys=True).encode()
+        ).hexdigest()
+        self.document = "{%s}" % ", ".join(
+            f"{json.dumps(key)}: {text}" for key, text in self.sections.items()
+        )
+        self.update_message = sse_event("dashboard_update", self.document)
+        self.snapshot_message = sse_event(
+            "dashboard_snapshot",
+            f'{{"checksum": "{self.checksum}", "data": {self.document}}}',
+        )
+
+    def patch_message(self, previous):
+        """
+        dashboard_patch event turning `previous` into this snapshot: an
+        RFC 6902 list of section-level add/replace/remove operations, plus
+        the checksum it applies to and the checksum of the result.
+        Returns None when no section changed.
+        """
+        if previous.checksum == self.checksum:
+            return None
+
+        operations = []
+        for key, text in self.sections.items():
+            digest = previous.digests.get(key)
+            if digest == self.digests[key]:
+                continue
+            op = "add" if digest is None else "replace"
+            operations.append(
+                f'{{"op": "{op}", "path": {json.dumps(json_pointer(key))}, '
+                f'"value": {text}}}'
+            )
+        for key in previous.digests.keys() - self.digests.keys():
+            operations.append(
+                f'{{"op": "remove", "path": {json.dumps(json_pointer(key))}}}'
+            )
+
+        return sse_event(
+            "dashboard_patch",
+            f'{{"base": "{previous.checksum}", "checksum": "{self.checksum}", '
+            f'"patch": [{", ".join(operations)}]}}',
+        )
+
+    def checksum_message(self):
+        return sse_event("dashboard_checksum", f'{{"checksum": "{self.checksum}"}}')
+
+
 @require_GET
 @csrf_exempt
 async def dashboard_sse(request):
@@ -87,61 +145,61 @@ async def dashboard_sse(request):
             status=403,
         )
 
-    async def event_stream():
-        # Generate unique connection ID
-        connection_id = f"{user.id}_{timezone.now().timestamp()}"
-        active_connections.add(connection_id)
+    target_branch = await sync_to_async(dashboard_target_branch)(user, branch_id, role)
+    target_branch_id = getattr(target_branch, "id", None)
+    start_date, end_date, timeframe = get_date_range(request)
+    key = (target_branch_id, timeframe, start_date, end_date)
 
+    # "patch": a dashboard_snapshot first, then dashboard_patch events with
+    # only the changed sections and a dashboard_checksum on every heartbeat.
+    # The default sends the whole document as dashboard_update each time.
+    patch_mode = request.GET.get("mode") == "patch"
+
+    def compute():
+        return DashboardSnapshot(get_dashboard_data_sync(target_branch, request))
+
+    async def event_stream():
         logger.info(
             f"SSE connection opened for user {user.username} (branch: {branch_id})"
         )
 
-        try:
-            # Send initial connection message
-            yield f"event: connected\ndata: {json.dumps({'status': 'connected', 'user': user.username, 'branch_id': branch_id}, cls=CustomJSONEncoder)}\n\n"
-
-            # Set initial marker BEFORE sending initial data to avoid race condition
-            last_check = timezone.now() - timedelta(seconds=1)
-
-            # Send initial dashboard data
-            initial_data = await sync_to_async(get_dashboard_data_sync)(user, branch_id, role, request)
-            if initial_data:
-                yield f"event: dashboard_update\ndata: {json.dumps(initial_data, cls=CustomJSONEncoder)}\n\n"
-
-            heartbeat_count = 0
+        # Send initial connection message
+        yield f"event: connected\ndata: {json.dumps({'status': 'connected', 'user': user.username, 'branch_id': branch_id}, cls=CustomJSONEncoder)}\n\n"
 
+        # Every stream for the same branch/timeframe shares one subscription;
+        # the hub recomputes once per change and queues the result for each.
+        hub = get_hub()
+        queue = await hub.subscribe(key, target_branch_id, compute)
+        sent = None
+        try:
             while True:
-                # Use current time as prospective next marker
-                next_check = timezone.now()
-                
-                # Check for database changes
-                changed = await sync_to_async(has_dashboard_data_changed_sync)(branch_id, last_check)
-                if changed:
-                    logger.debug(
-                        f"Data changed for user {user.username}, sending update"
-                    )
-                    new_data = await sync_to_async(get_dashboard_data_sync)(user, branch_id, role, request)
-                    if new_data:
-                        yield f"event: dashboard_update\ndata: {json.dumps(new_data, cls=CustomJSONEncoder)}\n\n"
-                    
-                    # Update marker ONLY after successful processing
-                    last_check = next_check
-
-                # Send heartbeat every 15 seconds to keep connection alive
-                heartbeat_count += 1
-                if heartbeat_count >= 7:  # ~14 seconds with 2s sleep
-                    yield ": heartbeat\n\n"
-                    heartbeat_count = 0
-
-                await asyncio.sleep(2)
+                try:
+                    # Heartbeat every ~15 seconds keeps the connection alive
+                    snapshot = await asyncio.wait_for(queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    if patch_mode and sent is not None:
+                        yield sent.checksum_message()
+                    else:
+                        yield ": heartbeat\n\n"
+                    continue
+
+                if not patch_mode:
+                    yield snapshot.update_message
+                elif sent is None:
+                    yield snapshot.snapshot_message
+                else:
+                    message = snapshot.patch_message(sent)
+                    if message:
+                        yield message
+                sent = snapshot
 
         except (asyncio.CancelledError, GeneratorExit):
-            # Clean up on disconnect
-            active_connections.discard(connection_id)
             logger.info(f"SSE connection closed for user {user.username}")
+            raise
         except Exception as e:
             logger.error(f"SSE error for user {user.username}: {e}")
-            active_connections.discard(connection_id)
+        finally:
+            hub.unsubscribe(key, queue)
 
     response = StreamingHttpResponse(event_stream(), content_type="text/event-stream")
     response["Cache-Control"] = "no-cache"
@@ -150,126 +208,30 @@ async def dashboard_sse(request):
     return response
 
 
-def has_dashboard_data_changed_sync(branch_id, since):
-    """
-    Quick check if any relevant data has changed using creation and update times
-    """
-    try:
-        # Standardize branch_id
-        if branch_id in ["null", "undefined", ""]:
-            branch_id = None
-
-        q_filter = Q(created_at__gt=since) | Q(updated_at__gt=since) if hasattr(Invoice, "updated_at") else Q(created_at__gt=since)
-        
-        if branch_id:
-            new_invoices = Invoice.objects.filter(branch_id=branch_id).filter(q_filter).exists()
-            new_payments = Payment.objects.filter(invoice__branch_id=branch_id, created_at__gt=since).exists()
-            new_items = InvoiceItem.objects.filter(invoice__branch_id=branch_id, created_at__gt=since).exists()
-        else:
-            new_invoices = Invoice.objects.filter(q_filter).exists()
-            new_payments = Payment.objects.filter(created_at__gt=since).exists()
-            new_items = InvoiceItem.objects.filter(created_at__gt=since).exists()
-
-        return new_invoices or new_payments or new_items
+def dashboard_target_branch(user, branch_id, role):
+    """Branch a dashboard stream is for; None means all branches."""
+    # Standardize branch_id
+    if branch_id in ["null", "undefined", ""]:
+        branch_id = None
 
-    except Exception as e:
-        logger.error(f"Error checking data changes: {e}")
-        return False
+    if branch_id:
+        return Branch.objects.filter(id=branch_id).first()
+    if role == "BRANCH_MANAGER":
+        return getattr(user, "branch", None)
+    return None
 
 
-def get_dashboard_data_sync(user, branch_id, role, request):
+def get_dashboard_data_sync(target_branch, request):
     """
     Get dashboard data using the shared report_dashboard logic to ensure consistency.
     """
     try:
-        # Standardize branch_id
-        if branch_id in ["null", "undefined", ""]:
-            branch_id = None
-
-        target_branch = None
-        if branch_id:
-            try:
-                target_branch = Branch.objects.get(id=branch_id)
-            except Branch.DoesNotExist:
-                pass
-        elif role == "BRANCH_MANAGER":
-            target_branch = getattr(user, "branch", None)
-
-        # Use the common report logic (which handles timeframe/dates from request)
-        report_data = report_dashboard(target_branch, request)
-        
-        start_date = report_data["start_date"]
-        end_date = report_data["end_date"]
-
-        # Replicate calculations from DashboardViewClass.get
-        base_filter = {"created_at__date__gte": start_date, "created_at__date__lte": end_date}
-        if target_branch:
-            base_filter["branch"] = target_branch
-
-        recent_orders_objs = (
-            Invoice.objects.filter(**base_filter)
-            .select_related("branch", "created_by")
-            .prefetch_related("bills", "bills__product", "payments")
-            .order_by("-created_at")[:5]
+        # Same cached payload as DashboardViewClass (timeframe/dates from request)
+        start_date, end_date, timeframe = get_date_range(request)
+        return cached_dashboard(
+            "dashboard", target_branch, start_date, end_date, timeframe,
+            lambda: dashboard_payload(target_branch, request),
         )
-        recent_orders = InvoiceResponseSerializer(recent_orders_objs, many=True).data
-
-        user_count = (
-            User.objects.filter(branch=target_branch).count() 
-            if target_branch else User.objects.all().count() - 1
-        )
-
-        response_data = {
-            **report_data,
-            "recent_orders": recent_orders,
-            "total_sum": report_data["total_month_sales"],
-            "total_sales": report_data["total_month_sales"],
-            "total_count_order": report_data["total_month_orders"],
-            "total_orders": report_data["total_month_orders"],
-            "average_order_value": report_data["avg_order"],
-            "avg_orders": report_data["avg_order"],
-            "total_sales_per_category": report_data["sales_by_category"],
-            "sales_percent": report_data["growth_percent"],
-            "order_percent": report_data["growth_percent"],
-            "avg_order_percent": report_data["growth_percent"],
-            "total_user": user_count,
-            "total_user_count": user_count,
-            "total_branch": Branch.objects.all().count(),
-            "total_count_branch": Branch.objects.all().count(),
-        }
-
-        if not target_branch:
-            # Global overview additions
-            response_data.update({
-                "top_perfomance_branch": list(Branch.objects.annotate(
-                    total_sales_per_branch=Coalesce(
-                        Sum("invoices__total_amount", filter=Q(invoices__created_at__date__gte=start_date, invoices__created_at__date__lte=end_date)),
-                        Value(0.0, output_field=DecimalField())
-                    )
-                ).values("name", "total_sales_per_branch").order_by("-total_sales_per_branch")[:5]),
-                "top_selling_items": report_data["top_selling_items_count"],
-            })
-        else:
-            # Branch specific additions
-            response_data.update({
-                "today_sales": report_data["total_month_sales"],
-                "top_selling_items": report_data["top_selling_items_count"],
-            })
-            
-            if (end_date - start_date).days == 0:
-                # Calculate peak hours for today
-                hourly_orders = (
-                    Invoice.objects.filter(**base_filter)
-                    .annotate(hour=TruncHour("created_at"))
-                    .values("hour")
-                    .annotate(total_orders=Count("id"))
-                )
-                max_orders = hourly_orders.aggregate(max_orders=Max("total_orders"))["max_orders"]
-                if max_orders is not None:
-                    peak_hours = hourly_orders.filter(total_orders=max_orders)
-                    response_data["peak_hours"] = [h["hour"].strftime("%I:%M %p") for h in peak_hours]
-
-        return response_data
 
     except Exception as e:
         logger.error(f"Error getting dashboard data: {e}")
@@ -282,6 +244,5 @@ def trigger_dashboard_update(branch_id=None):
     Manually trigger dashboard update for all connected clients
     """
     logger.info(f"Dashboard update triggered for branch: {branch_id}")
-    # In a more advanced implementation, you could use Django Channels
-    # to push updates to connected clients. For now, clients will poll.
-    return len(active_connections)
+    # Streams watch the version keys through the dashboard hub
+    bump_dashboard_version(branch_id)
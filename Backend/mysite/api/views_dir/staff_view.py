@@ -1,12 +1,55 @@
-from django.db.models import Q, Sum
-from django.utils import timezone
+from django.db import connection
+from django.db.models import Case, DecimalField, F, Value, When
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from datetime import date
 
 from ..models import Invoice, User
-from .dashboard_view import get_date_range
+from .dashboard_view import get_date_range, local_datetime_range
+
+# An invoice counts for each of these users (once, if they appear twice)
+STAFF_COLUMNS = ["created_by", "received_by_waiter", "received_by_counter"]
+
+
+def staff_totals(branch, start_date, end_date):
+    """
+    staff id -> (orders, sales, cash in hand) for invoices in `branch`
+    between the two local dates, in one query.
+
+    Each FK column is read in its own branch of a UNION, so every branch
+    can use the (branch, created_at) index; UNION also drops the duplicate
+    (staff, invoice) pairs when one user filled two of the columns.
+    """
+    start, end = local_datetime_range(start_date, end_date)
+    invoices = Invoice.objects.filter(
+        branch=branch, created_at__gte=start, created_at__lt=end
+    ).order_by()
+    # Cash in hand represents waiter cash collections (partial payment status
+    # means waiter hasn't handed over yet)
+    cash_amount = Case(
+        When(
+            received_by_waiter__user_type="WAITER",
+            payment_status="PARTIAL",
+            then=F("total_amount"),
+        ),
+        default=Value(0),
+        output_field=DecimalField(max_digits=10, decimal_places=2),
+    )
+    involved = [
+        invoices.filter(**{f"{column}__isnull": False})
+        .annotate(staff_id=F(column), cash_amount=cash_amount)
+        .values_list("staff_id", "id", "total_amount", "cash_amount")
+        for column in STAFF_COLUMNS
+    ]
+    sql, params = involved[0].union(*involved[1:]).query.sql_with_params()
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT staff_id, COUNT(*), SUM(total_amount), SUM(cash_amount) "
+            f"FROM ({sql}) involved GROUP BY staff_id",
+            params,
+        )
+        return {row[0]: row[1:] for row in cursor.fetchall()}
 
 
 class StaffReportViewClass(APIView):
@@ -52,34 +95,13 @@ class StaffReportViewClass(APIView):
             is_active=True,
         ).exclude(is_superuser=True)
 
-        staff_data = []
+        totals = staff_totals(my_branch, start_date, end_date)
 
+        staff_data = []
         for staff in staff_qs:
-            # Invoices where this staff member was involved, filtered by date
-            invoices_all = (
-                Invoice.objects.filter(
-                    branch=my_branch,
-                    created_at__date__gte=start_date,
-                    created_at__date__lte=end_date
-                )
-                .filter(
-                    Q(received_by_waiter=staff)
-                    | Q(received_by_counter=staff)
-                    | Q(created_by=staff)
-                )
-                .distinct()
+            total_orders, total_sales, total_cash_in_hand = totals.get(
+                staff.id, (0, 0, 0)
             )
-
-            total_orders = invoices_all.count()
-            total_sales = (
-                invoices_all.aggregate(total=Sum("total_amount"))["total"] or 0
-            )
-            # Cash in hand represents waiter cash collections (partial payment status means waiter hasn't handed over yet)
-            total_cash_in_hand = invoices_all.filter(
-                received_by_waiter__user_type="WAITER",
-                payment_status="PARTIAL"
-            ).aggregate(total_cash=Sum("total_amount"))["total_cash"] or 0
-
             staff_data.append(
                 {
                     "id": staff.id,
@@ -87,8 +109,8 @@ class StaffReportViewClass(APIView):
                     "username": staff.username,
                     "role": staff.user_type,
                     "orders": total_orders,
-                    "sales": float(total_sales),
-                    "cash_in_hand": float(total_cash_in_hand),
+                    "sales": float(total_sales or 0),
+                    "cash_in_hand": float(total_cash_in_hand or 0),
                 }
             )
 
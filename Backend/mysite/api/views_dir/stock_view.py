@@ -0,0 +1,168 @@
+from datetime import date
+
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from ..models import Product, StockAlert
+from ..stock import stock_as_of
+from .dashboard_view import local_datetime_range
+
+
+def parse_moment(value):
+    """
+    Aware datetime from `?at=`: an ISO datetime (local time if naive) or a
+    date, meaning the close of that day. Raises ValueError otherwise.
+    """
+    try:
+        day = date.fromisoformat(value)
+    except ValueError:
+        moment = parse_datetime(value)
+        if moment is None:
+            raise
+        return timezone.make_aware(moment) if timezone.is_naive(moment) else moment
+    _, moment = local_datetime_range(day, day)
+    return moment
+
+
+class StockAsOfViewClass(APIView):
+    """
+    Stock and stock value of a branch's products at a past moment:
+
+        GET calculate/stock-as-of/[<branch_id>/]?at=YYYY-MM-DD[THH:MM[:SS]]
+
+    A bare date gives closing stock for that day; no `at` means now.
+    Quantities come from the nearest earlier StockSnapshot plus the
+    ledger movements after it. Values use each product's cost price.
+    """
+
+    def get_user_role(self, user):
+        return "SUPER_ADMIN" if user.is_superuser else getattr(user, "user_type", "")
+
+    def get(self, request, branch_id=None):
+        role = self.get_user_role(request.user)
+        my_branch = getattr(request.user, "branch", None)
+
+        if role not in ["SUPER_ADMIN", "ADMIN", "BRANCH_MANAGER"]:
+            return Response(
+                {"success": False, "message": "Insufficient permissions"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        if role in ["SUPER_ADMIN", "ADMIN"]:
+            if not branch_id:
+                return Response(
+                    {
+                        "success": False,
+                        "message": "branch_id is required for admin/superadmin",
+                    },
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            my_branch = branch_id
+
+        if not my_branch:
+            return Response(
+                {"success": False, "message": "No branch associated with this user"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        at = request.query_params.get("at")
+        try:
+            at = parse_moment(at) if at else timezone.now()
+        except ValueError:
+            return Response(
+                {
+                    "success": False,
+                    "message": "at must be YYYY-MM-DD or an ISO datetime",
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        products = Product.objects.filter(branch=my_branch, is_deleted=False)
+        quantities, snapshot_date = stock_as_of(at, products)
+
+        data = []
+        total_value = 0
+        for product in products.select_related("category").order_by("name"):
+            quantity = quantities.get(product.id, 0)
+            value = quantity * product.cost_price
+            total_value += value
+            data.append(
+                {
+                    "product_id": product.id,
+                    "product_name": product.name,
+                    "category": product.category.name,
+                    "quantity": quantity,
+                    "cost_price": float(product.cost_price),
+                    "value": float(value),
+                }
+            )
+
+        return Response(
+            {
+                "success": True,
+                "at": timezone.localtime(at),
+                "snapshot_date": snapshot_date,
+                "total_value": float(total_value),
+                "count": len(data),
+                "data": data,
+            },
+            status=status.HTTP_200_OK,
+        )
+
+
+class StockAlertViewClass(APIView):
+    """
+    Open low-stock alerts, newest first: the branch's for managers, every
+    branch's (or ?branch_id=) for admins. Alerts are raised and resolved
+    as stock changes and pushed live on ws/stock-alerts/.
+    """
+
+    def get_user_role(self, user):
+        return "SUPER_ADMIN" if user.is_superuser else getattr(user, "user_type", "")
+
+    def get(self, request):
+        role = self.get_user_role(request.user)
+
+        if role not in ["SUPER_ADMIN", "ADMIN", "BRANCH_MANAGER"]:
+            return Response(
+                {"success": False, "message": "Insufficient permissions"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        if role in ["SUPER_ADMIN", "ADMIN"]:
+            branch_id = request.query_params.get("branch_id")
+        else:
+            branch_id = request.user.branch_id
+            if not branch_id:
+                return Response(
+                    {"success": False, "message": "No branch associated with this user"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+        alerts = StockAlert.objects.filter(
+            resolved_at__isnull=True, product__is_deleted=False
+        )
+        if branch_id:
+            alerts = alerts.filter(branch_id=branch_id)
+        alerts = alerts.select_related("product").order_by("-created_at")
+
+        data = [
+            {
+                "id": alert.id,
+                "branch_id": alert.branch_id,
+                "product_id": alert.product_id,
+                "product_name": alert.product.name,
+                "quantity": alert.product.product_quantity,
+                "low_stock_bar": alert.product.low_stock_bar,
+                "created_at": alert.created_at,
+            }
+            for alert in alerts
+        ]
+
+        return Response(
+            {"success": True, "count": len(data), "data": data},
+            status=status.HTTP_200_OK,
+        )
@@ -77,7 +77,7 @@ class UserViewClass(APIView):
             return Response({"success": True, "user": serializer.data})
         else:
             # Get all users
-            users = self.get_queryset(request)
+            users = self.get_queryset(request).select_related("branch", "kitchentype")
             serializer = UsersSerializers(users, many=True)
             return Response(
                 {"success": True, "count": users.count(), "users": serializer.data}
@@ -4,20 +4,26 @@ from channels.auth import AuthMiddlewareStack
 from channels.routing import ProtocolTypeRouter, URLRouter
 from django.core.asgi import get_asgi_application
 
-import api.routing
-
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "mysite.settings")
 
 django_asgi_app = get_asgi_application()
 
-application = ProtocolTypeRouter(
-    {
-        "http": django_asgi_app,
-        "websocket": AuthMiddlewareStack(
-            URLRouter(
-                api.routing.websocket_urlpatterns,
-            )
-        ),
-    }
-)
+# Imported after Django is set up because the consumers use models
+import api.routing
+from api.middleware import JWTQueryAuthMiddleware, OutboxRelayMiddleware
 
+# The outbox relay runs in this process, next to the consumers it feeds
+application = OutboxRelayMiddleware(
+    ProtocolTypeRouter(
+        {
+            "http": django_asgi_app,
+            "websocket": AuthMiddlewareStack(
+                JWTQueryAuthMiddleware(
+                    URLRouter(
+                        api.routing.websocket_urlpatterns,
+                    )
+                )
+            ),
+        }
+    )
+)
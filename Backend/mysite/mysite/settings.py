@@ -18,6 +18,7 @@ from pathlib import Path
 
 import dj_database_url
 import redis
+from corsheaders.defaults import default_headers
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -186,6 +187,33 @@ else:
         }
     }
 
+# Computed dashboard/report payloads. Entries are also invalidated on every
+# invoice, payment or stock change through per-branch version keys.
+DASHBOARD_CACHE_TIMEOUT = int(os.getenv("DASHBOARD_CACHE_TIMEOUT", "300"))
+# How long one request may hold the recompute lock before others give up waiting
+DASHBOARD_CACHE_LOCK_TIMEOUT = int(os.getenv("DASHBOARD_CACHE_LOCK_TIMEOUT", "10"))
+# How often (seconds) each process checks those version keys for its SSE streams
+DASHBOARD_HUB_POLL_INTERVAL = float(os.getenv("DASHBOARD_HUB_POLL_INTERVAL", "1"))
+
+# Serialized catalog blobs (catalog/). Keyed by a per-branch version that any
+# product, category, kitchen type or floor write bumps, so this only bounds
+# how long an unused version lingers.
+CATALOG_CACHE_TIMEOUT = int(os.getenv("CATALOG_CACHE_TIMEOUT", "86400"))
+# How long one request may hold the catalog rebuild lock
+CATALOG_CACHE_LOCK_TIMEOUT = int(os.getenv("CATALOG_CACHE_LOCK_TIMEOUT", "10"))
+
+# Bake plan forecasts (forecast_demand): weeks of same-weekday history, the
+# smoothing weight of the most recent week, and the margin added on top
+FORECAST_HISTORY_WEEKS = int(os.getenv("FORECAST_HISTORY_WEEKS", "12"))
+FORECAST_SMOOTHING = float(os.getenv("FORECAST_SMOOTHING", "0.3"))
+FORECAST_SAFETY_MARGIN = float(os.getenv("FORECAST_SAFETY_MARGIN", "0.1"))
+
+# Reject sales that would take a product's stock below zero. Stock rows are
+# then locked (in product id order) for the rest of the invoice transaction.
+STOCK_OVERSELL_PROTECTION = os.getenv("STOCK_OVERSELL_PROTECTION", "False") == "True"
+# Most lines accepted by one bulk stock receiving request
+STOCK_RECEIVE_MAX_LINES = int(os.getenv("STOCK_RECEIVE_MAX_LINES", "500"))
+
 # ==============================================================================
 # CHANNELS CONFIGURATION (WebSockets)
 # ==============================================================================
@@ -208,6 +236,18 @@ else:
         }
     }
 
+# The outbox relay runs inside each ASGI process (api.middleware). Commits in
+# that process wake it at once; this is how often it polls for the rest.
+OUTBOX_RELAY_INTERVAL = float(os.getenv("OUTBOX_RELAY_INTERVAL", "0.5"))
+OUTBOX_RELAY_BATCH_SIZE = int(os.getenv("OUTBOX_RELAY_BATCH_SIZE", "100"))
+# Published outbox events double as the WebSocket replay log. They are kept
+# this long (and at most EVENT_LOG_MAX_PER_BRANCH per branch) before the
+# relay prunes them.
+OUTBOX_RETENTION = timedelta(hours=int(os.getenv("OUTBOX_RETENTION_HOURS", "24")))
+EVENT_LOG_MAX_PER_BRANCH = int(os.getenv("EVENT_LOG_MAX_PER_BRANCH", "1000"))
+# Clients that missed more events than this are told to resync instead
+EVENT_REPLAY_LIMIT = int(os.getenv("EVENT_REPLAY_LIMIT", "200"))
+
 
 # ==============================================================================
 # DATABASE CONFIGURATION
@@ -415,6 +455,10 @@ if IS_DEVELOPMENT:
 
 CORS_ALLOW_CREDENTIALS = True
 
+# Conditional GETs of the catalog from the browser
+CORS_ALLOW_HEADERS = (*default_headers, "if-none-match")
+CORS_EXPOSE_HEADERS = ["ETag"]
+
 # CSRF trusted origins
 CSRF_TRUSTED_ORIGINS = CORS_ALLOWED_ORIGINS.copy()
 
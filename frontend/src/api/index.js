@@ -398,6 +398,17 @@ export async function fetchProducts() {
   return data.data;
 }
 
+// One page of the product list; pass next_cursor back as `cursor`
+export async function fetchProductPage(params = {}) {
+  const query = new URLSearchParams(
+    Object.entries(params).filter(([, v]) => v !== undefined && v !== null && v !== "")
+  ).toString();
+  const res = await apiFetch(`/api/products/?${query}`);
+  const data = await safeJson(res);
+  if (!res.ok) throw new Error(data?.message || data?.error || "Failed to fetch products");
+  return { data: data.data, next_cursor: data.next_cursor ?? null };
+}
+
 export async function createProduct(productData) {
   const res = await apiFetch("/api/products/", {
     method: "POST",
@@ -427,6 +438,22 @@ export async function deleteProduct(id) {
   return data;
 }
 
+// Last catalog per URL with its ETag; an unchanged catalog comes back as 304
+const catalogCache = new Map();
+
+// Products, categories, kitchen types and floors (no stock) in one request
+export async function fetchCatalog(branchId = null) {
+  const url = branchId ? `/api/catalog/?branch_id=${branchId}` : "/api/catalog/";
+  const cached = catalogCache.get(url);
+  const res = await apiFetch(url, cached ? { headers: { "If-None-Match": cached.etag } } : {});
+  if (res.status === 304 && cached) return cached.data;
+  const data = await safeJson(res);
+  if (!res.ok) throw new Error(data?.message || "Failed to fetch catalog");
+  const etag = res.headers.get("ETag");
+  if (etag) catalogCache.set(url, { etag, data });
+  return data;
+}
+
 export async function fetchCategories() {
   const res = await apiFetch("/api/category/");
   const data = await safeJson(res);
@@ -545,10 +572,26 @@ export async function createInvoice(invoiceData) {
   return data.data;
 }
 
-export async function fetchInvoices() {
-  const res = await apiFetch("/api/invoice/");
+export async function fetchInvoices(params = {}) {
+  const page = await fetchInvoicePage(params);
+  return page.data;
+}
+
+// Managers/admins get one page at a time; pass next_cursor back as `cursor`
+export async function fetchInvoicePage(params = {}) {
+  const query = new URLSearchParams(
+    Object.entries(params).filter(([, v]) => v !== undefined && v !== null && v !== "")
+  ).toString();
+  const res = await apiFetch(`/api/invoice/${query ? `?${query}` : ""}`);
+  const data = await safeJson(res);
+  if (!res.ok) throw new Error(data?.message || data?.error || "Failed to fetch invoices");
+  return { data: data.data, next_cursor: data.next_cursor ?? null };
+}
+
+export async function fetchInvoice(id) {
+  const res = await apiFetch(`/api/invoice/${id}/`);
   const data = await safeJson(res);
-  if (!res.ok) throw new Error(data?.message || "Failed to fetch invoices");
+  if (!res.ok) throw new Error(data?.message || data?.error || "Failed to fetch invoice");
   return data.data;
 }
 
@@ -620,6 +663,17 @@ export async function addItemActivity(productId, type, activityData) {
   return data;
 }
 
+// items: [{ product, change, remarks? }]; all lines are applied or none
+export async function receiveStock(items, remarks = "") {
+  const res = await apiFetch("/api/itemactivity/receive/", {
+    method: "POST",
+    body: JSON.stringify({ items, remarks }),
+  });
+  const data = await safeJson(res);
+  if (!res.ok) throw new Error(data?.message || "Failed to receive stock");
+  return data;
+}
+
 export async function fetchItemActivity(productId) {
   const res = await apiFetch(`/api/itemactivity/${productId}/detail/`);
   const data = await safeJson(res);
@@ -627,6 +681,14 @@ export async function fetchItemActivity(productId) {
   return data.data;
 }
 
+export async function fetchStockAlerts(branchId = null) {
+  const url = branchId ? `/api/stock-alerts/?branch_id=${branchId}` : "/api/stock-alerts/";
+  const res = await apiFetch(url);
+  const data = await safeJson(res);
+  if (!res.ok) throw new Error(data?.message || "Failed to fetch stock alerts");
+  return data.data;
+}
+
 export async function fetchDashboardDetails(branchId = null, filters = {}) {
   let url = branchId
     ? `/api/calculate/dashboard-details/${branchId}/`
@@ -690,11 +752,16 @@ export async function refreshDashboard(branchId = null) {
   return fetchDashboardDetails(branchId);
 }
 
+// Follows next_cursor so the customer's whole history comes back, not just the first page
 export async function fetchInvoicesByCustomer(customerId) {
-  const res = await apiFetch(`/api/invoice/?customer=${customerId}`);
-  const data = await safeJson(res);
-  if (!res.ok) throw new Error(data?.message || "Failed to fetch invoices for customer");
-  return data.data;
+  const invoices = [];
+  let cursor = null;
+  do {
+    const page = await fetchInvoicePage({ customer: customerId, limit: 200, cursor });
+    invoices.push(...(page.data || []));
+    cursor = page.next_cursor;
+  } while (cursor);
+  return invoices;
 }
 
 // Kitchen Type APIs
@@ -23,6 +23,28 @@ type DashboardData = {
 
 type SSEHandler = (data: DashboardData) => void;
 
+type PatchOperation = {
+  op: "add" | "replace" | "remove";
+  path: string;
+  value?: any;
+};
+
+// Section-level JSON Pointer ("/recent_orders") back to its key
+const pointerKey = (path: string) =>
+  path.slice(1).replace(/~1/g, "/").replace(/~0/g, "~");
+
+function applyPatch(data: DashboardData, patch: PatchOperation[]): DashboardData {
+  const next: Record<string, any> = { ...data };
+  for (const { op, path, value } of patch) {
+    if (op === "remove") {
+      delete next[pointerKey(path)];
+    } else {
+      next[pointerKey(path)] = value;
+    }
+  }
+  return next as DashboardData;
+}
+
 export function useDashboardSSE(
   branchId: number | string | null | undefined,
   onUpdate: SSEHandler,
@@ -32,6 +54,9 @@ export function useDashboardSSE(
 ) {
   const eventSourceRef = useRef<EventSource | null>(null);
   const reconnectTimeoutRef = useRef<NodeJS.Timeout | null>(null);
+  // Last full document and its server checksum; patches apply on top
+  const dataRef = useRef<DashboardData | null>(null);
+  const checksumRef = useRef<string | null>(null);
 
   const connect = useCallback(() => {
     // Close existing connection
@@ -39,8 +64,11 @@ export function useDashboardSSE(
       eventSourceRef.current.close();
     }
 
+    dataRef.current = null;
+    checksumRef.current = null;
+
     // Build URL with params
-    const queryParams = new URLSearchParams();
+    const queryParams = new URLSearchParams({ mode: "patch" });
     if (branchId) {
       queryParams.append("branch_id", branchId.toString());
     }
@@ -72,6 +100,41 @@ export function useDashboardSSE(
       console.log("[SSE] Connection confirmed:", JSON.parse(event.data));
     });
 
+    eventSource.addEventListener("dashboard_snapshot", (event) => {
+      try {
+        const { checksum, data } = JSON.parse(event.data);
+        dataRef.current = data;
+        checksumRef.current = checksum;
+        onUpdate(data);
+      } catch (err) {
+        console.error("[SSE] Failed to parse dashboard snapshot:", err);
+      }
+    });
+
+    eventSource.addEventListener("dashboard_patch", (event) => {
+      try {
+        const { base, checksum, patch } = JSON.parse(event.data);
+        if (!dataRef.current || base !== checksumRef.current) {
+          console.warn("[SSE] Patch does not match local dashboard, resyncing...");
+          connect();
+          return;
+        }
+        dataRef.current = applyPatch(dataRef.current, patch);
+        checksumRef.current = checksum;
+        onUpdate(dataRef.current);
+      } catch (err) {
+        console.error("[SSE] Failed to apply dashboard patch:", err);
+      }
+    });
+
+    eventSource.addEventListener("dashboard_checksum", (event) => {
+      const { checksum } = JSON.parse(event.data);
+      if (checksumRef.current && checksum !== checksumRef.current) {
+        console.warn("[SSE] Dashboard checksum mismatch, resyncing...");
+        connect();
+      }
+    });
+
     eventSource.addEventListener("dashboard_update", (event) => {
       try {
         const data = JSON.parse(event.data);
@@ -1,29 +1,68 @@
 import { useEffect, useRef, useCallback } from "react";
 import { WS_BASE_URL } from "../api/config";
+import { getAccessToken } from "../api/index.js";
 
-type MessageHandler = (data: { type: string; invoice_id?: string; status?: string }) => void;
+type MessageHandler = (data: { type: string; seq?: number; invoice_id?: string; status?: string; invoice?: any }) => void;
 
-export function useOrdersWebSocket(onMessage: MessageHandler) {
+/**
+ * Follows an invoice event feed (ws/orders/ by default, ws/kitchen/ for the
+ * kitchen board). The server's "hello" frame gives a cursor before any event
+ * arrives. Reconnects with the last seq seen; the server answers with
+ * one "replay" frame of missed events, handed to `onMessage` in a single
+ * pass so React renders once, or a "resync" when the screen must refetch.
+ */
+export function useOrdersWebSocket(onMessage: MessageHandler, path = "/ws/orders/") {
   const socketRef = useRef<WebSocket | null>(null);
+  // Last event seq seen, so a reconnect only replays what was missed
+  const lastSeqRef = useRef<number | null>(null);
+  const stoppedRef = useRef(false);
+  const reconnectingRef = useRef(false);
 
   const connect = useCallback(() => {
-    const socket = new WebSocket(WS_BASE_URL + "/ws/orders/");
+    if (stoppedRef.current) return;
+    // The token lets the server subscribe this socket to its branch only
+    const token = getAccessToken();
+    const params = new URLSearchParams();
+    if (token) params.set("token", token);
+    if (lastSeqRef.current !== null) params.set("last_seq", String(lastSeqRef.current));
+    // Without a cursor the server can't replay, so it asks us to resync
+    if (reconnectingRef.current) params.set("reconnect", "1");
+    const query = params.toString() ? `?${params.toString()}` : "";
+    const socket = new WebSocket(WS_BASE_URL + path + query);
+
+    const deliver = (data: any) => {
+      if (typeof data.seq === "number") {
+        // Replayed events may overlap with live ones
+        if (lastSeqRef.current !== null && data.seq <= lastSeqRef.current) return;
+        lastSeqRef.current = data.seq;
+      }
+      onMessage(data);
+    };
 
     socket.onopen = () => {
-      console.log("[WS] Orders socket connected");
+      console.log(`[WS] ${path} connected`);
     };
 
     socket.onmessage = (event) => {
       try {
         const data = JSON.parse(event.data);
-        onMessage(data);
+        if (data.type === "hello") {
+          // Keep our own cursor on reconnect so the replay isn't skipped
+          if (lastSeqRef.current === null) lastSeqRef.current = data.seq;
+        } else if (data.type === "replay") {
+          (data.events || []).forEach(deliver);
+        } else {
+          deliver(data);
+        }
       } catch {
         // Ignore malformed messages
       }
     };
 
     socket.onclose = () => {
-      console.log("[WS] Orders socket closed, reconnecting in 3s...");
+      if (stoppedRef.current) return;
+      console.log(`[WS] ${path} closed, reconnecting in 3s...`);
+      reconnectingRef.current = true;
       setTimeout(connect, 3000);
     };
 
@@ -32,12 +71,15 @@ export function useOrdersWebSocket(onMessage: MessageHandler) {
     };
 
     socketRef.current = socket;
-  }, [onMessage]);
+  }, [onMessage, path]);
 
   useEffect(() => {
+    stoppedRef.current = false;
+    reconnectingRef.current = false;
     connect();
 
     return () => {
+      stoppedRef.current = true;
       if (socketRef.current) {
         socketRef.current.close();
       }
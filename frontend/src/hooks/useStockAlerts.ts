@@ -0,0 +1,100 @@
+import { useEffect, useState } from "react";
+import { WS_BASE_URL } from "../api/config";
+import { fetchStockAlerts, getAccessToken } from "../api/index.js";
+
+export interface StockAlert {
+  product_id: number;
+  product_name: string;
+  quantity: number;
+  low_stock_bar: number;
+}
+
+/**
+ * Open low-stock alerts keyed by product id. Loads the open alerts once,
+ * then follows ws/stock-alerts/ as sales and stock changes raise or
+ * resolve them, refetching only when the socket asks for a resync.
+ */
+export function useStockAlerts() {
+  const [alerts, setAlerts] = useState<Map<number, StockAlert>>(new Map());
+
+  useEffect(() => {
+    let socket: WebSocket | null = null;
+    let lastSeq: number | null = null;
+    let reconnecting = false;
+    let closed = false;
+
+    const load = async () => {
+      try {
+        const data: StockAlert[] = await fetchStockAlerts();
+        setAlerts(new Map(data.map((alert) => [alert.product_id, alert])));
+      } catch (err) {
+        console.error("Failed to load stock alerts:", err);
+      }
+    };
+
+    const connect = () => {
+      const token = getAccessToken();
+      const params = new URLSearchParams();
+      if (token) params.set("token", token);
+      if (lastSeq !== null) params.set("last_seq", String(lastSeq));
+      if (reconnecting) params.set("reconnect", "1");
+      const query = params.toString() ? `?${params.toString()}` : "";
+      socket = new WebSocket(WS_BASE_URL + "/ws/stock-alerts/" + query);
+
+      const apply = (data: any) => {
+        if (typeof data.seq === "number") {
+          if (lastSeq !== null && data.seq <= lastSeq) return;
+          lastSeq = data.seq;
+        }
+        if (data.type !== "stock_alerts") return;
+        setAlerts((current) => {
+          const next = new Map(current);
+          for (const alert of data.alerts) {
+            if (alert.status === "open") next.set(alert.product_id, alert);
+            else next.delete(alert.product_id);
+          }
+          return next;
+        });
+      };
+
+      socket.onmessage = (event) => {
+        try {
+          const data = JSON.parse(event.data);
+          if (data.type === "hello") {
+            // Cursor for a first connect; a reconnect keeps its own
+            if (lastSeq === null) lastSeq = data.seq;
+          } else if (data.type === "resync") {
+            load();
+          } else if (data.type === "replay") {
+            // Missed events arrive together after a reconnect
+            (data.events || []).forEach(apply);
+          } else {
+            apply(data);
+          }
+        } catch {
+          // Ignore malformed messages
+        }
+      };
+
+      socket.onclose = () => {
+        if (closed) return;
+        reconnecting = true;
+        setTimeout(connect, 3000);
+      };
+
+      socket.onerror = () => {
+        socket?.close();
+      };
+    };
+
+    load();
+    connect();
+
+    return () => {
+      closed = true;
+      socket?.close();
+    };
+  }, []);
+
+  return alerts;
+}
@@ -0,0 +1,31 @@
+// Merging invoices pushed over the orders/kitchen sockets into local state.
+// Events can arrive out of order (replays overlap live ones), so the copy
+// with the newer `updated_at` always wins.
+
+type InvoiceLike = { id: any; updated_at?: string };
+
+// True when `incoming` is not newer than what we already have
+export function isStaleInvoice(current?: InvoiceLike, incoming?: InvoiceLike): boolean {
+    if (!current?.updated_at || !incoming?.updated_at) return false;
+    return new Date(incoming.updated_at).getTime() <= new Date(current.updated_at).getTime();
+}
+
+// Insert or replace `incoming` in `list`; drop it when `keep` rejects it
+// (e.g. an order that is no longer shown on this screen).
+export function mergeInvoice<T extends InvoiceLike>(
+    list: T[],
+    incoming: T,
+    keep: (item: T) => boolean = () => true
+): T[] {
+    const index = list.findIndex((item) => String(item.id) === String(incoming.id));
+    if (index !== -1 && isStaleInvoice(list[index], incoming)) return list;
+
+    if (!keep(incoming)) {
+        return index === -1 ? list : list.filter((_, i) => i !== index);
+    }
+    if (index === -1) return [incoming, ...list];
+
+    const next = list.slice();
+    next[index] = incoming;
+    return next;
+}
@@ -152,7 +152,12 @@ export default function AdminDashboard() {
   const loadRecentOrders = async () => {
     setLoading(true);
     try {
-      const data = await fetchInvoices();
+      const isAdmin =
+        user?.is_superuser || user?.role === "ADMIN" || user?.role === "SUPER_ADMIN";
+      const data = await fetchInvoices({
+        limit: 5,
+        branch_id: isAdmin ? user?.branch_id : undefined,
+      });
       const sorted = Array.isArray(data)
         ? [...data].sort((a: any, b: any) => new Date(b.created_at).getTime() - new Date(a.created_at).getTime())
         : [];
@@ -40,7 +40,8 @@ import {
   Minus
 } from "lucide-react";
 import { toast } from "sonner";
-import { fetchProducts, createProduct, updateProduct, deleteProduct, fetchCategories, addItemActivity, fetchItemActivity } from "../../api/index.js";
+import { useStockAlerts } from "../../hooks/useStockAlerts";
+import { fetchProductPage, createProduct, updateProduct, deleteProduct, fetchCategories, addItemActivity, fetchItemActivity } from "../../api/index.js";
 
 interface Product {
   id: number;
@@ -75,11 +76,15 @@ interface ActivityLog {
   remarks: string;
 }
 
+const PRODUCT_PAGE_SIZE = 50;
+
 export default function AdminInventory() {
   const [products, setProducts] = useState<Product[]>([]);
   const [categories, setCategories] = useState<BackendCategory[]>([]);
   const [searchTerm, setSearchTerm] = useState("");
   const [loading, setLoading] = useState(true);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   // Selection State
   const [selectedProductId, setSelectedProductId] = useState<number | null>(null);
@@ -93,24 +98,30 @@ export default function AdminInventory() {
 
   const [activityLogs, setActivityLogs] = useState<ActivityLog[]>([]);
   const [loadingActivity, setLoadingActivity] = useState(false);
+  const stockAlerts = useStockAlerts();
 
   useEffect(() => {
-    loadData();
+    fetchCategories()
+      .then(setCategories)
+      .catch((err: any) => toast.error(err.message || "Failed to load categories"));
   }, []);
 
-  const loadData = async () => {
+  // The list is paged and searched on the server; wait for typing to settle
+  useEffect(() => {
+    const timer = setTimeout(() => loadProducts(searchTerm), searchTerm ? 300 : 0);
+    return () => clearTimeout(timer);
+  }, [searchTerm]);
+
+  const loadProducts = async (search: string) => {
     setLoading(true);
     try {
-      const [productsData, categoriesData] = await Promise.all([
-        fetchProducts(),
-        fetchCategories()
-      ]);
-      setProducts(productsData);
-      setCategories(categoriesData);
+      const page = await fetchProductPage({ limit: PRODUCT_PAGE_SIZE, search });
+      setProducts(page.data || []);
+      setNextCursor(page.next_cursor);
 
       // Select first product by default if available and none selected
-      if (productsData.length > 0 && !selectedProductId) {
-        setSelectedProductId(productsData[0].id);
+      if (page.data?.length > 0 && !selectedProductId) {
+        setSelectedProductId(page.data[0].id);
       }
     } catch (err: any) {
       toast.error(err.message || "Failed to load data");
@@ -119,6 +130,20 @@ export default function AdminInventory() {
     }
   };
 
+  const loadMoreProducts = async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    try {
+      const page = await fetchProductPage({ limit: PRODUCT_PAGE_SIZE, search: searchTerm, cursor: nextCursor });
+      setProducts(prev => [...prev, ...(page.data || [])]);
+      setNextCursor(page.next_cursor);
+    } catch (err: any) {
+      toast.error(err.message || "Failed to load products");
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const loadActivity = async (productId: number) => {
     setLoadingActivity(true);
     try {
@@ -140,11 +165,6 @@ export default function AdminInventory() {
     }
   }, [selectedProductId]);
 
-  const filteredProducts = products.filter(product =>
-    product.name.toLowerCase().includes(searchTerm.toLowerCase()) ||
-    product.category_name.toLowerCase().includes(searchTerm.toLowerCase())
-  );
-
   const selectedProduct = products.find(p => p.id === selectedProductId);
 
   // Handle Product Create/Update
@@ -274,7 +294,7 @@ export default function AdminInventory() {
       {/* Left Sidebar: Product List */}
       <div className="w-1/4 min-w-[300px] flex flex-col gap-4">
         <div className="flex items-center justify-between">
-          <h2 className="text-xl font-bold text-slate-800">Products({filteredProducts.length})</h2>
+          <h2 className="text-xl font-bold text-slate-800">Products({products.length}{nextCursor ? "+" : ""})</h2>
           <Dialog open={isDialogOpen} onOpenChange={setIsDialogOpen}>
             <DialogTrigger asChild>
               <Button onClick={() => setEditProduct(null)} size="sm" className="bg-primary text-white hover:bg-primary/90 rounded-lg text-xs font-bold">
@@ -369,10 +389,10 @@ export default function AdminInventory() {
         <div className="flex-1 overflow-y-auto space-y-2 pr-2">
           {loading ? (
             <div className="text-center py-10 text-muted-foreground"><Loader2 className="h-6 w-6 animate-spin mx-auto" /></div>
-          ) : filteredProducts.length === 0 ? (
+          ) : products.length === 0 ? (
             <div className="text-center py-10 text-muted-foreground text-sm">No products found</div>
           ) : (
-            filteredProducts.map(product => (
+            products.map(product => (
               <div
                 key={product.id}
                 onClick={() => setSelectedProductId(product.id)}
@@ -380,7 +400,7 @@ export default function AdminInventory() {
               >
                 <div className="flex justify-between items-center mb-1">
                   <h3 className={`font-bold text-sm ${selectedProductId === product.id ? 'text-primary-foreground' : 'text-slate-700'}`}>{product.name}</h3>
-                  {product.product_quantity <= product.low_stock_bar && (
+                  {stockAlerts.has(product.id) && (
                     <Badge variant={selectedProductId === product.id ? "secondary" : "destructive"} className="h-5 px-1.5 text-[10px]">Low</Badge>
                   )}
                 </div>
@@ -388,6 +408,14 @@ export default function AdminInventory() {
               </div>
             ))
           )}
+          {nextCursor && !loading && (
+            <div className="py-2 flex justify-center">
+              <Button variant="outline" size="sm" onClick={loadMoreProducts} disabled={loadingMore}>
+                {loadingMore && <Loader2 className="h-4 w-4 mr-2 animate-spin" />}
+                Load more
+              </Button>
+            </div>
+          )}
         </div>
       </div>
 
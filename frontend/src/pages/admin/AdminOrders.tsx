@@ -6,13 +6,15 @@ import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from "@
 import { Search, Filter, Download, Eye, Loader2 } from "lucide-react";
 import { Dialog, DialogContent, DialogHeader, DialogTitle } from "@/components/ui/dialog";
 import { format, parseISO } from "date-fns";
-import { fetchInvoices, fetchProducts } from "@/api/index.js";
+import { fetchInvoicePage, fetchProducts } from "@/api/index.js";
 import { toast } from "sonner";
 import { getCurrentUser } from "@/auth/auth";
 
 export default function AdminOrders() {
   const [orders, setOrders] = useState<any[]>([]);
   const [loading, setLoading] = useState(true);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [searchTerm, setSearchTerm] = useState("");
   const [statusFilter, setStatusFilter] = useState<string>("all");
   const [selectedOrder, setSelectedOrder] = useState<any | null>(null);
@@ -41,14 +43,9 @@ export default function AdminOrders() {
   const loadInvoices = async () => {
     setLoading(true);
     try {
-      const data = await fetchInvoices();
-      const scoped =
-        branchId != null
-          ? (data || []).filter(
-            (o: any) => o.branch === branchId || o.branch_id === branchId
-          )
-          : data || [];
-      setOrders(scoped);
+      const page = await fetchInvoicePage({ branch_id: branchId });
+      setOrders(page.data || []);
+      setNextCursor(page.next_cursor);
     } catch (err: any) {
       toast.error(err.message || "Failed to load invoices");
     } finally {
@@ -56,6 +53,20 @@ export default function AdminOrders() {
     }
   };
 
+  const loadMoreInvoices = async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    try {
+      const page = await fetchInvoicePage({ branch_id: branchId, cursor: nextCursor });
+      setOrders(prev => [...prev, ...(page.data || [])]);
+      setNextCursor(page.next_cursor);
+    } catch (err: any) {
+      toast.error(err.message || "Failed to load invoices");
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const filteredOrders = orders.filter(order => {
     const matchesSearch =
       order.invoice_number.toLowerCase().includes(searchTerm.toLowerCase()) ||
@@ -160,6 +171,15 @@ export default function AdminOrders() {
             No orders found matching your criteria
           </div>
         )}
+
+        {nextCursor && !loading && (
+          <div className="py-4 flex justify-center border-t">
+            <Button variant="outline" onClick={loadMoreInvoices} disabled={loadingMore}>
+              {loadingMore && <Loader2 className="h-4 w-4 mr-2 animate-spin" />}
+              Load more
+            </Button>
+          </div>
+        )}
       </div>
 
       {/* Order Detail Dialog */}
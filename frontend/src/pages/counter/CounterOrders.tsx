@@ -34,6 +34,10 @@ import { getCurrentUser, logout } from "@/auth/auth";
 import { ChangePasswordModal } from "@/components/auth/ChangePasswordModal";
 import { X } from "lucide-react";
 import { useOrdersWebSocket } from "@/hooks/useOrdersWebSocket";
+import { mergeInvoice } from "@/lib/invoiceEvents";
+
+// Orders shown on the counter screen
+const isCounterOrder = (inv: any) => inv.invoice_type === 'SALE' && !inv.is_deleted;
 
 export default function CounterOrders() {
     const navigate = useNavigate();
@@ -95,9 +99,7 @@ export default function CounterOrders() {
             const data = await fetchInvoices();
             if (Array.isArray(data)) {
                 // Filter locally to avoid crashing on invalid/deleted invoices
-                const validOrders = data.filter((inv: any) =>
-                    inv.invoice_type === 'SALE' && !inv.is_deleted
-                );
+                const validOrders = data.filter(isCounterOrder);
                 // Sort by ID descending (newest first)
                 validOrders.sort((a: any, b: any) => b.id - a.id);
                 setOrders(validOrders);
@@ -129,20 +131,24 @@ export default function CounterOrders() {
         }
     }, []);
 
-    // WebSocket: auto-refresh when invoice created or status updated
+    // WebSocket: merge the pushed invoice into the list; only a resync refetches
     useOrdersWebSocket(
         useCallback(
             (data) => {
-                if (data.type === "invoice_created") {
-                    // New order - play sound
-                    playNotificationSound();
+                if (data.type === "resync") {
                     loadInvoices();
-                } else if (data.type === "invoice_updated" && data.status === "READY") {
-                    // Order ready - play sound
+                    return;
+                }
+                if (data.type !== "invoice_created" && data.type !== "invoice_updated") return;
+
+                if (data.type === "invoice_created" || data.status === "READY") {
+                    // New order or order ready - play sound
                     playNotificationSound();
-                    loadInvoices();
-                } else if (data.type === "invoice_updated") {
-                    loadInvoices();
+                }
+                if (data.invoice) {
+                    setOrders((prev) =>
+                        [...mergeInvoice(prev, data.invoice, isCounterOrder)].sort((a: any, b: any) => b.id - a.id)
+                    );
                 }
             },
             [loadInvoices, playNotificationSound]
@@ -35,7 +35,7 @@ import { logout, getCurrentUser } from "../../auth/auth";
 import { ChangePasswordModal } from "@/components/auth/ChangePasswordModal";
 import { CustomerSelector } from "@/components/pos/CustomerSelector";
 import { FloorSelector } from "@/components/pos/FloorSelector";
-import { fetchProducts, fetchCategories, createInvoice, fetchInvoices } from "@/api/index.js";
+import { fetchCatalog, createInvoice, fetchInvoice } from "@/api/index.js";
 import { MenuItem, User as UserType } from "@/lib/mockData";
 import { Button } from "@/components/ui/button";
 import { Input } from "@/components/ui/input";
@@ -98,10 +98,7 @@ export default function CounterPOS() {
     const loadData = async () => {
         setLoading(true);
         try {
-            const [productsData, categoriesData] = await Promise.all([
-                fetchProducts(),
-                fetchCategories()
-            ]);
+            const { products: productsData, categories: categoriesData } = await fetchCatalog();
 
             const mappedProducts: any[] = productsData.map((p: any) => ({
                 id: p.id.toString(),
@@ -161,42 +158,40 @@ export default function CounterPOS() {
 
     const loadSpecificOrder = async (orderId: number) => {
         try {
-            const data = await fetchInvoices();
-            if (Array.isArray(data)) {
-                const order = data.find((inv: any) => inv.id === orderId);
-                if (order) {
-                    const mappedItems = order.items.map((item: any) => ({
-                        item: products.find(p => p.id === item.product) || {
-                            id: item.product,
-                            name: item.product_name || `Product #${item.product}`,
-                            price: parseFloat(item.unit_price),
-                            category: "Unknown",
-                            available: true
-                        },
-                        quantity: item.quantity
-                    }));
-                    setCart(mappedItems);
-                    setCustomer(order.customer ? { id: order.customer, name: order.customer_name } : null);
-                    setTaxEnabled(parseFloat(order.tax_amount) > 0);
-                    // Estimate tax rate if possible
-                    const sub = order.items.reduce((sum: number, i: any) => sum + (parseFloat(i.unit_price) * i.quantity), 0);
-                    if (sub > 0) {
-                        setTaxRate(Math.round((parseFloat(order.tax_amount) / sub) * 100));
-                    }
-                    setPaidAmount(parseFloat(order.paid_amount || 0));
-                    setDueAmount(parseFloat(order.due_amount || 0));
-                    setShowReceipt(true);
-
-                    // Auto print if requested
-                    if (location.state?.autoPrint) {
-                        setTimeout(() => {
-                            window.print();
-                        }, 500);
-                    }
-
-                    // Clear state so it doesn't reload on every render
-                    window.history.replaceState({}, document.title);
+            // Fetch just this invoice; it may be older than the first list page
+            const order = await fetchInvoice(orderId);
+            if (order) {
+                const mappedItems = order.items.map((item: any) => ({
+                    item: products.find(p => p.id === item.product) || {
+                        id: item.product,
+                        name: item.product_name || `Product #${item.product}`,
+                        price: parseFloat(item.unit_price),
+                        category: "Unknown",
+                        available: true
+                    },
+                    quantity: item.quantity
+                }));
+                setCart(mappedItems);
+                setCustomer(order.customer ? { id: order.customer, name: order.customer_name } : null);
+                setTaxEnabled(parseFloat(order.tax_amount) > 0);
+                // Estimate tax rate if possible
+                const sub = order.items.reduce((sum: number, i: any) => sum + (parseFloat(i.unit_price) * i.quantity), 0);
+                if (sub > 0) {
+                    setTaxRate(Math.round((parseFloat(order.tax_amount) / sub) * 100));
                 }
+                setPaidAmount(parseFloat(order.paid_amount || 0));
+                setDueAmount(parseFloat(order.due_amount || 0));
+                setShowReceipt(true);
+
+                // Auto print if requested
+                if (location.state?.autoPrint) {
+                    setTimeout(() => {
+                        window.print();
+                    }, 500);
+                }
+
+                // Clear state so it doesn't reload on every render
+                window.history.replaceState({}, document.title);
             }
         } catch (err) {
             console.error("Failed to load specific order", err);
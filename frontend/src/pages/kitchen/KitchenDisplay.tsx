@@ -1,4 +1,4 @@
-import { useState, useEffect } from "react";
+import { useState, useEffect, useRef, useCallback } from "react";
 import { useNavigate } from "react-router-dom";
 import { OrderCard } from "@/components/kitchen/OrderCard";
 import { branches } from "@/lib/mockData";
@@ -31,8 +31,46 @@ import {
 import { toast } from "sonner";
 import { getCurrentUser, logout } from "../../auth/auth";
 import { ChangePasswordModal } from "@/components/auth/ChangePasswordModal";
-import { fetchInvoices, fetchProducts, fetchCategories, updateInvoiceStatus, fetchTables } from "../../api/index.js";
-import { WS_BASE_URL } from "../../api/config";
+import { fetchInvoices, fetchCatalog, updateInvoiceStatus } from "../../api/index.js";
+import { useOrdersWebSocket } from "@/hooks/useOrdersWebSocket";
+import { mergeInvoice } from "@/lib/invoiceEvents";
+
+// Invoices the kitchen still shows
+const isKitchenInvoice = (inv: any) =>
+  inv && inv.is_active && (inv.invoice_status === 'PENDING' || inv.invoice_status === 'READY' || inv.invoice_status === 'COMPLETED');
+
+// Shape an API invoice into a kitchen order card
+const toKitchenOrder = (inv: any, productsMap: Record<string, any>) => {
+  const tableMatch = (inv.description || inv.invoice_description || "").match(/Table (\d+)/);
+  const tableNumber = inv.table_no || (tableMatch ? parseInt(tableMatch[1]) : 0);
+
+  return {
+    id: (inv.id || "").toString(),
+    invoiceNumber: inv.invoice_number || "N/A",
+    tableNumber,
+    waiter: inv.created_by_name || "Unknown",
+    floor: inv.floor,
+    floorName: inv.floor_name,
+    status: inv.invoice_status === 'PENDING' ? 'new' :
+      inv.invoice_status === 'READY' ? 'ready' : 'completed',
+    total: parseFloat(inv.total_amount || "0"),
+    notes: inv.notes || "",
+    items: (inv.items || []).map((item: any) => {
+      const product = productsMap[String(item.product)];
+      return {
+        quantity: item.quantity || 0,
+        menuItem: {
+          name: product?.name || `Product #${item.product}`,
+          category: product?.category_name || 'Uncategorized',
+          categoryId: product?.category // Add category ID for filtering
+        },
+        notes: item.description || ""
+      };
+    }),
+    createdAt: inv.created_at,
+    updated_at: inv.updated_at
+  };
+};
 
 export default function KitchenDisplay() {
   const navigate = useNavigate();
@@ -47,7 +85,8 @@ export default function KitchenDisplay() {
   });
   const [showChangePassword, setShowChangePassword] = useState(false);
   const [loading, setLoading] = useState(true);
-  const [socketConnected, setSocketConnected] = useState(false);
+  // Product lookup for mapping invoices pushed over the socket
+  const productsMapRef = useRef<Record<string, any>>({});
 
   const handleFloorChange = (id: number | 'all') => {
     setSelectedFloorId(id);
@@ -71,60 +110,41 @@ export default function KitchenDisplay() {
     }
   };
 
-  // WebSocket: listen for new invoices and refresh kitchen data
-  useEffect(() => {
-    const socket = new WebSocket(WS_BASE_URL + "/ws/kitchen/");
-
-    socket.onopen = () => {
-      setSocketConnected(true);
-      console.log("[Kitchen WS] Connected");
-    };
-
-    socket.onmessage = (event) => {
-      try {
-        const data = JSON.parse(event.data);
-        console.log("[Kitchen WS] Message:", data);
-        if (data.type === "invoice_created") {
-          // New order placed - play sound, show toast, and refresh
-          playNotificationSound();
-          toast.success("New Order Received!", {
-            description: "A new order has been placed",
-            icon: <Bell className="h-5 w-5 text-primary" />,
-          });
-          loadData();
-        } else if (data.type === "invoice_updated") {
-          // Order updated - just refresh (no sound for updates in kitchen)
-          loadData();
-        }
-      } catch {
-        // Ignore malformed messages
+  // WebSocket: merge pushed invoices into the board; only a resync refetches
+  useOrdersWebSocket(
+    useCallback((data) => {
+      if (data.type === "resync") {
+        loadData();
+        return;
       }
-    };
-
-    socket.onclose = () => {
-      setSocketConnected(false);
-      console.log("[Kitchen WS] Disconnected");
-    };
-
-    socket.onerror = (err) => {
-      setSocketConnected(false);
-      console.error("[Kitchen WS] Error:", err);
-    };
-
-    return () => {
-      socket.close();
-    };
-  }, []);
+      if (data.type !== "invoice_created" && data.type !== "invoice_updated") return;
+
+      if (data.type === "invoice_created") {
+        // New order placed - play sound and show toast (no sound for updates in kitchen)
+        playNotificationSound();
+        toast.success("New Order Received!", {
+          description: "A new order has been placed",
+          icon: <Bell className="h-5 w-5 text-primary" />,
+        });
+      }
+      if (data.invoice) {
+        const keep = isKitchenInvoice(data.invoice);
+        setOrders((prev) =>
+          mergeInvoice(prev, toKitchenOrder(data.invoice, productsMapRef.current), () => keep)
+        );
+      }
+    }, []),
+    "/ws/kitchen/"
+  );
 
   const loadData = async () => {
     setLoading(true);
     try {
-      const [invoiceData, productData, categoryData, floorData] = await Promise.all([
+      const [invoiceData, catalog] = await Promise.all([
         fetchInvoices(),
-        fetchProducts(),
-        fetchCategories(),
-        fetchTables()
+        fetchCatalog()
       ]);
+      const { products: productData, categories: categoryData, floors: floorData } = catalog;
 
       setProducts(productData || []);
       setCategories(categoryData || []);
@@ -137,38 +157,11 @@ export default function KitchenDisplay() {
         return acc;
       }, {});
 
+      productsMapRef.current = productsMap;
+
       const mappedInvoices = (invoiceData || [])
-        .filter((inv: any) => inv && inv.is_active && (inv.invoice_status === 'PENDING' || inv.invoice_status === 'READY' || inv.invoice_status === 'COMPLETED'))
-        .map((inv: any) => {
-          const tableMatch = (inv.description || inv.invoice_description || "").match(/Table (\d+)/);
-          const tableNumber = inv.table_no || (tableMatch ? parseInt(tableMatch[1]) : 0);
-
-          return {
-            id: (inv.id || "").toString(),
-            invoiceNumber: inv.invoice_number || "N/A",
-            tableNumber,
-            waiter: inv.created_by_name || "Unknown",
-            floor: inv.floor,
-            floorName: inv.floor_name,
-            status: inv.invoice_status === 'PENDING' ? 'new' :
-              inv.invoice_status === 'READY' ? 'ready' : 'completed',
-            total: parseFloat(inv.total_amount || "0"),
-            notes: inv.notes || "",
-            items: (inv.items || []).map((item: any) => {
-              const product = productsMap[String(item.product)];
-              return {
-                quantity: item.quantity || 0,
-                menuItem: {
-                  name: product?.name || `Product #${item.product}`,
-                  category: product?.category_name || 'Uncategorized',
-                  categoryId: product?.category // Add category ID for filtering
-                },
-                notes: item.description || ""
-              };
-            }),
-            createdAt: inv.created_at
-          };
-        });
+        .filter(isKitchenInvoice)
+        .map((inv: any) => toKitchenOrder(inv, productsMap));
 
       setOrders(mappedInvoices);
     } catch (err: any) {
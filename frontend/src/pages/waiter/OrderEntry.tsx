@@ -11,7 +11,7 @@ import { Sheet, SheetContent, SheetHeader, SheetTitle } from "@/components/ui/sh
 import { Input } from "@/components/ui/input";
 import { ShoppingCart, Search, X, Receipt, Loader2, Check } from "lucide-react";
 import { toast } from "sonner";
-import { fetchProducts, fetchCategories } from "../../api/index.js";
+import { fetchCatalog } from "../../api/index.js";
 
 interface CartItemData {
   item: MenuItem;
@@ -40,10 +40,7 @@ export default function OrderEntry() {
   const loadData = async () => {
     setLoading(true);
     try {
-      const [productsData, categoriesData] = await Promise.all([
-        fetchProducts(),
-        fetchCategories()
-      ]);
+      const { products: productsData, categories: categoriesData } = await fetchCatalog();
 
       // Map backend products to MenuItem interface
       const mappedProducts: MenuItem[] = productsData.map((p: any) => ({
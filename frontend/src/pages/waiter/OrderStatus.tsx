@@ -7,9 +7,10 @@ import { WaiterBottomNav } from "@/components/waiter/WaiterBottomNav";
 import { ChefHat, Bell, Loader2, User, Users, Clock, Check } from "lucide-react";
 import { cn } from "@/lib/utils";
 import { toast } from "sonner";
-import { fetchInvoices, fetchNotifications, markNotificationRead, fetchProducts, fetchCategories } from "@/api/index.js";
+import { fetchInvoices, fetchNotifications, markNotificationRead, fetchCatalog } from "@/api/index.js";
 import { getCurrentUser } from "@/auth/auth";
 import { useOrdersWebSocket } from "@/hooks/useOrdersWebSocket";
+import { mergeInvoice } from "@/lib/invoiceEvents";
 import { formatDistanceToNow } from "date-fns";
 
 type Tab = "mine" | "all";
@@ -28,16 +29,15 @@ export default function OrderStatus() {
   const loadData = useCallback(async () => {
     setLoading(true);
     try {
-      const [data, notifs, prodData, catData] = await Promise.all([
+      const [data, notifs, catalog] = await Promise.all([
         fetchInvoices(),
         fetchNotifications(),
-        fetchProducts(),
-        fetchCategories()
+        fetchCatalog()
       ]);
       setAllOrders(data || []);
       setNotifications((notifs || []).filter((n: any) => !n.is_read));
-      setProducts(prodData || []);
-      setCategories(catData || []);
+      setProducts(catalog.products || []);
+      setCategories(catalog.categories || []);
     } catch (err: any) {
       toast.error(err.message || "Failed to load orders");
     } finally {
@@ -61,22 +61,39 @@ export default function OrderStatus() {
     }
   }, []);
 
-  // WebSocket: auto-refresh when invoice created or status updated (e.g. kitchen marks ready)
+  // Only the unread notifications change when the kitchen marks an order ready
+  const loadNotifications = useCallback(async () => {
+    try {
+      const notifs = await fetchNotifications();
+      setNotifications((notifs || []).filter((n: any) => !n.is_read));
+    } catch {
+      // Keep the current list; the next event or resync retries
+    }
+  }, []);
+
+  // WebSocket: merge the pushed invoice into the list; only a resync refetches everything
   useOrdersWebSocket(
     useCallback(
       (data) => {
+        if (data.type === "resync") {
+          loadData();
+          return;
+        }
+        if (data.type !== "invoice_created" && data.type !== "invoice_updated") return;
+
+        if (data.invoice) {
+          setAllOrders((prev) => mergeInvoice(prev, data.invoice));
+        }
         if (data.type === "invoice_updated" && data.status === "READY") {
           // Order is ready - play notification sound
           playNotificationSound();
           toast.success("A kitchen order is ready for pickup!", {
             icon: <ChefHat className="h-5 w-5 text-success" />
           });
-          loadData();
-        } else if (data.type === "invoice_created" || data.type === "invoice_updated") {
-          loadData();
+          loadNotifications();
         }
       },
-      [loadData, playNotificationSound]
+      [loadData, loadNotifications, playNotificationSound]
     )
   );
 
@@ -13,6 +13,10 @@ import { Separator } from "@/components/ui/separator";
 import { cn } from "@/lib/utils";
 import { fetchInvoices, addPayment } from "@/api/index.js";
 import { useOrdersWebSocket } from "@/hooks/useOrdersWebSocket";
+import { mergeInvoice } from "@/lib/invoiceEvents";
+
+// Orders that are NOT fully paid yet
+const isAwaitingPayment = (o: any) => o.payment_status !== "PAID" && o.invoice_status !== "CANCELLED";
 
 export default function PaymentCollection() {
   const navigate = useNavigate();
@@ -32,10 +36,7 @@ export default function PaymentCollection() {
     setLoading(true);
     try {
       const data = await fetchInvoices();
-      // Filter for orders that are NOT fully paid yet
-      const pendingPayments = (data || []).filter(
-        (o: any) => o.payment_status !== "PAID" && o.invoice_status !== "CANCELLED"
-      );
+      const pendingPayments = (data || []).filter(isAwaitingPayment);
       setOrders(pendingPayments);
     } catch (err: any) {
       toast.error(err.message || "Failed to load pending payments");
@@ -60,16 +61,22 @@ export default function PaymentCollection() {
     }
   }, []);
 
-  // WebSocket: auto-refresh when invoice created or status updated
+  // WebSocket: merge the pushed invoice into the list; only a resync refetches
   useOrdersWebSocket(
     useCallback(
       (data) => {
+        if (data.type === "resync") {
+          loadInvoices();
+          return;
+        }
+        if (data.type !== "invoice_created" && data.type !== "invoice_updated") return;
+
+        if (data.invoice) {
+          setOrders((prev) => mergeInvoice(prev, data.invoice, isAwaitingPayment));
+        }
         if (data.type === "invoice_updated" && data.status === "READY") {
           // Order ready - play notification sound
           playNotificationSound();
-          loadInvoices();
-        } else if (data.type === "invoice_created" || data.type === "invoice_updated") {
-          loadInvoices();
         }
       },
       [loadInvoices, playNotificationSound]